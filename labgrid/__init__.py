@@ -1,13 +1,19 @@
-from .target import Target
-from .environment import Environment
 from .exceptions import NoConfigFoundError
 
 from .factory import target_factory
 from .step import step, steps
 from .stepreporter import StepReporter
 from .consoleloggingreporter import ConsoleLoggingReporter
+from .util.lazy import lazy_attributes
 
 try:
     from ._version import __version__
 except ImportError:
     __version__ = "unknown"
+
+# Target and Environment are only imported on first access, so that tools
+# using only parts of labgrid (such as labgrid-client) start quickly.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    "Target": ".target",
+    "Environment": ".environment",
+})
@@ -24,6 +24,7 @@ class Handler(multiprocessing.Process):
             'env': self.env,
             'config': self.config,
         }
+        target_factory.import_builtins()
         self.context.update(target_factory.resources)
         self.context.update(target_factory.drivers)
 
@@ -1,50 +1,78 @@
-from .bareboxdriver import BareboxDriver
-from .ubootdriver import UBootDriver
-from .smallubootdriver import SmallUBootDriver
-from .serialdriver import SerialDriver
-from .shelldriver import ShellDriver
-from .sshdriver import SSHDriver
-from .externalconsoledriver import ExternalConsoleDriver
-from .exception import CleanUpError, ExecutionError
-from .fastbootdriver import AndroidFastbootDriver
-from .dfudriver import DFUDriver
-from .openocddriver import OpenOCDDriver
-from .quartushpsdriver import QuartusHPSDriver
-from .flashromdriver import FlashromDriver
-from .onewiredriver import OneWirePIODriver
-from .powerdriver import ManualPowerDriver, ExternalPowerDriver, \
-                         DigitalOutputPowerDriver, YKUSHPowerDriver, \
-                         USBPowerDriver, SiSPMPowerDriver, NetworkPowerDriver, \
-                         PDUDaemonDriver
-from .usbloader import MXSUSBDriver, IMXUSBDriver, BDIMXUSBDriver, RKUSBDriver, UUUDriver
-from .usbsdmuxdriver import USBSDMuxDriver
-from .usbsdwiredriver import USBSDWireDriver
-from .common import Driver
-from .qemudriver import QEMUDriver
-from .modbusdriver import ModbusCoilDriver
-from .modbusrtudriver import ModbusRTUDriver
-from .sigrokdriver import SigrokDriver, SigrokPowerDriver, SigrokDmmDriver
-from .usbstoragedriver import USBStorageDriver, NetworkUSBStorageDriver, Mode
-from .resetdriver import DigitalOutputResetDriver
-from .gpiodriver import GpioDigitalOutputDriver
-from .filedigitaloutput import FileDigitalOutputDriver
-from .serialdigitaloutput import SerialPortDigitalOutputDriver
-from .xenadriver import XenaDriver
-from .dockerdriver import DockerDriver
-from .lxaiobusdriver import LXAIOBusPIODriver
-from .lxausbmuxdriver import LXAUSBMuxDriver
-from .pyvisadriver import PyVISADriver
-from .usbhidrelay import HIDRelayDriver
-from .flashscriptdriver import FlashScriptDriver
-from .usbaudiodriver import USBAudioInputDriver
-from .usbvideodriver import USBVideoDriver
-from .httpvideodriver import HTTPVideoDriver
-from .networkinterfacedriver import NetworkInterfaceDriver
-from .provider import HTTPProviderDriver, NFSProviderDriver, TFTPProviderDriver
-from .rawnetworkinterfacedriver import RawNetworkInterfaceDriver
-from .mqtt import TasmotaPowerDriver
-from .manualswitchdriver import ManualSwitchDriver
-from .usbtmcdriver import USBTMCDriver
-from .deditecrelaisdriver import DeditecRelaisDriver
-from .dediprogflashdriver import DediprogFlashDriver
-from .httpdigitaloutput import HttpDigitalOutputDriver
+from ..registry import package_classes
+from ..util.lazy import lazy_attributes
+
+# Drivers are only imported on first access, so that users of a single driver
+# don't pay for importing all of them (and their dependencies).
+_lazy_imports = {
+    **package_classes(__name__, [
+        "BareboxDriver",
+        "UBootDriver",
+        "SmallUBootDriver",
+        "SerialDriver",
+        "ShellDriver",
+        "SSHDriver",
+        "ExternalConsoleDriver",
+        "AndroidFastbootDriver",
+        "DFUDriver",
+        "OpenOCDDriver",
+        "QuartusHPSDriver",
+        "FlashromDriver",
+        "OneWirePIODriver",
+        "ManualPowerDriver",
+        "ExternalPowerDriver",
+        "DigitalOutputPowerDriver",
+        "YKUSHPowerDriver",
+        "USBPowerDriver",
+        "SiSPMPowerDriver",
+        "NetworkPowerDriver",
+        "PDUDaemonDriver",
+        "MXSUSBDriver",
+        "IMXUSBDriver",
+        "BDIMXUSBDriver",
+        "RKUSBDriver",
+        "UUUDriver",
+        "USBSDMuxDriver",
+        "USBSDWireDriver",
+        "Driver",
+        "QEMUDriver",
+        "ModbusCoilDriver",
+        "ModbusRTUDriver",
+        "SigrokDriver",
+        "SigrokPowerDriver",
+        "SigrokDmmDriver",
+        "USBStorageDriver",
+        "NetworkUSBStorageDriver",
+        "DigitalOutputResetDriver",
+        "GpioDigitalOutputDriver",
+        "FileDigitalOutputDriver",
+        "SerialPortDigitalOutputDriver",
+        "XenaDriver",
+        "DockerDriver",
+        "LXAIOBusPIODriver",
+        "LXAUSBMuxDriver",
+        "PyVISADriver",
+        "HIDRelayDriver",
+        "FlashScriptDriver",
+        "USBAudioInputDriver",
+        "USBVideoDriver",
+        "HTTPVideoDriver",
+        "NetworkInterfaceDriver",
+        "HTTPProviderDriver",
+        "NFSProviderDriver",
+        "TFTPProviderDriver",
+        "RawNetworkInterfaceDriver",
+        "TasmotaPowerDriver",
+        "ManualSwitchDriver",
+        "USBTMCDriver",
+        "DeditecRelaisDriver",
+        "DediprogFlashDriver",
+        "HttpDigitalOutputDriver",
+    ]),
+    # not created by the target factory, so not in the registry
+    "CleanUpError": ".exception",
+    "ExecutionError": ".exception",
+    "Mode": ".usbstoragedriver",
+}
+
+__all__ = list(_lazy_imports)
+__getattr__, __dir__ = lazy_attributes(__name__, _lazy_imports)
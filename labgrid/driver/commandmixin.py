@@ -81,6 +81,42 @@ class CommandMixin:
             raise ExecutionError(cmd, stdout, stderr)
         return stdout
 
+    def _run_many(self, cmds, *, timeout=30.0, codec="utf-8", decodeerrors="strict"):
+        """
+        Internal function which runs the specified commands one after the
+        other. Drivers can override this to execute them more efficiently.
+
+        Args:
+            cmds (List[str]): commands to run on the shell
+            timeout (float): timeout for all commands
+
+        Returns:
+            List[Tuple[List[str], List[str], int]]: result of each command
+        """
+        timeout = Timeout(float(timeout))
+        return [
+            self._run(cmd, timeout=timeout.remaining, codec=codec, decodeerrors=decodeerrors)
+            for cmd in cmds
+        ]
+
+    @Driver.check_active
+    @step(args=['cmds'], result=True)
+    def run_many(self, cmds, *, timeout=30.0, codec="utf-8", decodeerrors="strict"):
+        """
+        Runs multiple commands, which is more efficient than calling run() for
+        each of them. The commands are executed independently of each other,
+        so a failing command does not stop the remaining ones.
+
+        Args:
+            cmds (List[str]): commands to run on the shell
+            timeout (float): timeout for all commands
+
+        Returns:
+            List[Tuple[List[str], List[str], int]]: stdout, stderr and exitcode
+            of each command
+        """
+        return self._run_many(list(cmds), timeout=timeout, codec=codec, decodeerrors=decodeerrors)
+
     @Driver.check_active
     @step(args=['cmd'], result=True)
     def run_check(self, cmd: str, *, timeout=30, codec="utf-8", decodeerrors="strict"):
@@ -12,11 +12,15 @@ class ConsoleExpectMixin:
     the internal _read and _write methods.
 
     The class using the ConsoleExpectMixin must provide a logger and a txdelay attribute.
+
+    The write_count attribute counts the calls to write(), allowing users of
+    the console to detect writes by other drivers.
     """
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
         self._expect = PtxExpect(self)
+        self.write_count = 0
 
     @Driver.check_active
     @step(result=True, tag='console')
@@ -33,6 +37,7 @@ class ConsoleExpectMixin:
     @Driver.check_active
     @step(args=['data'], tag='console')
     def write(self, data):
+        self.write_count += 1
         if self.txdelay:
             self.logger.debug("Write %i bytes: %s (with %fs txdelay)",
                               len(data), data, self.txdelay)
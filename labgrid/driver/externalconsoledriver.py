@@ -70,16 +70,18 @@ class ExternalConsoleDriver(ConsoleExpectMixin, Driver, ConsoleProtocol):
 
     def _read(self, size: int = 1024, timeout: int = 0, max_size: int = None):
         """
-        Reads 'size' bytes from the serialport
+        Reads up to 'size' or more bytes from the subprocess, depending on how
+        many are available
 
         Keyword Arguments:
         size -- amount of bytes to read, defaults to 1024
         max_size -- maximal amount of bytes to read
         """
+        # the pipe is non-blocking, so reading more only returns what is
+        # available instead of a single byte per call
+        read_size = max(size, 4096)
         if max_size:
-            read_size = min(size, max_size)
-        else:
-            read_size = size
+            read_size = min(read_size, max_size)
 
         if self._child.poll() is not None:
             raise ExecutionError("child has vanished")
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import threading
 import time
 
 import attr
@@ -20,64 +21,98 @@ class TasmotaPowerDriver(Driver, PowerProtocol):
     bindings = {
             "power": {"TasmotaPowerPort"}
     }
+    # maximum time to wait for the broker and the outlet to confirm a command
+    TIMEOUT = 3.0
+
     delay = attr.ib(default=2.0, validator=attr.validators.instance_of(float))
     _client = attr.ib(default=None)
     _status = attr.ib(default=None)
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
-        import paho.mqtt.client as mqtt
-        self._client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self._status_changed = threading.Condition()
 
     def on_activate(self):
-        self._client.on_message = self._on_message
-        self._client.on_connect = self._on_connect
-        self._client.connect(self.power.host)
-        self._client.loop_start()
+        # the MQTT client is shared with the resource manager and all other
+        # drivers using the same broker
+        manager = self.power.manager
+        self._status = None
+        self._client = manager.get_client(self.power.host)
+        manager.subscribe(self.power.host, self.power.status_topic, self._on_status)
 
     def on_deactivate(self):
-        self._client.loop_stop()
+        self.power.manager.unsubscribe(self.power.host, self.power.status_topic, self._on_status)
+        self._client = None
 
-    def _on_message(self, client, userdata, msg):
-        if msg.payload == b'ON':
+    def _on_status(self, topic, payload):
+        if payload == b'ON':
             status = True
-        elif msg.payload == b'OFF':
+        elif payload == b'OFF':
             status = False
         else:
-            raise ValueError(f"Unknown status: {msg.payload}. Must be 'ON' or 'OFF'")
-        self._status = status
-
-    def _on_connect(self, client, userdata, flags, reason_code, properties):
-        client.subscribe(self.power.status_topic)
+            self.logger.warning("Unknown status on %s: %s. Must be 'ON' or 'OFF'", topic, payload)
+            return
+        with self._status_changed:
+            self._status = status
+            self._status_changed.notify_all()
 
-    def _publish(self, topic, payload):
-        msg = self._client.publish(topic, payload=payload)
-        timeout = Timeout(3.0)
-        while not msg.is_published:
-            time.sleep(0.1)
-            if timeout.expired:
-                raise MQTTError("publish timed out")
-        return msg
+    @Driver.check_active
+    def _send(self, payload=None):
+        """Publish payload to the power topic without waiting for confirmation"""
+        with self._status_changed:
+            self._status = None
+        return self._client.publish(self.power.power_topic, payload=payload)
+
+    def _confirm(self, msg, status, timeout):
+        """
+        Wait until the message sent by _send() is published and the outlet
+        reports the requested status (or any status if status is None).
+        """
+        try:
+            msg.wait_for_publish(timeout.remaining)
+        except (ValueError, RuntimeError) as e:
+            raise MQTTError(f"publish failed: {e}") from e
+        if not msg.is_published():
+            raise MQTTError("publish timed out")
+
+        def confirmed():
+            return self._status is not None and status in (None, self._status)
+
+        with self._status_changed:
+            if not self._status_changed.wait_for(confirmed, timeout.remaining):
+                if status is None:
+                    raise MQTTError("Could not get initial status")
+                raise MQTTError(f"Port did not change status within {self.TIMEOUT} seconds")
+            return self._status
+
+    @staticmethod
+    def switch_many(drivers, status):
+        """
+        Switch the outlets of several active drivers on (status=True) or off.
+
+        The commands for all outlets are published before waiting for the
+        confirmations, so this takes about as long as switching a single
+        outlet.
+
+        Args:
+            drivers (list): active TasmotaPowerDriver instances
+            status (bool): True to switch on, False to switch off
+        """
+        timeout = Timeout(TasmotaPowerDriver.TIMEOUT)
+        payload = "ON" if status else "OFF"
+        pending = [(drv, drv._send(payload)) for drv in drivers]
+        for drv, msg in pending:
+            drv._confirm(msg, status, timeout)
 
     @Driver.check_active
     @step()
     def on(self):
-        self._publish(self.power.power_topic, "ON")
-        timeout = Timeout(3.0)
-        while self._status is False:
-            time.sleep(0.1)
-            if timeout.expired:
-                raise MQTTError("Port did not change status within 3 seconds")
+        self._confirm(self._send("ON"), True, Timeout(self.TIMEOUT))
 
     @Driver.check_active
     @step()
     def off(self):
-        self._publish(self.power.power_topic, "OFF")
-        timeout = Timeout(3.0)
-        while self._status is True:
-            time.sleep(0.1)
-            if timeout.expired:
-                raise MQTTError("Port did not change status within 3 seconds")
+        self._confirm(self._send("OFF"), False, Timeout(self.TIMEOUT))
 
     @Driver.check_active
     @step()
@@ -89,10 +124,5 @@ class TasmotaPowerDriver(Driver, PowerProtocol):
     @Driver.check_active
     @step()
     def get(self):
-        self._client.publish(self.power.power_topic)
-        timeout = Timeout(3.0)
-        while self._status is None:
-            time.sleep(0.1)
-            if timeout.expired:
-                raise MQTTError("Could not get initial status")
-        return self._status
+        # an empty command makes the outlet report its current status
+        return self._confirm(self._send(), None, Timeout(self.TIMEOUT))
@@ -1,5 +1,8 @@
 """The QEMUDriver implements a driver to use a QEMU target"""
 import atexit
+import collections
+import logging
+import os
 import select
 import shlex
 import shutil
@@ -8,6 +11,7 @@ import subprocess
 import re
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import attr
 from pexpect import TIMEOUT
@@ -17,10 +21,194 @@ from ..protocol import PowerProtocol, ConsoleProtocol
 from ..step import step
 from .common import Driver
 from .consoleexpectmixin import ConsoleExpectMixin
-from ..util.qmp import QMPMonitor, QMPError
+from ..util.qmp import QMPClient, QMPMonitor, QMPError
 from .exception import ExecutionError
 
 
+def _console_args(tempdir):
+    """Returns the QEMU arguments to start stopped, with QMP on stdio, the
+    serial console connected to the unix socket "serialrw" in tempdir and an
+    additional QMP monitor listening on the unix socket "qmp" in tempdir"""
+    return [
+        "-S",
+        "-qmp", "stdio",
+        "-chardev", f"socket,id=serialsocket,path={tempdir}/serialrw",
+        "-serial", "chardev:serialsocket",
+        "-chardev", f"socket,id=qmpsocket,path={tempdir}/qmp,server=on,wait=off",
+        "-mon", "chardev=qmpsocket,mode=control",
+    ]
+
+
+def _launch_qemu(cmd, listen_socket, logger):
+    """Start QEMU, accept its serial console connection on listen_socket and
+    negotiate QMP
+
+    Returns:
+        Tuple[subprocess.Popen, socket.socket, QMPMonitor]: QEMU process,
+        serial console connection and QMP monitor
+    """
+    logger.debug("Starting with: %s", cmd)
+    child = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    # prepare for timeout handing
+    clientsocket, address = listen_socket.accept()
+    clientsocket.setblocking(0)
+    logger.debug("new connection from %s", address)
+
+    try:
+        qmp = QMPMonitor(child.stdout, child.stdin)
+    except QMPError as exc:
+        clientsocket.close()
+        if child.poll() is not None:
+            child.communicate()
+            raise IOError(
+                f"QEMU process terminated with exit code {child.returncode}"
+            ) from exc
+        raise
+    return child, clientsocket, qmp
+
+
+class _QEMUInstance:
+    """A QEMU process started by a QEMUPool, waiting to be continued"""
+
+    def __init__(self, base_cmd, logger):
+        self.tempdir = tempfile.mkdtemp(prefix="labgrid-qemu-tmp-")
+        sockpath = f"{self.tempdir}/serialrw"
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.child = None
+        self.clientsocket = None
+        try:
+            self.socket.bind(sockpath)
+            self.socket.listen(0)
+            start = time.monotonic()
+            self.child, self.clientsocket, self.qmp = _launch_qemu(
+                base_cmd + _console_args(self.tempdir), self.socket, logger
+            )
+            self.startup_time = time.monotonic() - start
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Kill QEMU if it is still running and remove the temporary files"""
+        if self.child and self.child.poll() is None:
+            self.child.kill()
+            self.child.communicate()
+        if self.clientsocket:
+            self.clientsocket.close()
+        self.socket.close()
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+
+@attr.s(eq=False)
+class QEMUPool:
+    """Keeps QEMU instances for a command line started in the background, so
+    that QEMUDriver.on() only needs to continue one of them.
+
+    Instances are not reused after being handed out, instead a new one is
+    started in the background each time an instance is acquired. As the
+    instances exist at the same time, none of them may open an image
+    writable, so all drives must use snapshot=on or readonly=on (or QEMU's
+    -snapshot option must be given).
+
+    Pools only live in the process which created them, so separate labgrid
+    processes (such as multiple labgrid-client calls or pytest-xdist
+    workers) each start their own instances. A pool is created when the first
+    QEMUDriver using it is activated, so an on() directly after that still
+    waits for QEMU to start.
+
+    Args:
+        base_cmd (tuple): QEMU command line without the console and QMP options
+        size (int): number of instances to keep ready
+    """
+    # pools by command line, shared by all QEMUDrivers in this process
+    pools = {}
+
+    base_cmd = attr.ib(converter=tuple)
+    size = attr.ib(validator=attr.validators.instance_of(int))
+
+    def __attrs_post_init__(self):
+        self.logger = logging.getLogger(f"QEMUPool({os.path.basename(self.base_cmd[0])})")
+        self._executor = ThreadPoolExecutor(max_workers=self.size)
+        self._pending = collections.deque()
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+        self._fill()
+        atexit.register(self.close)
+
+    @staticmethod
+    def writable_drives(base_cmd):
+        """Returns the -drive options of base_cmd which QEMU opens writable"""
+        if "-snapshot" in base_cmd:
+            return []
+        drives = [opts for opt, opts in zip(base_cmd, base_cmd[1:]) if opt == "-drive"]
+        return [
+            opts for opts in drives
+            if not {"snapshot=on", "readonly=on"} & set(opts.split(","))
+        ]
+
+    @classmethod
+    def get(cls, base_cmd, size):
+        """Returns the pool for the given command line, creating it if needed
+
+        Raises ExecutionError if an image would be opened writable by
+        multiple instances.
+        """
+        writable = cls.writable_drives(base_cmd)
+        if writable:
+            raise ExecutionError(
+                f"QEMU pool instances can't share writable drives ({'; '.join(writable)}), "
+                "add snapshot=on to disk_opts or -snapshot to extra_args"
+            )
+        key = tuple(base_cmd)
+        pool = cls.pools.get(key)
+        if pool is None:
+            pool = cls.pools[key] = cls(key, size)
+        return pool
+
+    def _fill(self):
+        while len(self._pending) < self.size:
+            self._pending.append(
+                self._executor.submit(_QEMUInstance, list(self.base_cmd), self.logger)
+            )
+
+    def acquire(self):
+        """Returns a started QEMU instance, waiting for the oldest one if none
+        is ready yet"""
+        future = self._pending.popleft()
+        self._fill()
+        hit = future.done()
+        start = time.monotonic()
+        instance = future.result()
+        waited = time.monotonic() - start
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.saved_time += max(0.0, instance.startup_time - waited)
+        return instance
+
+    @property
+    def hit_rate(self):
+        """Fraction of acquired instances which were ready immediately"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        """Stop all instances which were not acquired"""
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.cancel() and future.exception() is None:
+                future.result().close()
+        self._executor.shutdown()
+        if self.hits + self.misses:
+            self.logger.info("hit rate %.0f%% (%d of %d), saved %.1f s of QEMU startup time",
+                             self.hit_rate * 100, self.hits, self.hits + self.misses, self.saved_time)
+        if self.pools.get(self.base_cmd) is self:
+            del self.pools[self.base_cmd]
+
+
 @target_factory.reg_driver
 @attr.s(eq=False)
 class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
@@ -49,7 +237,21 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
             fb-headless: Create a headless framebuffer device
             egl-headless: Create a headless GPU-backed graphics card. Requires host support
         nic (str): optional, configuration string to pass to QEMU to create a network interface
+        pool_size (int): optional, number of QEMU instances to start in advance,
+            requires read-only or snapshot drives, see QEMUPool
+
+    Snapshots of the running VM can be saved with save_snapshot() and restored
+    with restore_snapshot(). With a qcow2 disk image, the snapshots are
+    stored in the image (savevm/loadvm) and include the disk contents.
+    Otherwise, the VM state is saved to a temporary file via migration and
+    QEMU is restarted to restore it, the disk contents are not included.
+
+    Asynchronous QMP events (such as RESET) can be awaited with
+    wait_for_event(), see qmp_client.
     """
+    # interval for polling the migration status
+    MIGRATION_POLL_INTERVAL = 0.05
+
     qemu_bin = attr.ib(validator=attr.validators.instance_of(str))
     machine = attr.ib(validator=attr.validators.instance_of(str))
     cpu = attr.ib(validator=attr.validators.instance_of(str))
@@ -89,6 +291,7 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
     nic = attr.ib(
         default=None,
         validator=attr.validators.optional(attr.validators.instance_of(str)))
+    pool_size = attr.ib(default=0, validator=attr.validators.instance_of(int))
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
@@ -99,9 +302,18 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
         self._socket = None
         self._clientsocket = None
         self._forwarded_ports = {}
+        self._snapshots = set()
+        self._snapshot_dir = None
+        self._instance = None
+        self._qmp_path = None
+        self._qmp_client = None
+        self.pool = None
         atexit.register(self._atexit)
 
     def _atexit(self):
+        if self._snapshot_dir:
+            shutil.rmtree(self._snapshot_dir, ignore_errors=True)
+            self._snapshot_dir = None
         if not self._child:
             return
         self._child.terminate()
@@ -225,22 +437,17 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
         return cmd
 
     def on_activate(self):
+        base_cmd = self.get_qemu_base_args()
+        if self.pool_size:
+            self.pool = QEMUPool.get(base_cmd, self.pool_size)
+
         self._tempdir = tempfile.mkdtemp(prefix="labgrid-qemu-tmp-")
         sockpath = f"{self._tempdir}/serialrw"
         self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self._socket.bind(sockpath)
         self._socket.listen(0)
 
-        self._cmd = self.get_qemu_base_args()
-
-        self._cmd.append("-S")
-        self._cmd.append("-qmp")
-        self._cmd.append("stdio")
-
-        self._cmd.append("-chardev")
-        self._cmd.append(f"socket,id=serialsocket,path={sockpath}")
-        self._cmd.append("-serial")
-        self._cmd.append("chardev:serialsocket")
+        self._cmd = base_cmd + _console_args(self._tempdir)
 
     def on_deactivate(self):
         if self.status:
@@ -258,50 +465,93 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
         afterwards start the emulator using a QMP Command"""
         if self.status:
             return
-        self.logger.debug("Starting with: %s", self._cmd)
-        self._child = subprocess.Popen(
-            self._cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        if self.pool:
+            self._instance = self.pool.acquire()
+            self._adopt(self._instance.child, self._instance.clientsocket, self._instance.qmp,
+                        self._instance.tempdir)
+        else:
+            self._start()
+        self.monitor_command("cont")
 
-        # prepare for timeout handing
-        self._clientsocket, address = self._socket.accept()
-        self._clientsocket.setblocking(0)
-        self.logger.debug("new connection from %s", address)
+    def _start(self, incoming=None):
+        """Start the QEMU subprocess in the stopped state, optionally loading
+        the VM state from the given migration URI"""
+        cmd = self._cmd
+        if incoming is not None:
+            cmd = cmd + ["-incoming", "defer"]
+        self._adopt(*_launch_qemu(cmd, self._socket, self.logger), self._tempdir)
 
-        try:
-            self.qmp = QMPMonitor(self._child.stdout, self._child.stdin)
-        except QMPError as exc:
-            if self._child.poll() is not None:
-                self._child.communicate()
-                raise IOError(
-                    f"QEMU process terminated with exit code {self._child.returncode}"
-                ) from exc
-            raise
+        if incoming is not None:
+            self.monitor_command("migrate-incoming", {"uri": incoming})
+            self._wait_for_migration()
 
+    def _adopt(self, child, clientsocket, qmp, tempdir):
+        if self._clientsocket:
+            self._clientsocket.close()
+        self._close_qmp_client()
+        self._child = child
+        self._clientsocket = clientsocket
+        self.qmp = qmp
+        self._qmp_path = f"{tempdir}/qmp"
         self.status = 1
 
         # Restore port forwards
         for v in self._forwarded_ports.values():
             self._add_port_forward(*v)
 
-        self.monitor_command("cont")
-
     @step()
     def off(self):
         """Stop the emulator using a monitor command and await the exitcode"""
         if not self.status:
             return
         self.monitor_command('quit')
+        self._close_qmp_client()
         if self._child.wait() != 0:
             self._child.communicate()
             raise IOError
         self._child = None
         self.status = 0
+        if self._instance:
+            # the console connection belongs to the instance
+            self._instance.close()
+            self._instance = None
+            self._clientsocket = None
 
     def cycle(self):
         """Cycle the emulator by restarting it"""
         self.off()
         self.on()
 
+    def _close_qmp_client(self):
+        if self._qmp_client:
+            self._qmp_client.close()
+            self._qmp_client = None
+
+    @property
+    def qmp_client(self):
+        """QMPClient connected to an additional QMP monitor of the running
+        QEMU, which queues asynchronous events such as RESET or SHUTDOWN
+
+        The client is connected on first use, so it only receives events
+        emitted afterwards.
+        """
+        if not self.status:
+            raise ExecutionError("Can't use QMP client on non-running target")
+        if self._qmp_client is None:
+            self._qmp_client = QMPClient(self._qmp_path)
+        return self._qmp_client
+
+    @Driver.check_active
+    @step(args=['name'], result=True)
+    def wait_for_event(self, name, timeout=30.0):
+        """Wait for the QMP event with the given name (such as "RESET") and
+        return it
+
+        Events received before the QMP client was connected (see qmp_client)
+        or consumed by an earlier call are not considered.
+        """
+        return self.qmp_client.wait_event(name, timeout=timeout)
+
     @step(result=True, args=['command', 'arguments'])
     def monitor_command(self, command, arguments={}):
         """Execute a monitor_command via the QMP"""
@@ -310,6 +560,68 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
                 "Can't use monitor command on non-running target")
         return self.qmp.execute(command, arguments)
 
+    def _uses_savevm(self):
+        return self.disk is not None and \
+            self.target.env.config.get_image_path(self.disk).endswith(".qcow2")
+
+    def _human_monitor_command(self, command_line):
+        # HMP commands report errors as output instead of QMP errors
+        output = self.monitor_command("human-monitor-command", {"command-line": command_line})
+        if output.strip():
+            raise ExecutionError(f"{command_line} failed: {output.strip()}")
+
+    def _snapshot_uri(self, name, save):
+        if self._snapshot_dir is None:
+            self._snapshot_dir = tempfile.mkdtemp(prefix="labgrid-qemu-snapshots-")
+        path = shlex.quote(os.path.join(self._snapshot_dir, f"{name}.vmstate"))
+        return f"exec:cat > {path}" if save else f"exec:cat {path}"
+
+    def _wait_for_migration(self):
+        while True:
+            status = self.monitor_command("query-migrate").get("status")
+            if status == "completed":
+                return
+            if status in ("failed", "cancelled"):
+                raise ExecutionError(f"QEMU migration {status}")
+            time.sleep(self.MIGRATION_POLL_INTERVAL)
+
+    def has_snapshot(self, name):
+        """Returns whether a snapshot with the given name was saved"""
+        return name in self._snapshots
+
+    @Driver.check_active
+    @step(args=['name'])
+    def save_snapshot(self, name):
+        """Save the state of the running VM as a snapshot with the given name"""
+        if not self.status:
+            raise ExecutionError("Can't save snapshot of non-running target")
+        if self._uses_savevm():
+            self._human_monitor_command(f"savevm {name}")
+        else:
+            # the VM is stopped after a completed migration
+            self.monitor_command("migrate", {"uri": self._snapshot_uri(name, save=True)})
+            self._wait_for_migration()
+            self.monitor_command("cont")
+        self._snapshots.add(name)
+
+    @Driver.check_active
+    @step(args=['name'])
+    def restore_snapshot(self, name):
+        """Restore the snapshot with the given name, starting the VM if needed
+
+        This is much faster than booting the VM via cycle().
+        """
+        if not self.has_snapshot(name):
+            raise ExecutionError(f"No snapshot named {name}")
+        if self._uses_savevm():
+            if not self.status:
+                self._start()
+            self._human_monitor_command(f"loadvm {name}")
+        else:
+            self.off()
+            self._start(incoming=self._snapshot_uri(name, save=False))
+        self.monitor_command("cont")
+
     def _add_port_forward(self, proto, local_address, local_port, remote_address, remote_port):
         self.monitor_command(
             "human-monitor-command",
@@ -329,16 +641,14 @@ class QEMUDriver(ConsoleExpectMixin, Driver, PowerProtocol, ConsoleProtocol):
 
     def _read(self, size=1, timeout=10, max_size=None):
         ready, _, _ = select.select([self._clientsocket], [], [], timeout)
-        if ready:
-            # Collect some more data
-            time.sleep(0.01)
-            # Always read a page, regardless of size
-            size = 4096
-            size = min(max_size, size) if max_size else size
-            res = self._clientsocket.recv(size)
-        else:
+        if not ready:
             raise TIMEOUT(f"Timeout of {timeout:.2f} seconds exceeded")
-        return res
+        # Always read up to a page, regardless of size. The socket is
+        # non-blocking, so this returns everything received so far without
+        # waiting for more data to arrive.
+        size = 4096
+        size = min(max_size, size) if max_size else size
+        return self._clientsocket.recv(size)
 
     def _write(self, data):
         return self._clientsocket.send(data)
@@ -1,3 +1,5 @@
+import socket
+
 import attr
 from pexpect import TIMEOUT
 import serial
@@ -21,6 +23,7 @@ class SerialDriver(ConsoleExpectMixin, Driver, ConsoleProtocol):
 
     txdelay = attr.ib(default=0.0, validator=attr.validators.instance_of(float))
     timeout = attr.ib(default=3.0, validator=attr.validators.instance_of(float))
+    history = attr.ib(default=False, validator=attr.validators.instance_of(bool))
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
@@ -36,10 +39,13 @@ class SerialDriver(ConsoleExpectMixin, Driver, ConsoleProtocol):
         self.status = 0
 
     def on_activate(self):
+        history = b""
         if isinstance(self.port, SerialPort):
             self.serial.port = self.port.port
             self.serial.baudrate = self.port.speed
         else:
+            if self.history:
+                history = self._get_history()
             host, port = proxymanager.get_host_and_port(self.port)
             if self.port.protocol == "rfc2217":
                 self.serial.port = f"rfc2217://{host}:{port}?ign_set_control&timeout={self.timeout}"
@@ -49,10 +55,29 @@ class SerialDriver(ConsoleExpectMixin, Driver, ConsoleProtocol):
                 raise Exception("SerialDriver: unknown protocol")
             self.serial.baudrate = self.port.speed
         self.open()
+        if history:
+            self.logger.debug("Prepending %i bytes of console history", len(history))
+            self._expect.buffer = history + self._expect.buffer
 
     def on_deactivate(self):
         self.close()
 
+    def _get_history(self):
+        """Returns the recent console output kept by the exporter's built-in serial server"""
+        history_port = getattr(self.port, "extra", {}).get("history_port")
+        if not history_port:
+            self.logger.warning("No console history available for %s", self.port)
+            return b""
+        host, port = proxymanager.get_host_and_port(self.port, force_port=history_port)
+        chunks = []
+        with socket.create_connection((host, port), timeout=self.timeout) as sock:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+        return b"".join(chunks)
+
     @Driver.check_bound
     def get_export_vars(self):
         export_vars = {
@@ -1,10 +1,13 @@
 # pylint: disable=unused-argument
 """The ShellDriver provides the CommandProtocol, ConsoleProtocol and
  InfoProtocol on top of a SerialPort."""
+import base64
+import binascii
 import io
 import re
 import shlex
 import ipaddress
+from functools import lru_cache
 
 import attr
 from pexpect import TIMEOUT
@@ -19,6 +22,11 @@ from .common import Driver
 from .exception import ExecutionError
 
 
+@lru_cache(maxsize=None)
+def _xmodem_pattern(size):
+    return re.compile(rb'.{%d}' % size, re.DOTALL)
+
+
 @target_factory.reg_driver
 @attr.s(eq=False)
 class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
@@ -42,7 +50,18 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         post_login_settle_time (int): optional, seconds of silence after logging in
             before check for a prompt. Useful when the console is interleaved with boot
             output which may interrupt prompt detection.
+        prompt_check_interval (float): optional, seconds for which the prompt matched
+            after a command is trusted, so the next command can skip checking for it.
+            0 checks the prompt before every command.
+        transfer_mode (str): optional, how files are transferred: "base64",
+            "xmodem" or "auto" to use base64 if available on the target
     """
+    # maximum length of a command line sent by run_many(), well below the
+    # 4096 bytes a tty in canonical mode accepts per line
+    MAX_BATCH_LENGTH = 1024
+    # amount of base64 encoded data written or read at once during transfers
+    TRANSFER_CHUNK_SIZE = 4096
+
     bindings = {"console": ConsoleProtocol, }
     prompt = attr.ib(validator=attr.validators.instance_of(str))
     login_prompt = attr.ib(validator=attr.validators.instance_of(str))
@@ -53,14 +72,20 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
     console_ready = attr.ib(default="", validator=attr.validators.instance_of(str))
     await_login_timeout = attr.ib(default=2, validator=attr.validators.instance_of(int))
     post_login_settle_time = attr.ib(default=0, validator=attr.validators.instance_of(int))
+    prompt_check_interval = attr.ib(default=10.0, validator=attr.validators.instance_of((int, float)))
+    transfer_mode = attr.ib(default="auto", validator=attr.validators.in_(["auto", "base64", "xmodem"]))
 
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
         self._status = 0
+        # set when a prompt was matched, cleared when it can't be trusted anymore
+        self._prompt_timeout = None
+        self._prompt_write_count = None
 
         self._xmodem_cached_rx_cmd = ""
         self._xmodem_cached_sx_cmd = ""
+        self._cached_transfer_mode = ""
 
     def on_activate(self):
         if self._status == 0:
@@ -76,6 +101,7 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
 
     def on_deactivate(self):
         self._status = 0
+        self._prompt_timeout = None
 
     def _run(self, cmd, *, timeout=30.0, codec="utf-8", decodeerrors="strict"):
         """
@@ -84,13 +110,12 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         Arguments:
         cmd - cmd to run on the shell
         """
-        # FIXME: Handle pexpect Timeout
-        self._check_prompt()
+        self._ensure_prompt()
         marker = gen_marker()
         # hide marker from expect
         cmp_command = f'''MARKER='{marker[:4]}''{marker[4:]}' run {shlex.quote(cmd)}'''
         self.console.sendline(cmp_command)
-        _, _, match, _ = self.console.expect(
+        _, _, match, _ = self._expect_prompt(
             rf'{marker}(.*){marker}\s+(\d+)\s+{self.prompt}',
             timeout=timeout
         )
@@ -103,6 +128,66 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         exitcode = int(match.group(2))
         return (data, [], exitcode)
 
+    def _run_many(self, cmds, *, timeout=30.0, codec="utf-8", decodeerrors="strict"):
+        """
+        Runs the specified cmds on the shell and returns their output.
+
+        The commands are sent as few command lines as possible, so only one
+        round trip is needed per batch instead of per command.
+        """
+        timeout = Timeout(float(timeout))
+        results = []
+        for batch in self._split_batches(cmds):
+            results += self._run_batch(batch, timeout=timeout.remaining, codec=codec,
+                                       decodeerrors=decodeerrors)
+        return results
+
+    def _split_batches(self, cmds):
+        """Splits cmds into lists whose command line does not exceed MAX_BATCH_LENGTH"""
+        batches = []
+        length = 0
+        for cmd in cmds:
+            # "; run <cmd>" after "MARKER='XXXX''XXXXXX'"
+            cmd_length = len(shlex.quote(cmd)) + 6
+            if not batches or length + cmd_length > self.MAX_BATCH_LENGTH:
+                batches.append([])
+                length = 21
+            batches[-1].append(cmd)
+            length += cmd_length
+        return batches
+
+    def _run_batch(self, cmds, *, timeout, codec, decodeerrors):
+        self._ensure_prompt()
+        marker = gen_marker()
+        # hide marker from expect
+        hidden_marker = f"'{marker[:4]}''{marker[4:]}'"
+        cmp_command = "; ".join(
+            [f"MARKER={hidden_marker}"] + [f"run {shlex.quote(cmd)}" for cmd in cmds]
+        )
+        self.console.sendline(cmp_command)
+        # only wait for the last command's marker, as a pattern spanning the
+        # output of all commands would be slow to match on a growing buffer
+        _, before, match, _ = self._expect_prompt(
+            rf'{marker}\s+(\d+)\s+{self.prompt}',
+            timeout=timeout
+        )
+        outputs = re.findall(
+            rf'{marker}(.*?){marker} (\d+)'.encode(), before + match.group(0), re.S
+        )
+        if len(outputs) != len(cmds):
+            raise ExecutionError(
+                f"received results for {len(outputs)} of {len(cmds)} commands: {cmp_command}"
+            )
+        results = []
+        for output, exitcode in outputs:
+            # Remove VT100 Codes, split by newline and remove surrounding newline
+            data = re_vt100.sub('', output.decode(codec, decodeerrors)).split('\r\n')
+            if data and not data[-1]:
+                del data[-1]
+            results.append((data, [], int(exitcode)))
+        self.logger.debug("Received Data: %s", results)
+        return results
+
     @Driver.check_active
     @step(args=['cmd'], result=True)
     def run(self, cmd, timeout=30.0, codec="utf-8", decodeerrors="strict"):
@@ -187,7 +272,7 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         """
         return self._status
 
-    def _check_prompt(self):
+    def _check_prompt(self, timeout=30):
         """
         Internal function to check if we have a valid prompt
         """
@@ -195,15 +280,50 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         # hide marker from expect
         self.console.sendline(f"echo '{marker[:4]}''{marker[4:]}'")
         try:
-            self.console.expect(
+            self._expect_prompt(
                 rf"{marker}\s+{self.prompt}",
-                timeout=30
+                timeout=timeout
             )
             self._status = 1
         except TIMEOUT:
             self._status = 0
             raise
 
+    def _expect_prompt(self, pattern, timeout):
+        """
+        Internal function to expect a pattern ending with the prompt, which
+        is trusted afterwards until prompt_check_interval expires
+        """
+        try:
+            result = self.console.expect(pattern, timeout=timeout)
+        except TIMEOUT:
+            self._prompt_timeout = None
+            raise
+        self._prompt_timeout = Timeout(float(self.prompt_check_interval))
+        self._prompt_write_count = getattr(self.console, "write_count", None)
+        return result
+
+    def _ensure_prompt(self):
+        """
+        Internal function to check for a valid prompt unless the prompt
+        matched after the previous command can be trusted
+        """
+        if self._prompt_timeout is None or self._prompt_timeout.expired:
+            self._check_prompt()
+            return
+        # someone else wrote to the console in the meantime
+        write_count = getattr(self.console, "write_count", None)
+        if write_count is None or write_count != self._prompt_write_count:
+            self._check_prompt()
+            return
+        # any output since the prompt (such as kernel messages or input
+        # echoed for other clients of a shared console) means that the shell's
+        # state is unknown
+        _, before, _, _ = self.console.expect([TIMEOUT], timeout=0)
+        if before:
+            self.logger.debug("Received unexpected data after prompt: %s", before)
+            self._check_prompt()
+
     def _inject_run(self):
         self.console.sendline(
             '''run() { echo -n "$MARKER"; sh -c "$@"; echo "$MARKER $?"; }'''
@@ -285,7 +405,7 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         try:
             # use the underlying expect mechanism, which may have already accidentally read
             # something of the XMODEM protocol data into its internal buffers:
-            xpct = self.console.expect(r'.{%d}' % size, timeout=timeout)
+            xpct = self.console.expect(_xmodem_pattern(size), timeout=timeout)
             s = xpct[2].group()
             self.logger.debug('XMODEM GETC(%d): read %r', size, s)
             return s
@@ -349,8 +469,115 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         # use the cached string template to make the full command with parameters
         return self._xmodem_cached_sx_cmd.format(filename=filename)
 
+    def _get_transfer_mode(self):
+        """ Detect whether base64 can be used for file transfers on the target, and cache the result. """
+        if self.transfer_mode != "auto":
+            return self.transfer_mode
+        if not self._cached_transfer_mode:
+            if self._run('which base64')[2] == 0:
+                self._cached_transfer_mode = "base64"
+            else:
+                self._cached_transfer_mode = "xmodem"
+            self.logger.debug('Using %s for file transfers', self._cached_transfer_mode)
+        return self._cached_transfer_mode
+
+    @staticmethod
+    def _transfer_timeout(size):
+        # assume that at least 1 KB/s can be transferred
+        return max(30.0, size / 1000)
+
+    def _put_bytes_base64(self, buf: bytes, remotefile: str):
+        # The data is sent base64 encoded to `base64 -d` on the target, with
+        # echo disabled to avoid receiving it back. `head -c` reads exactly the
+        # encoded data, so nothing is left for the shell to execute. The
+        # transfer is only started if the destination file can be written.
+        data = base64.encodebytes(buf)
+        remotefile = shlex.quote(remotefile)
+
+        self._ensure_prompt()
+        marker = gen_marker()
+        # hide marker from expect
+        hidden_marker = f"'{marker[:4]}''{marker[4:]}'"
+        self.console.sendline(
+            f"if true > {remotefile}; then stty -echo; echo {hidden_marker}; "
+            f"head -c {len(data)} | base64 -d > {remotefile}; R=$?; stty echo; else R=1; fi; "
+            f"echo {hidden_marker} $R $(wc -c < {remotefile})"
+        )
+        end_pattern = rf'{marker} (\d+) ?(\d*)\s+{self.prompt}'
+        index, _, match, _ = self.console.expect([rf'{marker}\r?\n', end_pattern], timeout=30)
+
+        if index == 0:
+            for offset in range(0, len(data), self.TRANSFER_CHUNK_SIZE):
+                self.console.write(data[offset:offset + self.TRANSFER_CHUNK_SIZE])
+            _, _, match, _ = self._expect_prompt(end_pattern, timeout=self._transfer_timeout(len(data)))
+
+        ret = int(match.group(1))
+        if ret != 0:
+            raise ExecutionError(f'Could not write {remotefile} on target: returned {ret}')
+        size = int(match.group(2) or -1)
+        if size != len(buf):
+            raise ExecutionError(f'Wrote {size} bytes of {len(buf)} to {remotefile}')
+
+    def _get_bytes_base64(self, remotefile: str):
+        # The target waits for a newline after printing the marker, so nothing
+        # following the marker has been read by expect yet. The base64 encoded
+        # data is then read from the console directly instead of using expect,
+        # which would search the whole buffer after each read.
+        remotefile = shlex.quote(remotefile)
+
+        self._ensure_prompt()
+        marker = gen_marker()
+        # hide marker from expect
+        hidden_marker = f"'{marker[:4]}''{marker[4:]}'"
+        self.console.sendline(
+            f"echo {hidden_marker}; read -r REPLY; base64 {remotefile}; R=$?; "
+            f"echo {hidden_marker} $R $(wc -c < {remotefile})"
+        )
+        self.console.expect(rf'{marker}\r?\n', timeout=30)
+        # the prompt following the data is not consumed by expect
+        self._prompt_timeout = None
+        self.console.sendline("")
+
+        end = re.compile(rf'{marker} (\d+) ?(\d*)\r?\n'.encode())
+        data = bytearray()
+        timeout = Timeout(30.0)
+        while True:
+            try:
+                chunk = self.console.read(size=1, max_size=self.TRANSFER_CHUNK_SIZE, timeout=1.0)
+            except TIMEOUT:
+                chunk = b''
+            if chunk:
+                # the end marker may have been split between reads
+                start = max(0, len(data) - len(marker) - 48)
+                data += chunk
+                match = end.search(data, start)
+                if match:
+                    break
+                timeout = Timeout(30.0)
+            elif timeout.expired:
+                raise TIMEOUT(f"Timeout while receiving {remotefile}")
+
+        ret = int(match.group(1))
+        if ret != 0:
+            raise ExecutionError(f'Could not read {remotefile} on target: returned {ret}')
+        try:
+            # whitespace such as line endings is discarded
+            buf = base64.b64decode(bytes(data[:match.start()]))
+        except binascii.Error as e:
+            raise ExecutionError(f'Could not decode data of {remotefile}: {e}')
+        size = int(match.group(2) or -1)
+        if size != len(buf):
+            raise ExecutionError(f'Only received {len(buf)} bytes of {size} expected')
+        return buf
+
     @step(title='put_bytes', args=['remotefile'])
     def _put_bytes(self, buf: bytes, remotefile: str):
+        if self._get_transfer_mode() == "base64":
+            self._put_bytes_base64(buf, remotefile)
+        else:
+            self._put_bytes_xmodem(buf, remotefile)
+
+    def _put_bytes_xmodem(self, buf: bytes, remotefile: str):
         # OK, a little explanation on what we're doing here:
         # XMODEM is a fairly simple, but also a fairly historic protocol. For example, all packets
         # carry exactly 128 bytes of payload, and if the file being sent is not a multiple of 128
@@ -384,8 +611,14 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
 
         self.console.expect(self.prompt, timeout=30)
 
-        # truncate the file to get rid of CPMEOF padding
-        dd_cmd = f"dd if='{tmpfile}' of='{remotefile}' bs=1 count={len(buf)}"
+        # truncate the file to get rid of CPMEOF padding, copying full blocks
+        # first and only the remaining bytes one by one
+        blocks, rest = divmod(len(buf), 4096)
+        dd_cmd = (
+            f"dd if='{tmpfile}' of='{remotefile}' bs=4096 count={blocks} && "
+            f"dd if='{tmpfile}' of='{remotefile}' bs=1 skip={blocks * 4096} seek={blocks * 4096} "
+            f"count={rest} conv=notrunc"
+        )
         self.logger.debug('dd command: %s', dd_cmd)
         out, _, ret = self._run(dd_cmd)
 
@@ -430,6 +663,11 @@ class ShellDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
 
     @step(title='get_bytes', args=['remotefile'])
     def _get_bytes(self, remotefile: str):
+        if self._get_transfer_mode() == "base64":
+            return self._get_bytes_base64(remotefile)
+        return self._get_bytes_xmodem(remotefile)
+
+    def _get_bytes_xmodem(self, remotefile: str):
         buf = io.BytesIO()
 
         cmd = self._get_xmodem_sx_cmd(remotefile)
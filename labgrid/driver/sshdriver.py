@@ -2,12 +2,14 @@
 import contextlib
 import os
 import re
+import selectors
 import stat
 import shlex
 import shutil
 import subprocess
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
 
 import attr
@@ -19,11 +21,115 @@ from .common import Driver
 from ..step import step
 from .exception import ExecutionError
 from ..util.helper import get_free_port
+from ..util.marker import gen_marker
 from ..util.proxy import proxymanager
 from ..util.timeout import Timeout
 from ..util.ssh import get_ssh_connect_timeout
 
 
+class _PersistentShell:
+    """A long-running shell executing one command after another
+
+    Each command is evaluated in a subshell with stdin redirected from
+    /dev/null, followed by a marker containing the exit code on stdout and a
+    marker on stderr, so the output of multiple commands can be separated.
+    """
+    # number of commands sent ahead by run_many() before reading their results
+    PIPELINE_DEPTH = 16
+
+    def __init__(self, args, logger):
+        self.logger = logger
+        self.process = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.process.stdout, selectors.EVENT_READ)
+        self.selector.register(self.process.stderr, selectors.EVENT_READ)
+        self.stdout = bytearray()
+        self.stderr = bytearray()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, cmd, stderr_merge=False, timeout=None):
+        """Runs cmd and returns (stdout, stderr, returncode) with stdout and
+        stderr as bytes (stderr is None if stderr_merge is set)
+
+        Raises subprocess.TimeoutExpired if the command did not finish within
+        timeout seconds, the shell is killed in this case.
+        """
+        return self.run_many([cmd], stderr_merge=stderr_merge, timeout=timeout)[0]
+
+    def run_many(self, cmds, stderr_merge=False, timeout=None):
+        """Runs the cmds, sending the next ones while the previous are running,
+        and returns a list of results as returned by run()
+        """
+        deadline = Timeout(float(timeout)) if timeout is not None else None
+        pending = []
+        results = []
+        for cmd in cmds:
+            pending.append((cmd, self._send(cmd, stderr_merge)))
+            if len(pending) >= self.PIPELINE_DEPTH:
+                results.append(self._receive(*pending.pop(0), stderr_merge, deadline, timeout))
+        while pending:
+            results.append(self._receive(*pending.pop(0), stderr_merge, deadline, timeout))
+        return results
+
+    def _send(self, cmd, stderr_merge):
+        marker = gen_marker()
+        redirect = " 2>&1" if stderr_merge else ""
+        script = (
+            f"( eval {shlex.quote(cmd)}\n) </dev/null{redirect}; "
+            f"printf '\\n%s %d\\n' {marker} $?; printf '\\n%s\\n' {marker} >&2\n"
+        )
+        self.process.stdin.write(script.encode())
+        self.process.stdin.flush()
+        return marker.encode()
+
+    def _receive(self, cmd, marker, stderr_merge, deadline, timeout):
+        stdout_end = re.compile(rb"\n" + marker + rb" (\d+)\n")
+        stderr_end = b"\n" + marker + b"\n"
+        stdout_match = stdout_end.search(self.stdout)
+        stderr_pos = self.stderr.find(stderr_end)
+        while stdout_match is None or stderr_pos < 0:
+            events = self.selector.select(deadline.remaining if deadline else None)
+            if not events:
+                self.process.kill()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            for key, _ in events:
+                data = os.read(key.fd, 65536)
+                if not data:
+                    raise ExecutionError(f"persistent shell exited while executing command: {cmd}")
+                if key.fileobj is self.process.stdout:
+                    start = max(0, len(self.stdout) - len(marker) - 16)
+                    self.stdout += data
+                    if stdout_match is None:
+                        stdout_match = stdout_end.search(self.stdout, start)
+                else:
+                    start = max(0, len(self.stderr) - len(stderr_end))
+                    self.stderr += data
+                    if stderr_pos < 0:
+                        stderr_pos = self.stderr.find(stderr_end, start)
+
+        returncode = int(stdout_match.group(1))
+        stdout = bytes(self.stdout[:stdout_match.start()])
+        del self.stdout[:stdout_match.end()]
+        stderr = None if stderr_merge else bytes(self.stderr[:stderr_pos])
+        del self.stderr[:stderr_pos + len(stderr_end)]
+        return stdout, stderr, returncode
+
+    def close(self):
+        self.selector.close()
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5.0)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        self.process.stderr.close()
+
+
 @target_factory.reg_driver
 @attr.s(eq=False)
 class SSHDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
@@ -37,10 +143,12 @@ class SSHDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
     explicit_scp_mode = attr.ib(default=False, validator=attr.validators.instance_of(bool))
     username = attr.ib(default="", validator=attr.validators.instance_of(str))
     password = attr.ib(default="", validator=attr.validators.instance_of(str))
+    persistent_shell = attr.ib(default=False, validator=attr.validators.instance_of(bool))
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
         self._keepalive = None
+        self._shell = None
 
     def _get_username(self):
         """Get the username from this class or from NetworkService"""
@@ -70,6 +178,7 @@ class SSHDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
 
     def on_deactivate(self):
         try:
+            self._stop_shell()
             self._stop_keepalive()
         finally:
             self._cleanup_own_master()
@@ -203,25 +312,34 @@ class SSHDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         if not self._check_keepalive():
             raise ExecutionError("Keepalive no longer running")
 
-        complete_cmd = ["ssh", "-x", *self.ssh_prefix,
-                        "-p", str(self.networkservice.port), "-l", self._get_username(),
-                        self.networkservice.address
-                        ] + cmd.split(" ")
-        self.logger.debug("Sending command: %s", complete_cmd)
-        if self.stderr_merge:
-            stderr_pipe = subprocess.STDOUT
+        if self.persistent_shell:
+            stdout, stderr, returncode = self._run_persistent(cmd, timeout=timeout)
         else:
-            stderr_pipe = subprocess.PIPE
-        try:
-            sub = subprocess.Popen(
-                complete_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr_pipe
-            )
-        except:
-            raise ExecutionError(
-                f"error executing command: {complete_cmd}"
-            )
+            complete_cmd = ["ssh", "-x", *self.ssh_prefix,
+                            "-p", str(self.networkservice.port), "-l", self._get_username(),
+                            self.networkservice.address
+                            ] + cmd.split(" ")
+            self.logger.debug("Sending command: %s", complete_cmd)
+            if self.stderr_merge:
+                stderr_pipe = subprocess.STDOUT
+            else:
+                stderr_pipe = subprocess.PIPE
+            try:
+                sub = subprocess.Popen(
+                    complete_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr_pipe
+                )
+            except:
+                raise ExecutionError(
+                    f"error executing command: {complete_cmd}"
+                )
 
-        stdout, stderr = sub.communicate(timeout=timeout)
+            stdout, stderr = sub.communicate(timeout=timeout)
+            returncode = sub.returncode
+
+        return self._decode_result(stdout, stderr, returncode, codec, decodeerrors)
+
+    @staticmethod
+    def _decode_result(stdout, stderr, returncode, codec, decodeerrors):
         stdout = stdout.decode(codec, decodeerrors).split('\n')
         if stdout[-1] == '':
             stdout.pop()
@@ -230,7 +348,68 @@ class SSHDriver(CommandMixin, Driver, CommandProtocol, FileTransferProtocol):
         else:
             stderr = stderr.decode(codec, decodeerrors).split('\n')
             stderr.pop()
-        return (stdout, stderr, sub.returncode)
+        return (stdout, stderr, returncode)
+
+    def _run_many(self, cmds, *, timeout=30.0, codec="utf-8", decodeerrors="strict"):
+        """Execute `cmds` on the target.
+
+        With the persistent shell, the commands are pipelined through it.
+        Otherwise, they are executed concurrently in separate sessions over
+        the control master.
+        """
+        if not self._check_keepalive():
+            raise ExecutionError("Keepalive no longer running")
+
+        if self.persistent_shell:
+            results = self._run_persistent_many(cmds, timeout=timeout)
+            return [self._decode_result(*result, codec, decodeerrors) for result in results]
+
+        # the timeout applies to all commands, so commands waiting for a free
+        # session only get the remaining time
+        timeout = Timeout(float(timeout))
+
+        def run(cmd):
+            return self._run(cmd, codec=codec, decodeerrors=decodeerrors, timeout=timeout.remaining)
+
+        # stay below OpenSSH's default limit of 10 sessions per connection
+        # (one of them is used by the keepalive)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(run, cmd) for cmd in cmds]
+            return [future.result() for future in futures]
+
+    def _run_persistent(self, cmd, timeout=None):
+        """Execute `cmd` using a shell kept running via the control master.
+
+        This avoids starting a new ssh process and session for each command.
+        The shell is (re)started on demand.
+        """
+        return self._run_persistent_many([cmd], timeout=timeout)[0]
+
+    def _run_persistent_many(self, cmds, timeout=None):
+        if self._shell is not None and not self._shell.alive():
+            self.logger.info("Persistent shell exited, restarting")
+            self._stop_shell()
+        if self._shell is None:
+            args = ["ssh", "-x", *self.ssh_prefix,
+                    "-p", str(self.networkservice.port), "-l", self._get_username(),
+                    self.networkservice.address, "exec sh"]
+            self.logger.debug("Starting persistent shell: %s", args)
+            self._shell = _PersistentShell(args, self.logger)
+
+        self.logger.debug("Sending commands to persistent shell: %s", cmds)
+        try:
+            return self._shell.run_many(cmds, stderr_merge=self.stderr_merge, timeout=timeout)
+        except (subprocess.TimeoutExpired, ExecutionError):
+            # the shell's state is unknown, start a new one for the next command
+            self._stop_shell()
+            raise
+
+    def _stop_shell(self):
+        if self._shell is None:
+            return
+        shell = self._shell
+        self._shell = None
+        shell.close()
 
     def interact(self, cmd=None):
         assert cmd is None or isinstance(cmd, list)
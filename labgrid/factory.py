@@ -1,6 +1,8 @@
+import importlib
 import inspect
 
 from .exceptions import InvalidConfigError, RegistrationError
+from .registry import BUILTIN_CLASSES
 from .util.dict import filter_dict
 
 
@@ -10,6 +12,28 @@ class TargetFactory:
         self.drivers = {}
         self.all_classes = {}
 
+    def import_builtin(self, name):
+        """Import (and thereby register) the labgrid class with the given name.
+
+        This happens automatically on the first lookup of a class, so that only
+        the modules needed by a configuration are imported.
+
+        Returns True if name is a builtin class."""
+        module_name = BUILTIN_CLASSES.get(name)
+        if module_name is None:
+            return False
+        module = importlib.import_module(module_name)
+        # base classes and protocols are only registered via their subclasses
+        if name not in self.all_classes:
+            self._insert_into_all(getattr(module, name))
+        return True
+
+    def import_builtins(self):
+        """Import (and thereby register) all drivers, resources, strategies and
+        protocols included in labgrid."""
+        for name in BUILTIN_CLASSES:
+            self.import_builtin(name)
+
     def reg_resource(self, cls):
         """Register a resource with the factory.
 
@@ -116,6 +140,8 @@ class TargetFactory:
 
     def make_resource(self, target, resource, name, args):
         assert isinstance(args, dict)
+        if not resource in self.resources:
+            self.import_builtin(resource)
         if not resource in self.resources:
             raise InvalidConfigError(f"unknown resource class {resource}")
         try:
@@ -130,6 +156,8 @@ class TargetFactory:
 
     def make_driver(self, target, driver, name, args):
         assert isinstance(args, dict)
+        if not driver in self.drivers:
+            self.import_builtin(driver)
         if not driver in self.drivers:
             raise InvalidConfigError(f"unknown driver class {driver}")
         try:
@@ -160,6 +188,8 @@ class TargetFactory:
         return target
 
     def class_from_string(self, string: str):
+        if string not in self.all_classes:
+            self.import_builtin(string)
         try:
             return self.all_classes[string]
         except KeyError:
@@ -18,6 +18,14 @@ class CommandProtocol(abc.ABC):
         """
         raise NotImplementedError
 
+    def run_many(self, commands: list):
+        """
+        Run multiple commands, return a list of results as returned by run()
+
+        Drivers can override this to execute the commands more efficiently.
+        """
+        return [self.run(command) for command in commands]
+
     @abc.abstractmethod
     def get_status(self):
         """
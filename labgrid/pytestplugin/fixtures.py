@@ -5,6 +5,7 @@ import pytest
 from ..exceptions import NoResourceFoundError, NoDriverFoundError
 from ..remote.client import UserError
 from ..resource.remote import RemotePlace
+from ..util.managedfile import prefetch_images
 from ..util.ssh import sshmanager
 from ..logging import DEFAULT_FORMAT
 from .hooks import LABGRID_ENV_KEY
@@ -49,6 +50,11 @@ def pytest_addoption(parser):
         dest='lg_initial_state',
         metavar='STATE_NAME',
         help='set the strategy\'s initial state (during development)')
+    group.addoption(
+        '--lg-prefetch-images',
+        action='store_true',
+        dest='lg_prefetch_images',
+        help='copy the images to the exporters in the background when the session starts')
 
     # We would like to use a default value hook for log_format in the logging plugin,
     # similar to the approach below:
@@ -82,6 +88,8 @@ def env(request, record_testsuite_property):
                 f'TARGET_{target_name.upper()}_REMOTE', remote_name)
         except NoResourceFoundError:
             pass
+        if request.config.option.lg_prefetch_images:
+            prefetch_images(target)
 
     for name, path in env.config.get_paths().items():
         record_testsuite_property(f'PATH_{name.upper()}', path)
@@ -0,0 +1,209 @@
+"""Declarative registry of the drivers, resources, strategies and protocols
+included in labgrid.
+
+The :any:`TargetFactory` uses it to import only the modules needed by an
+environment configuration instead of all of them. The labgrid.driver,
+labgrid.resource and labgrid.strategy packages look up the modules of the
+classes they export from it as well. It must be updated when adding new
+classes, which is checked by tests/test_factory.py.
+"""
+
+BUILTIN_CLASSES = {
+    "BareboxDriver": "labgrid.driver.bareboxdriver",
+    "CommandMixin": "labgrid.driver.commandmixin",
+    "Driver": "labgrid.driver.common",
+    "ConsoleExpectMixin": "labgrid.driver.consoleexpectmixin",
+    "DediprogFlashDriver": "labgrid.driver.dediprogflashdriver",
+    "DeditecRelaisDriver": "labgrid.driver.deditecrelaisdriver",
+    "DFUDriver": "labgrid.driver.dfudriver",
+    "DockerDriver": "labgrid.driver.dockerdriver",
+    "ExternalConsoleDriver": "labgrid.driver.externalconsoledriver",
+    "AndroidFastbootDriver": "labgrid.driver.fastbootdriver",
+    "FileDigitalOutputDriver": "labgrid.driver.filedigitaloutput",
+    "FlashromDriver": "labgrid.driver.flashromdriver",
+    "FlashScriptDriver": "labgrid.driver.flashscriptdriver",
+    "GpioDigitalOutputDriver": "labgrid.driver.gpiodriver",
+    "HttpDigitalOutputDriver": "labgrid.driver.httpdigitaloutput",
+    "HTTPVideoDriver": "labgrid.driver.httpvideodriver",
+    "LXAIOBusPIODriver": "labgrid.driver.lxaiobusdriver",
+    "LXAUSBMuxDriver": "labgrid.driver.lxausbmuxdriver",
+    "ManualSwitchDriver": "labgrid.driver.manualswitchdriver",
+    "ModbusCoilDriver": "labgrid.driver.modbusdriver",
+    "ModbusRTUDriver": "labgrid.driver.modbusrtudriver",
+    "TasmotaPowerDriver": "labgrid.driver.mqtt",
+    "NetworkInterfaceDriver": "labgrid.driver.networkinterfacedriver",
+    "OneWirePIODriver": "labgrid.driver.onewiredriver",
+    "OpenOCDDriver": "labgrid.driver.openocddriver",
+    "DigitalOutputPowerDriver": "labgrid.driver.powerdriver",
+    "ExternalPowerDriver": "labgrid.driver.powerdriver",
+    "ManualPowerDriver": "labgrid.driver.powerdriver",
+    "NetworkPowerDriver": "labgrid.driver.powerdriver",
+    "PDUDaemonDriver": "labgrid.driver.powerdriver",
+    "PowerResetMixin": "labgrid.driver.powerdriver",
+    "SiSPMPowerDriver": "labgrid.driver.powerdriver",
+    "USBPowerDriver": "labgrid.driver.powerdriver",
+    "YKUSHPowerDriver": "labgrid.driver.powerdriver",
+    "BaseProviderDriver": "labgrid.driver.provider",
+    "HTTPProviderDriver": "labgrid.driver.provider",
+    "NFSProviderDriver": "labgrid.driver.provider",
+    "TFTPProviderDriver": "labgrid.driver.provider",
+    "PyVISADriver": "labgrid.driver.pyvisadriver",
+    "QEMUDriver": "labgrid.driver.qemudriver",
+    "QuartusHPSDriver": "labgrid.driver.quartushpsdriver",
+    "RawNetworkInterfaceDriver": "labgrid.driver.rawnetworkinterfacedriver",
+    "DigitalOutputResetDriver": "labgrid.driver.resetdriver",
+    "SerialPortDigitalOutputDriver": "labgrid.driver.serialdigitaloutput",
+    "SerialDriver": "labgrid.driver.serialdriver",
+    "ShellDriver": "labgrid.driver.shelldriver",
+    "SigrokCommon": "labgrid.driver.sigrokdriver",
+    "SigrokDmmDriver": "labgrid.driver.sigrokdriver",
+    "SigrokDriver": "labgrid.driver.sigrokdriver",
+    "SigrokPowerDriver": "labgrid.driver.sigrokdriver",
+    "SmallUBootDriver": "labgrid.driver.smallubootdriver",
+    "SSHDriver": "labgrid.driver.sshdriver",
+    "UBootDriver": "labgrid.driver.ubootdriver",
+    "USBAudioInputDriver": "labgrid.driver.usbaudiodriver",
+    "HIDRelayDriver": "labgrid.driver.usbhidrelay",
+    "BDIMXUSBDriver": "labgrid.driver.usbloader",
+    "IMXUSBDriver": "labgrid.driver.usbloader",
+    "MXSUSBDriver": "labgrid.driver.usbloader",
+    "RKUSBDriver": "labgrid.driver.usbloader",
+    "UUUDriver": "labgrid.driver.usbloader",
+    "USBSDMuxDriver": "labgrid.driver.usbsdmuxdriver",
+    "USBSDWireDriver": "labgrid.driver.usbsdwiredriver",
+    "NetworkUSBStorageDriver": "labgrid.driver.usbstoragedriver",
+    "USBStorageDriver": "labgrid.driver.usbstoragedriver",
+    "USBTMCDriver": "labgrid.driver.usbtmcdriver",
+    "USBVideoDriver": "labgrid.driver.usbvideodriver",
+    "XenaDriver": "labgrid.driver.xenadriver",
+    "BootstrapProtocol": "labgrid.protocol.bootstrapprotocol",
+    "CommandProtocol": "labgrid.protocol.commandprotocol",
+    "ConsoleProtocol": "labgrid.protocol.consoleprotocol",
+    "DigitalOutputProtocol": "labgrid.protocol.digitaloutputprotocol",
+    "FileSystemProtocol": "labgrid.protocol.filesystemprotocol",
+    "FileTransferProtocol": "labgrid.protocol.filetransferprotocol",
+    "InfoProtocol": "labgrid.protocol.infoprotocol",
+    "LinuxBootProtocol": "labgrid.protocol.linuxbootprotocol",
+    "MMIOProtocol": "labgrid.protocol.mmioprotocol",
+    "PowerProtocol": "labgrid.protocol.powerprotocol",
+    "ResetProtocol": "labgrid.protocol.resetprotocol",
+    "VideoProtocol": "labgrid.protocol.videoprotocol",
+    "EthernetPort": "labgrid.resource.base",
+    "NetworkInterface": "labgrid.resource.base",
+    "SerialPort": "labgrid.resource.base",
+    "SysfsGPIO": "labgrid.resource.base",
+    "ManagedResource": "labgrid.resource.common",
+    "NetworkResource": "labgrid.resource.common",
+    "Resource": "labgrid.resource.common",
+    "DediprogFlasher": "labgrid.resource.dediprogflasher",
+    "NetworkDediprogFlasher": "labgrid.resource.dediprogflasher",
+    "DockerDaemon": "labgrid.resource.docker",
+    "SNMPEthernetPort": "labgrid.resource.ethernetport",
+    "AndroidNetFastboot": "labgrid.resource.fastboot",
+    "Flashrom": "labgrid.resource.flashrom",
+    "NetworkFlashrom": "labgrid.resource.flashrom",
+    "HttpDigitalOutput": "labgrid.resource.httpdigitalout",
+    "HTTPVideoStream": "labgrid.resource.httpvideostream",
+    "LXAIOBusNode": "labgrid.resource.lxaiobus",
+    "LXAIOBusPIO": "labgrid.resource.lxaiobus",
+    "ModbusTCPCoil": "labgrid.resource.modbus",
+    "ModbusRTU": "labgrid.resource.modbusrtu",
+    "MQTTResource": "labgrid.resource.mqtt",
+    "TasmotaPowerPort": "labgrid.resource.mqtt",
+    "NetworkService": "labgrid.resource.networkservice",
+    "OneWirePIO": "labgrid.resource.onewireport",
+    "NetworkPowerPort": "labgrid.resource.power",
+    "PDUDaemonPort": "labgrid.resource.power",
+    "BaseProvider": "labgrid.resource.provider",
+    "HTTPProvider": "labgrid.resource.provider",
+    "NFSProvider": "labgrid.resource.provider",
+    "TFTPProvider": "labgrid.resource.provider",
+    "PyVISADevice": "labgrid.resource.pyvisa",
+    "NetworkAlteraUSBBlaster": "labgrid.resource.remote",
+    "NetworkAndroidFastboot": "labgrid.resource.remote",
+    "NetworkDFUDevice": "labgrid.resource.remote",
+    "NetworkDeditecRelais8": "labgrid.resource.remote",
+    "NetworkHIDRelay": "labgrid.resource.remote",
+    "NetworkIMXUSBLoader": "labgrid.resource.remote",
+    "NetworkLXAIOBusNode": "labgrid.resource.remote",
+    "NetworkLXAIOBusPIO": "labgrid.resource.remote",
+    "NetworkLXAUSBMux": "labgrid.resource.remote",
+    "NetworkMXSUSBLoader": "labgrid.resource.remote",
+    "NetworkRKUSBLoader": "labgrid.resource.remote",
+    "NetworkSiSPMPowerPort": "labgrid.resource.remote",
+    "NetworkSigrokUSBDevice": "labgrid.resource.remote",
+    "NetworkSigrokUSBSerialDevice": "labgrid.resource.remote",
+    "NetworkSysfsGPIO": "labgrid.resource.remote",
+    "NetworkUSBAudioInput": "labgrid.resource.remote",
+    "NetworkUSBDebugger": "labgrid.resource.remote",
+    "NetworkUSBFlashableDevice": "labgrid.resource.remote",
+    "NetworkUSBMassStorage": "labgrid.resource.remote",
+    "NetworkUSBPowerPort": "labgrid.resource.remote",
+    "NetworkUSBSDMuxDevice": "labgrid.resource.remote",
+    "NetworkUSBSDWireDevice": "labgrid.resource.remote",
+    "NetworkUSBTMC": "labgrid.resource.remote",
+    "NetworkUSBVideo": "labgrid.resource.remote",
+    "RemoteAndroidNetFastboot": "labgrid.resource.remote",
+    "RemoteAndroidUSBFastboot": "labgrid.resource.remote",
+    "RemoteBaseProvider": "labgrid.resource.remote",
+    "RemoteHTTPProvider": "labgrid.resource.remote",
+    "RemoteNFSProvider": "labgrid.resource.remote",
+    "RemoteNetworkInterface": "labgrid.resource.remote",
+    "RemotePlace": "labgrid.resource.remote",
+    "RemoteTFTPProvider": "labgrid.resource.remote",
+    "RemoteUSBResource": "labgrid.resource.remote",
+    "NetworkSerialPort": "labgrid.resource.serialport",
+    "RawSerialPort": "labgrid.resource.serialport",
+    "SigrokDevice": "labgrid.resource.sigrok",
+    "AlteraUSBBlaster": "labgrid.resource.udev",
+    "AndroidFastboot": "labgrid.resource.udev",
+    "AndroidUSBFastboot": "labgrid.resource.udev",
+    "DFUDevice": "labgrid.resource.udev",
+    "DeditecRelais8": "labgrid.resource.udev",
+    "HIDRelay": "labgrid.resource.udev",
+    "IMXUSBLoader": "labgrid.resource.udev",
+    "LXAUSBMux": "labgrid.resource.udev",
+    "MXSUSBLoader": "labgrid.resource.udev",
+    "MatchedSysfsGPIO": "labgrid.resource.udev",
+    "RKUSBLoader": "labgrid.resource.udev",
+    "SiSPMPowerPort": "labgrid.resource.udev",
+    "SigrokUSBDevice": "labgrid.resource.udev",
+    "SigrokUSBSerialDevice": "labgrid.resource.udev",
+    "USBAudioInput": "labgrid.resource.udev",
+    "USBDebugger": "labgrid.resource.udev",
+    "USBFlashableDevice": "labgrid.resource.udev",
+    "USBMassStorage": "labgrid.resource.udev",
+    "USBNetworkInterface": "labgrid.resource.udev",
+    "USBPowerPort": "labgrid.resource.udev",
+    "USBResource": "labgrid.resource.udev",
+    "USBSDMuxDevice": "labgrid.resource.udev",
+    "USBSDWireDevice": "labgrid.resource.udev",
+    "USBSerialPort": "labgrid.resource.udev",
+    "USBTMC": "labgrid.resource.udev",
+    "USBVideo": "labgrid.resource.udev",
+    "XenaManager": "labgrid.resource.xenamanager",
+    "NetworkYKUSHPowerPort": "labgrid.resource.ykushpowerport",
+    "YKUSHPowerPort": "labgrid.resource.ykushpowerport",
+    "BareboxStrategy": "labgrid.strategy.bareboxstrategy",
+    "Strategy": "labgrid.strategy.common",
+    "DockerStrategy": "labgrid.strategy.dockerstrategy",
+    "ShellStrategy": "labgrid.strategy.shellstrategy",
+    "UBootStrategy": "labgrid.strategy.ubootstrategy",
+}
+
+
+def package_classes(package, names):
+    """Return the modules of the builtin classes exported by package
+
+    Args:
+        package (str): name of the package, e.g. "labgrid.driver"
+        names (list): names of the exported classes
+
+    Returns:
+        dict: class name -> absolute module name, suitable for
+        :any:`lazy_attributes`
+    """
+    prefix = f"{package}."
+    classes = {name: BUILTIN_CLASSES[name] for name in names}
+    assert all(module.startswith(prefix) for module in classes.values())
+    return classes
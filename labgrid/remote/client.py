@@ -25,6 +25,7 @@ import txaio
 
 txaio.use_asyncio()
 from autobahn.asyncio.wamp import ApplicationSession
+from autobahn.wamp.exception import ApplicationError
 
 from .common import (
     ResourceEntry,
@@ -37,15 +38,16 @@ from .common import (
     enable_tcp_nodelay,
     monkey_patch_max_msg_payload_size_ws_option,
 )
-from .. import Environment, Target, target_factory
 from ..exceptions import NoDriverFoundError, NoResourceFoundError, InvalidConfigError
-from ..resource.remote import RemotePlaceManager, RemotePlace
+from ..factory import target_factory
 from ..util import diff_dict, flat_dict, filter_dict, dump, atomic_replace, labgrid_version, Timeout
 from ..util.proxy import proxymanager
 from ..util.helper import processwrapper
-from ..driver import Mode, ExecutionError
 from ..logging import basicConfig, StepLogger
 
+# Environment, Target, drivers and resources are imported only when needed,
+# to keep the startup of simple commands and shell completion fast.
+
 txaio.config.loop = asyncio.get_event_loop()  # pylint: disable=no-member
 monkey_patch_max_msg_payload_size_ws_option()
 
@@ -85,6 +87,9 @@ class ClientSession(ApplicationSession):
         self.role = self.config.extra.get("role", None)
         self.prog = self.config.extra.get("prog", os.path.basename(sys.argv[0]))
         self.monitor = self.config.extra.get("monitor", False)
+        # used by RemotePlaceManager to process already received events
+        self.messages_received = 0
+        self.events_running = 0
         enable_tcp_nodelay(self)
         self.join(
             self.config.realm,
@@ -101,24 +106,118 @@ class ClientSession(ApplicationSession):
         return "dummy-ticket"
 
     async def onJoin(self, details):
-        # FIXME race condition?
-        resources = await self.call("org.labgrid.coordinator.get_resources")
         self.resources = {}
+        self.places = {}
+        # names of the places loaded on demand, None if everything is loaded
+        self.loaded_places = None
+
+        place = self.config.extra.get("place")
+        if place:
+            self.loaded_places = set()
+            if not await self.load_place(place):
+                self.loaded_places = None
+
+        if self.loaded_places is None:
+            # FIXME race condition?
+            resources = await self.call("org.labgrid.coordinator.get_resources")
+            for exporter, groups in resources.items():
+                for group_name, group in sorted(groups.items()):
+                    for resource_name, resource in sorted(group.items()):
+                        await self.on_resource_changed(exporter, group_name, resource_name, resource)
+
+            places = await self.call("org.labgrid.coordinator.get_places")
+            for placename, config in places.items():
+                await self.on_place_changed(placename, config)
+
+        await self.subscribe(self._on_resource_event, "org.labgrid.coordinator.resource_changed")
+        await self.subscribe(self._on_place_event, "org.labgrid.coordinator.place_changed")
+        await self.connected(self)
+
+    async def load_place(self, pattern):
+        """Load only the place matching pattern and its matching resources from
+        the coordinator.
+
+        Returns False if the coordinator does not support loading single places.
+        """
+        if self.loaded_places is None or pattern in self.loaded_places:
+            return True
+
+        try:
+            config = await self.call("org.labgrid.coordinator.get_place", pattern)
+        except ApplicationError as e:
+            if e.error != ApplicationError.NO_SUCH_PROCEDURE:
+                raise
+            return False
+
+        if config:
+            name = pattern
+            self.loaded_places.add(name)
+            await self.on_place_changed(name, config)
+        else:
+            # not an exact place name, so resolve aliases and reservation
+            # tokens using the (comparatively small) list of all places
+            # all places are stored (but their resources are not loaded), so
+            # that get_place() can report ambiguous patterns
+            places = await self.call("org.labgrid.coordinator.get_places")
+            for placename, config in places.items():
+                await self._update_place(placename, config)
+            try:
+                names = self._match_places(pattern)
+            except UserError:
+                names = []
+            if pattern in names:
+                name = pattern
+            elif len(names) == 1:
+                name = names[0]
+            else:
+                # get_place() reports the error when the place is used
+                return True
+            self.loaded_places.add(name)
+
+        await self._load_place_resources(name)
+        return True
+
+    async def _load_place_resources(self, name):
+        resources = await self.call("org.labgrid.coordinator.get_place_resources", name)
         for exporter, groups in resources.items():
             for group_name, group in sorted(groups.items()):
                 for resource_name, resource in sorted(group.items()):
                     await self.on_resource_changed(exporter, group_name, resource_name, resource)
 
-        places = await self.call("org.labgrid.coordinator.get_places")
-        self.places = {}
-        for placename, config in places.items():
-            await self.on_place_changed(placename, config)
+    def _is_filtered_resource(self, exporter, group_name, resource_name, resource):
+        """Return True if the resource is not relevant for the loaded places"""
+        if self.loaded_places is None:
+            return False
+        if resource_name in self.resources.get(exporter, {}).get(group_name, {}):
+            return False
+        if not resource:
+            return True
+        resource_path = (exporter, group_name, resource["cls"], resource_name)
+        return not any(self.places[name].hasmatch(resource_path) for name in self.loaded_places)
+
+    def onMessage(self, msg):
+        self.messages_received += 1
+        super().onMessage(msg)
+
+    @contextlib.contextmanager
+    def _running_event(self):
+        self.events_running += 1
+        try:
+            yield
+        finally:
+            self.events_running -= 1
 
-        await self.subscribe(self.on_resource_changed, "org.labgrid.coordinator.resource_changed")
-        await self.subscribe(self.on_place_changed, "org.labgrid.coordinator.place_changed")
-        await self.connected(self)
+    async def _on_resource_event(self, *args):
+        with self._running_event():
+            await self.on_resource_changed(*args)
+
+    async def _on_place_event(self, *args):
+        with self._running_event():
+            await self.on_place_changed(*args)
 
     async def on_resource_changed(self, exporter, group_name, resource_name, resource):
+        if self._is_filtered_resource(exporter, group_name, resource_name, resource):
+            return
         group = self.resources.setdefault(exporter, {}).setdefault(group_name, {})
         # Do not replace the ResourceEntry object, as other components may keep
         # a reference to it and want to see changes.
@@ -128,6 +227,7 @@ class ClientSession(ApplicationSession):
         else:
             old = group[resource_name].data
             group[resource_name].data = resource
+            group[resource_name].version += 1
         if self.monitor:
             if resource and not old:
                 print(f"Resource {exporter}/{group_name}/{resource['cls']}/{resource_name} created: {resource}")
@@ -139,6 +239,11 @@ class ClientSession(ApplicationSession):
                 print(f"Resource {exporter}/{group_name}/???/{resource_name} deleted")
 
     async def on_place_changed(self, name, config):
+        if self.loaded_places is not None and name not in self.loaded_places and name not in self.places:
+            return
+        await self._update_place(name, config)
+
+    async def _update_place(self, name, config):
         if not config:
             del self.places[name]
             if self.monitor:
@@ -156,12 +261,15 @@ class ClientSession(ApplicationSession):
         else:
             place = self.places[name]
             old = flat_dict(place.asdict())
+            old_matches = place.matches
             place.update(config)
             new = flat_dict(place.asdict())
             if self.monitor:
                 print(f"Place {name} changed:")
                 for k, v_old, v_new in diff_dict(old, new):
                     print(f"  {k}: {v_old} -> {v_new}")
+            if self.loaded_places and name in self.loaded_places and place.matches != old_matches:
+                await self._load_place_resources(name)
 
     async def do_monitor(self):
         self.monitor = True
@@ -659,6 +767,8 @@ class ClientSession(ApplicationSession):
         print(dump(env))
 
     def _prepare_manager(self):
+        from ..resource.remote import RemotePlaceManager
+
         manager = RemotePlaceManager.get()
         manager.session = self
         manager.loop = self.loop
@@ -687,6 +797,9 @@ class ClientSession(ApplicationSession):
                 except NoDriverFoundError:
                     pass
         else:
+            from ..resource.remote import RemotePlace
+            from ..target import Target
+
             target = Target(place.name, env=self.env)
             RemotePlace(target, name=place.name)
         return target
@@ -1006,6 +1119,8 @@ class ClientSession(ApplicationSession):
         if action == "get":
             print(drv.get_mode())
         else:
+            from ..driver import ExecutionError
+
             try:
                 drv.set_mode(action)
             except ExecutionError as e:
@@ -1270,7 +1385,31 @@ class ClientSession(ApplicationSession):
         except FileNotFoundError as e:
             raise UserError(e)
 
+    def prefetch_images(self):
+        from ..util.managedfile import prefetch_images
+
+        if not self.env:
+            raise UserError("prefetching images requires an environment config (use -c)")
+        place = self.get_acquired_place()
+        target = self._get_target(place)
+        futures = prefetch_images(target)
+        if not futures:
+            raise UserError("no images found to prefetch")
+        failed = False
+        for (name, host), future in futures.items():
+            try:
+                future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"failed to copy image {name} to {host}: {e}", file=sys.stderr)
+                failed = True
+            else:
+                print(f"copied image {name} to {host}")
+        if failed:
+            raise UserError("not all images could be copied")
+
     def write_image(self):
+        from ..driver.usbstoragedriver import Mode
+
         place = self.get_acquired_place()
         target = self._get_target(place)
         name = self.args.name
@@ -1284,7 +1423,7 @@ class ClientSession(ApplicationSession):
                 partition=self.args.partition,
                 skip=self.args.skip,
                 seek=self.args.seek,
-                mode=self.args.write_mode,
+                mode=Mode(self.args.write_mode),
             )
         except subprocess.CalledProcessError as e:
             raise UserError(f"could not write image to network usb storage: {e}")
@@ -1378,6 +1517,47 @@ class ClientSession(ApplicationSession):
         print(labgrid_version())
 
 
+SINGLE_PLACE_COMMANDS = {
+    ClientSession.print_place,
+    ClientSession.add_alias,
+    ClientSession.del_alias,
+    ClientSession.set_comment,
+    ClientSession.set_tags,
+    ClientSession.add_match,
+    ClientSession.del_match,
+    ClientSession.add_named_match,
+    ClientSession.acquire,
+    ClientSession.release,
+    ClientSession.release_from,
+    ClientSession.allow,
+    ClientSession.print_env,
+    ClientSession.power,
+    ClientSession.digital_io,
+    ClientSession.console,
+    ClientSession.dfu,
+    ClientSession.fastboot,
+    ClientSession.flashscript,
+    ClientSession.bootstrap,
+    ClientSession.sd_mux,
+    ClientSession.usb_mux,
+    ClientSession.ssh,
+    ClientSession.scp,
+    ClientSession.rsync,
+    ClientSession.sshfs,
+    ClientSession.forward,
+    ClientSession.telnet,
+    ClientSession.video,
+    ClientSession.audio,
+    ClientSession.tmc_command,
+    ClientSession.tmc_query,
+    ClientSession.tmc_screen,
+    ClientSession.tmc_channel,
+    ClientSession.write_files,
+    ClientSession.write_image,
+    ClientSession.export,
+}
+
+
 def start_session(url, realm, extra):
     from autobahn.asyncio.wamp import ApplicationRunner
 
@@ -1810,15 +1990,19 @@ def main():
     subparser.add_argument(
         "--mode",
         dest="write_mode",
-        type=Mode,
-        choices=Mode,
-        default=Mode.DD,
+        choices=["dd", "bmaptool"],
+        default="dd",
         help="Choose tool for writing images (default: %(default)s)",
     )
     subparser.add_argument("--name", "-n", help="optional resource name")
     subparser.add_argument("filename", help="filename to boot on the target")
     subparser.set_defaults(func=ClientSession.write_image)
 
+    subparser = subparsers.add_parser(
+        "prefetch-images", help="copy the images from the environment config to the exporters"
+    )
+    subparser.set_defaults(func=ClientSession.prefetch_images)
+
     subparser = subparsers.add_parser("reserve", help="create a reservation")
     subparser.add_argument("--wait", action="store_true", help="wait until the reservation is allocated")
     subparser.add_argument("--shell", action="store_true", help="format output as shell variables")
@@ -1882,6 +2066,8 @@ def main():
 
     env = None
     if args.config:
+        from ..environment import Environment
+
         env = Environment(config_file=args.config)
 
     role = None
@@ -1907,6 +2093,14 @@ def main():
         "prog": parser.prog,
     }
 
+    # commands operating on a single place only need that place and its
+    # matching resources from the coordinator
+    if args.place and (
+        getattr(args, "func", None) in SINGLE_PLACE_COMMANDS
+        or (args.command == "complete" and args.type in ["matches", "match-names"])
+    ):
+        extra["place"] = args.place
+
     if args.command and args.command != "help":
         exitcode = 0
         try:
@@ -32,6 +32,9 @@ class ResourceEntry:
     def __attrs_post_init__(self):
         self.data.setdefault("acquired", None)
         self.data.setdefault("avail", False)
+        # incremented whenever the data is replaced, consumers (such as the
+        # RemotePlaceManager) remember the version they have applied last
+        self.version = 0
 
     @property
     def acquired(self):
@@ -75,6 +78,7 @@ class ResourceEntry:
         data.setdefault("acquired", None)
         data.setdefault("avail", False)
         self.data = data
+        self.version += 1
 
     def acquire(self, place_name):
         assert self.data["acquired"] is None
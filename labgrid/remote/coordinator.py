@@ -183,6 +183,8 @@ class CoordinatorComponent(ApplicationSession):
             self.allow_place, "org.labgrid.coordinator.allow_place", options=RegisterOptions(details_arg="details")
         )
         await self.register(self.get_places, "org.labgrid.coordinator.get_places")
+        await self.register(self.get_place, "org.labgrid.coordinator.get_place")
+        await self.register(self.get_place_resources, "org.labgrid.coordinator.get_place_resources")
 
         # reservations
         await self.register(
@@ -710,6 +712,35 @@ class CoordinatorComponent(ApplicationSession):
     async def get_places(self, details=None):
         return self._get_places()
 
+    @locked
+    async def get_place(self, name, details=None):
+        """Return a single place by its exact name, None if it doesn't exist"""
+        place = self.places.get(name)
+        if place is None:
+            return None
+        return place.asdict()
+
+    def _get_place_resources(self, place):
+        result = {}
+        for session in self.sessions.values():
+            if not isinstance(session, ExporterSession):
+                continue
+            for groupname, group in session.groups.items():
+                for resourcename, resource in group.items():
+                    if not place.hasmatch(resource.path):
+                        continue
+                    result_group = result.setdefault(session.name, {}).setdefault(groupname, {})
+                    result_group[resourcename] = resource.asdict()
+        return result
+
+    @locked
+    async def get_place_resources(self, name, details=None):
+        """Return only the resources matched by the given place"""
+        place = self.places.get(name)
+        if place is None:
+            return {}
+        return self._get_place_resources(place)
+
     def schedule_reservations(self):
         # The primary information is stored in the reservations and the places
         # only have a copy for convenience.
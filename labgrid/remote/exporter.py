@@ -10,8 +10,11 @@ import os.path
 import time
 import traceback
 import shutil
+import signal
 import subprocess
+import tempfile
 import warnings
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Type
 from socket import gethostname, getfqdn
@@ -20,6 +23,7 @@ from autobahn.asyncio.wamp import ApplicationRunner, ApplicationSession
 
 from .config import ResourceConfig
 from .common import ResourceEntry, enable_tcp_nodelay, monkey_patch_max_msg_payload_size_ws_option
+from .serialserver import SerialServer
 from ..util import get_free_port, labgrid_version
 
 
@@ -50,6 +54,109 @@ def log_subprocess_kernel_stack(logger, child):
     logger.info("current kernel stack of %s is:\n%s", child.args, stack)
 
 
+def terminate_subprocess(logger, child, description):
+    """Terminate a child process, escalating to SIGKILL if it does not react."""
+    child.terminate()
+    try:
+        child.wait(2.0)
+    except subprocess.TimeoutExpired:
+        logger.warning("%s still running after SIGTERM", description)
+        log_subprocess_kernel_stack(logger, child)
+        child.kill()
+        child.wait(1.0)
+
+
+def terminate_subprocess_background(logger, child, description):
+    """Terminate a child process without blocking the running event loop.
+
+    Falls back to terminating synchronously if no event loop is running.
+    Returns the future which completes once the child has exited, or None.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        terminate_subprocess(logger, child, description)
+        return None
+    return loop.run_in_executor(None, terminate_subprocess, logger, child, description)
+
+
+@lru_cache(maxsize=None)
+def get_ser2net_version(ser2net_bin):
+    """Return the version of the given ser2net binary as a tuple.
+
+    The result is cached, so ser2net is only executed once per binary.
+    """
+    result = subprocess.run([ser2net_bin, "-v"], capture_output=True, text=True)
+    _, _, version = str(result.stdout).split(" ")
+    version = tuple(map(int, version.strip().split(".")))
+
+    # There is a bug in ser2net between 4.4.0 and 4.6.1 where it
+    # returns 1 on a successful call to 'ser2net -v'. We don't want
+    # a failure because of this, so raise an error only if ser2net
+    # is not one of those versions.
+    if version not in [(4, 4, 0), (4, 5, 0), (4, 5, 1), (4, 6, 0), (4, 6, 1)] and result.returncode == 1:
+        raise ExporterError(f"ser2net {version} returned a nonzero code during version check.")
+
+    return version
+
+
+def is_tcp_port_listening(port):
+    """Return True if a local socket is listening on the given TCP port.
+
+    This reads the kernel's socket tables instead of connecting to the port,
+    as a connection to ser2net opens the serial port, which may toggle the
+    modem control lines of the device.
+    """
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                next(f)  # header
+                for line in f:
+                    fields = line.split()
+                    # local_address is "<address>:<port>" in hex, 0A is LISTEN
+                    if fields[3] == "0A" and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+@attr.s(eq=False)
+class RestartBackoff:
+    """Tracks the unexpected exits of a supervised process.
+
+    Each restart is delayed exponentially longer, until max_failures exits
+    happened in a row. A process which was running for at least maximum
+    seconds resets the count.
+    """
+
+    initial = attr.ib(default=0.5, validator=attr.validators.instance_of(float))
+    maximum = attr.ib(default=30.0, validator=attr.validators.instance_of(float))
+    max_failures = attr.ib(default=5, validator=attr.validators.instance_of(int))
+
+    def __attrs_post_init__(self):
+        self.failures = 0
+        self.delay = 0.0
+        self.next_start = 0.0
+
+    def failed(self, runtime):
+        """Record an exit after runtime seconds.
+
+        Returns:
+            bool: False if the process should not be restarted anymore
+        """
+        if runtime >= self.maximum:
+            self.failures = 0
+        self.failures += 1
+        self.delay = min(self.initial * 2 ** (self.failures - 1), self.maximum)
+        self.next_start = time.monotonic() + self.delay
+        return self.failures < self.max_failures
+
+    @property
+    def waiting(self):
+        return time.monotonic() < self.next_start
+
+
 @attr.s(eq=False)
 class ResourceExport(ResourceEntry):
     """Represents a local resource exported via a specific protocol.
@@ -99,6 +206,13 @@ class ResourceExport(ResourceEntry):
     def _get_params(self):
         return {}
 
+    def _get_avail(self):
+        return self.local.avail and not self.broken
+
+    def _may_start(self):
+        """Return False to delay starting until a later poll"""
+        return True
+
     def _start(self, start_params):
         """Start exporting the local resource"""
         pass
@@ -137,7 +251,8 @@ class ResourceExport(ResourceEntry):
         elif self.local.avail and self.acquired:
             start_params = self._get_start_params()
             if self.start_params is None:
-                self.start()
+                if self._may_start():
+                    self.start()
             elif self.start_params != start_params:
                 self.logger.info("restart needed (%s -> %s)", self.start_params, start_params)
                 self.stop()
@@ -148,8 +263,9 @@ class ResourceExport(ResourceEntry):
 
         # check if resulting information has changed
         dirty = False
-        if self.avail != (self.local.avail and not self.broken):
-            self.data["avail"] = self.local.avail and not self.broken
+        avail = self._get_avail()
+        if self.avail != avail:
+            self.data["avail"] = avail
             dirty = True
         params = self._get_params()
         if not params.get("extra"):
@@ -179,7 +295,15 @@ class ResourceExport(ResourceEntry):
 
 @attr.s(eq=False)
 class SerialPortExport(ResourceExport):
-    """ResourceExport for a USB or Raw SerialPort"""
+    """ResourceExport for a USB or Raw SerialPort
+
+    The port is only reported as available once ser2net is listening on it.
+    """
+
+    # ser2net not listening within this time after start is treated as a failure
+    READY_TIMEOUT = 10.0
+
+    uses_ser2net = True
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
@@ -193,7 +317,15 @@ class SerialPortExport(ResourceExport):
             self.local = USBSerialPort(target=None, name=None, **self.local_params)
         self.data["cls"] = "NetworkSerialPort"
         self.child = None
+        self.child_started = None
+        self.stopping = None
         self.port = None
+        self.listening = False
+        self.ready_task = None
+        self.backoff = RestartBackoff()
+        self.ser2net_bin = None
+        if not self.uses_ser2net:
+            return
         self.ser2net_bin = shutil.which("ser2net")
         if self.ser2net_bin is None:
             if os.path.isfile("/usr/sbin/ser2net"):
@@ -223,24 +355,64 @@ class SerialPortExport(ResourceExport):
             },
         }
 
+    def _get_avail(self):
+        # while acquired, clients can only connect once ser2net is listening
+        return super()._get_avail() and (not self.acquired or self.listening)
+
+    def _may_start(self):
+        return not self.backoff.waiting
+
+    def _check_listening(self):
+        if not self.listening and is_tcp_port_listening(self.port):
+            self.listening = True
+            self.logger.info("%s is listening on port %d", self.local.port, self.port)
+        return self.listening
+
+    async def _wait_listening(self):
+        """Wait until the serial port is served on self.port"""
+        deadline = time.monotonic() + self.READY_TIMEOUT
+        while not self._check_listening():
+            if time.monotonic() > deadline:
+                self.logger.warning("%s is not listening on port %d after %.1fs",
+                                    self.local.port, self.port, self.READY_TIMEOUT)
+                if self.child is not None:
+                    # handled like an unexpected exit by poll()
+                    self.child.terminate()
+                return
+            await asyncio.sleep(0.05)
+
+    def _watch_listening(self):
+        """Start waiting for the port to accept connections
+
+        Without a running event loop, this is checked by :meth:`poll` instead.
+        """
+        self._unwatch_listening()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.ready_task = loop.create_task(self._wait_listening())
+
+    def _unwatch_listening(self):
+        if self.ready_task is not None:
+            self.ready_task.cancel()
+            self.ready_task = None
+        self.listening = False
+
     def _start(self, start_params):
-        """Start ``ser2net`` subprocess"""
+        """Start ``ser2net`` subprocess
+
+        This does not wait for ser2net to come up, instead the child is
+        supervised by :meth:`poll` and the port is published as available once
+        ser2net listens on it.
+        """
         assert self.local.avail
         assert self.child is None
         assert start_params["path"].startswith("/dev/")
         self.port = get_free_port()
 
         # Ser2net has switched to using YAML format at version 4.0.0.
-        result = subprocess.run([self.ser2net_bin, "-v"], capture_output=True, text=True)
-        _, _, version = str(result.stdout).split(" ")
-        version = tuple(map(int, version.strip().split(".")))
-
-        # There is a bug in ser2net between 4.4.0 and 4.6.1 where it
-        # returns 1 on a successful call to 'ser2net -v'. We don't want
-        # a failure because of this, so raise an error only if ser2net
-        # is not one of those versions.
-        if version not in [(4, 4, 0), (4, 5, 0), (4, 5, 1), (4, 6, 0), (4, 6, 1)] and result.returncode == 1:
-            raise ExporterError(f"ser2net {version} returned a nonzero code during version check.")
+        version = get_ser2net_version(self.ser2net_bin)
 
         if version >= (4, 2, 0):
             cmd = [
@@ -267,35 +439,271 @@ class SerialPortExport(ResourceExport):
             ]
         self.logger.info("Starting ser2net with: %s", " ".join(cmd))
         self.child = subprocess.Popen(cmd)
-        try:
-            self.child.wait(timeout=0.5)
-            raise ExporterError(f"ser2net for {start_params['path']} exited immediately")
-        except subprocess.TimeoutExpired:
-            # good, ser2net didn't exit immediately
-            pass
+        self.child_started = time.monotonic()
+        self._watch_listening()
         self.logger.info("started ser2net for %s on port %d", start_params["path"], self.port)
 
     def _stop(self, start_params):
-        """Stop ``ser2net`` subprocess"""
+        """Stop ``ser2net`` subprocess
+
+        If called from the exporter's event loop, ser2net is terminated in the
+        background.
+        """
         assert self.child
+        self._unwatch_listening()
         child = self.child
         self.child = None
         port = self.port
         self.port = None
-        child.terminate()
-        try:
-            child.wait(2.0)  # ser2net takes about a second to react
-        except subprocess.TimeoutExpired:
-            self.logger.warning("ser2net for %s still running after SIGTERM", start_params["path"])
-            log_subprocess_kernel_stack(self.logger, child)
-            child.kill()
-            child.wait(1.0)
+        self.stopping = terminate_subprocess_background(self.logger, child, f"ser2net for {start_params['path']}")
         self.logger.info("stopped ser2net for %s on port %d", start_params["path"], port)
 
+    def poll(self):
+        # supervise a running ser2net
+        if self.child is not None and self.child.poll() is not None:
+            path = self.start_params["path"]
+            returncode = self.child.returncode
+            self._unwatch_listening()
+            self.child = None
+            self.port = None
+            self.start_params = None
+            if self.backoff.failed(time.monotonic() - self.child_started):
+                self.logger.warning("ser2net for %s exited with %d, restarting in %.1fs",
+                                    path, returncode, self.backoff.delay)
+            else:
+                self.broken = f"ser2net for {path} exited {self.backoff.failures} times"
+        if self.port is not None and (self.ready_task is None or self.ready_task.done()):
+            self._check_listening()
+        return super().poll()
+
+
+@attr.s(eq=False)
+class Ser2NetServer:
+    """A single ser2net process serving all serial ports of an exporter.
+
+    The connections are written to a generated YAML configuration file, which
+    ser2net rereads on SIGHUP. ser2net is only running while at least one
+    connection is configured. If ser2net exits unexpectedly, it is restarted
+    with a backoff, until it failed too often and the server is marked broken.
+    """
+
+    instances: "Dict[str, Ser2NetServer]" = {}
+
+    # time after starting ser2net before it can be reloaded via SIGHUP
+    STARTUP_TIMEOUT = 0.5
+
+    ser2net_bin = attr.ib(validator=attr.validators.instance_of(str))
+
+    @classmethod
+    def get(cls, ser2net_bin):
+        instance = cls.instances.get(ser2net_bin)
+        if instance is None:
+            instance = cls(ser2net_bin)
+            cls.instances[ser2net_bin] = instance
+        return instance
+
+    def __attrs_post_init__(self):
+        self.logger = logging.getLogger(f"Ser2NetServer({self.ser2net_bin})")
+        self.connections = {}
+        self.child = None
+        self.child_started = None
+        self.reload_pending = False
+        self.stopping = None
+        self.backoff = RestartBackoff()
+        self.broken = None
+        self.config_dir = tempfile.TemporaryDirectory(prefix="labgrid-ser2net-")
+        # ser2net expects YAML configuration files to end with .yaml
+        self.config_file = Path(self.config_dir.name) / "ser2net.yaml"
+
+    def _write_config(self):
+        lines = []
+        for path, (port, speed) in sorted(self.connections.items()):
+            lines += [
+                f"connection: &con{port}",
+                f"  accepter: telnet(rfc2217,mode=server),tcp,{port}",
+                f"  connector: serialdev(nouucplock=true),{path},{speed}n81,local",
+                "  options:",
+                "    max-connections: 10",
+                "",
+            ]
+        tmp_file = self.config_file.with_suffix(".tmp")
+        tmp_file.write_text("\n".join(lines))
+        tmp_file.replace(self.config_file)
+
+    def _update(self):
+        """Apply the current connections, (re)starting or stopping ser2net as needed"""
+        if not self.connections:
+            if self.child is not None:
+                child = self.child
+                self.child = None
+                self.reload_pending = False
+                self.stopping = terminate_subprocess_background(self.logger, child, "ser2net")
+                self.logger.info("stopped ser2net")
+            return
+
+        self._write_config()
+        if self.child is None:
+            if self.backoff.waiting:
+                return  # started by poll()
+            cmd = [self.ser2net_bin, "-d", "-n", "-c", str(self.config_file)]
+            self.logger.info("Starting ser2net with: %s", " ".join(cmd))
+            self.child = subprocess.Popen(cmd)
+            self.child_started = time.monotonic()
+            self.reload_pending = False
+        elif time.monotonic() - self.child_started < self.STARTUP_TIMEOUT:
+            # ser2net may not have installed its signal handlers yet
+            self.reload_pending = True
+        else:
+            self.child.send_signal(signal.SIGHUP)
+            self.reload_pending = False
+
+    def add(self, path, port, speed):
+        """Export the serial port at path on the given TCP port"""
+        version = get_ser2net_version(self.ser2net_bin)
+        if version < (4, 2, 0):
+            raise ExporterError(f"ser2net {version} does not support YAML configuration files")
+        if self.broken:
+            raise ExporterError(f"shared ser2net is broken: {self.broken}")
+        assert path not in self.connections
+        self.connections[path] = (port, speed)
+        self._update()
+        self.logger.info("added %s on port %d", path, port)
+
+    def remove(self, path):
+        """Stop exporting the serial port at path"""
+        port, _ = self.connections.pop(path)
+        self._update()
+        self.logger.info("removed %s on port %d", path, port)
+
+    def stop(self):
+        """Remove all serial ports and stop ser2net"""
+        self.connections.clear()
+        self._update()
+
+    def poll(self):
+        """Restart ser2net if it exited unexpectedly and apply pending reloads"""
+        if self.broken:
+            return
+        if self.child is not None and self.child.poll() is not None:
+            returncode = self.child.returncode
+            self.child = None
+            if not self.backoff.failed(time.monotonic() - self.child_started):
+                self.broken = f"ser2net exited {self.backoff.failures} times"
+                self.logger.error("marked as broken: %s", self.broken)
+                return
+            self.logger.warning("ser2net exited with %d, restarting in %.1fs", returncode, self.backoff.delay)
+        if self.child is None:
+            if self.connections and not self.backoff.waiting:
+                self._update()
+        elif self.reload_pending:
+            self._update()
+
+
+@attr.s(eq=False)
+class SharedSer2NetSerialPortExport(SerialPortExport):
+    """SerialPortExport using a single ser2net process for all serial ports"""
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self.server = None
+        self.server_child = None
+
+    def _start(self, start_params):
+        """Add the serial port to the shared ``ser2net``"""
+        assert self.local.avail
+        assert start_params["path"].startswith("/dev/")
+        self.port = get_free_port()
+        self.server = Ser2NetServer.get(self.ser2net_bin)
+        self.server.add(start_params["path"], self.port, self.local.speed)
+        self.server_child = self.server.child
+        self._watch_listening()
+
+    def _stop(self, start_params):
+        """Remove the serial port from the shared ``ser2net``"""
+        self._unwatch_listening()
+        self.server.remove(start_params["path"])
+        self.port = None
+
+    def poll(self):
+        if self.start_params is not None and not self.broken:
+            self.server.poll()
+            if self.server.broken:
+                self.broken = f"shared ser2net is broken: {self.server.broken}"
+            elif self.server.child is not self.server_child:
+                # ser2net was restarted, so wait for it to listen again
+                self.server_child = self.server.child
+                self._watch_listening()
+        return super().poll()
+
+
+@attr.s(eq=False)
+class BuiltinSerialPortExport(SerialPortExport):
+    """SerialPortExport using the built-in SerialServer instead of ser2net
+
+    The most recent console output is available via the history port published
+    in the extra params.
+    """
+
+    uses_ser2net = False
+    protocol = "rfc2217"
+
+    history_size = attr.ib(default=64 * 1024, validator=attr.validators.instance_of(int))
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self.server = None
+
+    def __del__(self):
+        if self.server is not None:
+            self.stop()
+
+    def _get_params(self):
+        params = super()._get_params()
+        params["protocol"] = self.protocol
+        params["extra"]["history_port"] = self.server.history_port if self.server else None
+        return params
+
+    def _start(self, start_params):
+        """Start serving the serial port from the exporter's event loop"""
+        assert self.local.avail
+        assert self.server is None
+        assert start_params["path"].startswith("/dev/")
+        server = SerialServer(
+            start_params["path"], self.local.speed, protocol=self.protocol, history_size=self.history_size
+        )
+        server.start()
+        self.server = server
+        self.port = server.port
+        self.listening = True
+
+    def _stop(self, start_params):
+        """Stop serving the serial port"""
+        assert self.server
+        server = self.server
+        self.server = None
+        self.port = None
+        self.listening = False
+        server.stop()
+
+
+@attr.s(eq=False)
+class BuiltinRawSerialPortExport(BuiltinSerialPortExport):
+    """BuiltinSerialPortExport using a raw TCP connection instead of RFC 2217"""
+
+    protocol = "raw"
+
 
 exports["USBSerialPort"] = SerialPortExport
 exports["RawSerialPort"] = SerialPortExport
 
+# selected by the exporter's --serial-server option
+serial_exports: Dict[str, Type[SerialPortExport]] = {
+    "ser2net": SerialPortExport,
+    "ser2net-shared": SharedSer2NetSerialPortExport,
+    "builtin": BuiltinSerialPortExport,
+    "builtin-raw": BuiltinRawSerialPortExport,
+}
+
 
 @attr.s(eq=False)
 class NetworkInterfaceExport(ResourceExport):
@@ -782,6 +1190,8 @@ class ExporterSession(ApplicationSession):
         self.name = self.config.extra["name"]
         self.hostname = self.config.extra["hostname"]
         self.isolated = self.config.extra["isolated"]
+        self.serial_server = self.config.extra["serial_server"]
+        self.console_history_size = self.config.extra["console_history_size"]
         self.address = self._transport.transport.get_extra_info("sockname")[0]
         self.checkpoint = time.monotonic()
         self.poll_task = None
@@ -848,6 +1258,7 @@ class ExporterSession(ApplicationSession):
         if self.poll_task:
             self.poll_task.cancel()
             await asyncio.wait([self.poll_task])
+        await self._stop_resources()
         super().onLeave(details)
 
     async def onDisconnect(self):
@@ -858,8 +1269,30 @@ class ExporterSession(ApplicationSession):
             self.poll_task.cancel()
             await asyncio.wait([self.poll_task])
             await asyncio.sleep(0.5)  # give others a chance to clean up
+        await self._stop_resources()
         self.loop.stop()
 
+    async def _stop_resources(self):
+        """Stop all exported resources and wait for their ser2net processes to exit"""
+        stopping = []
+        for group in self.groups.values():
+            for resource in group.values():
+                if not isinstance(resource, ResourceExport) or resource.broken:
+                    continue
+                if resource.start_params is not None:
+                    try:
+                        resource.stop()
+                    except Exception:  # pylint: disable=broad-except
+                        traceback.print_exc(file=sys.stderr)
+                if isinstance(resource, SerialPortExport) and resource.stopping:
+                    stopping.append(resource.stopping)
+        for server in Ser2NetServer.instances.values():
+            server.stop()
+            if server.stopping:
+                stopping.append(server.stopping)
+        if stopping:
+            await asyncio.wait(stopping)
+
     async def acquire(self, group_name, resource_name, place_name):
         resource = self.groups[group_name][resource_name]
         try:
@@ -915,13 +1348,23 @@ class ExporterSession(ApplicationSession):
         group = self.groups.setdefault(group_name, {})
         assert resource_name not in group
         export_cls = exports.get(cls, ResourceEntry)
+        if export_cls is SerialPortExport:
+            export_cls = serial_exports[self.serial_server]
         config = {
             "avail": export_cls is ResourceEntry,
             "cls": cls,
             "params": params,
         }
         proxy_req = self.isolated
-        if issubclass(export_cls, ResourceExport):
+        if issubclass(export_cls, BuiltinSerialPortExport):
+            group[resource_name] = export_cls(
+                config,
+                host=self.hostname,
+                proxy=getfqdn(),
+                proxy_required=proxy_req,
+                history_size=self.console_history_size,
+            )
+        elif issubclass(export_cls, ResourceExport):
             group[resource_name] = export_cls(config, host=self.hostname, proxy=getfqdn(), proxy_required=proxy_req)
         else:
             config["params"]["extra"] = {
@@ -975,6 +1418,20 @@ def main():
         default=False,
         help="enable isolated mode (always request SSH forwards)",
     )
+    parser.add_argument(
+        "--serial-server",
+        choices=list(serial_exports),
+        default="ser2net",
+        help="how to export serial ports: one ser2net process per port (default), a single shared ser2net process "
+        "or the built-in server using RFC 2217 or raw TCP",
+    )
+    parser.add_argument(
+        "--console-history-size",
+        metavar="BYTES",
+        type=int,
+        default=64 * 1024,
+        help="number of bytes of console output kept by the built-in serial server (default: %(default)s)",
+    )
     parser.add_argument("resources", metavar="RESOURCES", type=str, help="resource config file name")
 
     args = parser.parse_args()
@@ -986,6 +1443,8 @@ def main():
         "hostname": args.hostname or (getfqdn() if args.fqdn else gethostname()),
         "resources": args.resources,
         "isolated": args.isolated,
+        "serial_server": args.serial_server,
+        "console_history_size": args.console_history_size,
     }
 
     crossbar_url = args.crossbar
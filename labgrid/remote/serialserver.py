@@ -0,0 +1,280 @@
+"""The remote.serialserver module implements an asyncio based server which
+exports a local serial port via RFC 2217 or raw TCP, as an alternative to
+ser2net."""
+
+import asyncio
+import logging
+import os
+import socket
+
+import attr
+import serial
+import serial.rfc2217
+
+__all__ = [
+    "RingBuffer",
+    "SerialServer",
+]
+
+
+@attr.s(eq=False)
+class RingBuffer:
+    """Stores the last size bytes written to it
+
+    Args:
+        size (int): maximum number of bytes to keep
+    """
+
+    size = attr.ib(default=64 * 1024, validator=attr.validators.instance_of(int))
+
+    def __attrs_post_init__(self):
+        self.data = bytearray()
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        self.data += data
+        if len(self.data) > self.size:
+            del self.data[: len(self.data) - self.size]
+
+    def read(self, size=None):
+        """Return the last size bytes (or all stored bytes if size is None)"""
+        if size is None or size >= len(self.data):
+            return bytes(self.data)
+        return bytes(self.data[len(self.data) - size :])
+
+
+class _PortManager(serial.rfc2217.PortManager):
+    # some devices (such as ptys) have no modem lines, so ignore errors when
+    # accessing them
+
+    def check_modem_lines(self, force_notification=False):
+        try:
+            super().check_modem_lines(force_notification)
+        except OSError:
+            pass
+
+    def _telnet_process_subnegotiation(self, suboption):
+        try:
+            super()._telnet_process_subnegotiation(suboption)
+        except OSError as e:
+            self.logger.debug("ignoring failed RFC 2217 option: %s", e)
+
+
+class _SerialClient:
+    """A TCP connection to a SerialServer"""
+
+    def __init__(self, server, writer):
+        self.writer = writer
+        self.port_manager = None
+        if server.protocol == "rfc2217":
+            self.port_manager = _PortManager(server.serial, self, server.logger)
+
+    def write(self, data):
+        """Write data unmodified, used by the PortManager for telnet negotiation"""
+        self.writer.write(data)
+
+    def send(self, data):
+        """Send data from the serial port to the client"""
+        if self.port_manager:
+            data = data.replace(serial.rfc2217.IAC, serial.rfc2217.IAC_DOUBLED)
+        self.writer.write(data)
+
+    def filter(self, data):
+        """Return the data received from the client which should be written to
+        the serial port"""
+        pm = self.port_manager
+        if pm is None:
+            return data
+        if pm.mode == serial.rfc2217.M_NORMAL and pm.suboption is None and serial.rfc2217.IAC not in data:
+            return data
+        return b"".join(pm.filter(data))
+
+
+@attr.s(eq=False)
+class SerialServer:
+    """Exports a local serial port via TCP using RFC 2217 or a raw connection
+
+    Multiple clients can be connected at the same time. Data received from the
+    serial port is sent to all clients and stored in a ring buffer, data
+    received from any client is written to the serial port.
+
+    The contents of the ring buffer are sent to clients connecting to the
+    history port, which is closed afterwards.
+
+    Args:
+        path (str): path of the serial port device
+        speed (int): baud rate of the serial port
+        protocol (str): "rfc2217" or "raw"
+        host (str): address to listen on, defaults to all addresses
+        port (int): TCP port to listen on, defaults to a free port
+        history_size (int): size of the ring buffer in bytes, 0 disables the
+            history port
+    """
+
+    # clients not consuming data fast enough are disconnected
+    MAX_CLIENT_BUFFER = 1024 * 1024
+    # clients are not read from while more data is waiting for the serial port
+    MAX_SERIAL_BUFFER = 64 * 1024
+
+    path = attr.ib(validator=attr.validators.instance_of(str))
+    speed = attr.ib(default=115200, validator=attr.validators.instance_of(int))
+    protocol = attr.ib(default="rfc2217", validator=attr.validators.in_(["rfc2217", "raw"]))
+    host = attr.ib(default="", validator=attr.validators.instance_of(str))
+    port = attr.ib(default=0, validator=attr.validators.instance_of(int))
+    history_size = attr.ib(default=64 * 1024, validator=attr.validators.instance_of(int))
+
+    def __attrs_post_init__(self):
+        self.logger = logging.getLogger(f"SerialServer({self.path})")
+        self.loop = None
+        self.serial = None
+        self.socks = []
+        self.server_tasks = []
+        self.history_port = None
+        self.clients = set()
+        self.tx_buffer = bytearray()
+        self.tx_drained = None
+        self.tx_waiting = False
+        self.history = RingBuffer(self.history_size)
+        self.rx_bytes = 0  # received from the serial port
+        self.tx_bytes = 0  # written to the serial port
+
+    def start(self):
+        """Open the serial port and start listening
+
+        Must be called from a running event loop. The actual TCP ports are
+        available in the port and history_port attributes afterwards.
+        """
+        assert self.serial is None
+        self.loop = asyncio.get_running_loop()
+        self.tx_drained = asyncio.Event()
+        self.serial = serial.Serial(self.path, self.speed, timeout=0, write_timeout=0)
+        try:
+            self._listen(self.port, self._handle_client)
+            self.port = self.socks[0].getsockname()[1]
+            if self.history_size:
+                self._listen(0, self._handle_history_client)
+                self.history_port = self.socks[1].getsockname()[1]
+        except OSError:
+            self._close()
+            raise
+        self.loop.add_reader(self.serial.fileno(), self._read_serial)
+        self.logger.info("serving %s on port %d", self.protocol, self.port)
+
+    def stop(self):
+        """Disconnect all clients, stop listening and close the serial port"""
+        assert self.serial is not None
+        self.loop.remove_reader(self.serial.fileno())
+        if self.tx_waiting:
+            self.loop.remove_writer(self.serial.fileno())
+            self.tx_waiting = False
+        self.tx_buffer.clear()
+        self.tx_drained.set()
+        for client in self.clients:
+            client.writer.close()
+        self.clients.clear()
+        self._close()
+        self.logger.info("stopped serving on port %d (%d bytes received, %d bytes sent)",
+                         self.port, self.rx_bytes, self.tx_bytes)
+
+    def _listen(self, port, handler):
+        sock = socket.create_server((self.host, port))
+        self.socks.append(sock)
+        self.server_tasks.append(self.loop.create_task(asyncio.start_server(handler, sock=sock)))
+
+    def _close(self):
+        for task in self.server_tasks:
+            if task.done() and not task.cancelled():
+                task.result().close()
+            else:
+                task.cancel()
+        self.server_tasks = []
+        for sock in self.socks:
+            sock.close()
+        self.socks = []
+        self.serial.close()
+        self.serial = None
+
+    def _read_serial(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except serial.SerialException:
+            self.logger.exception("failed to read from %s", self.path)
+            self.loop.remove_reader(self.serial.fileno())
+            return
+        if not data:
+            return
+        self.rx_bytes += len(data)
+        self.history.write(data)
+        for client in list(self.clients):
+            client.send(data)
+            if client.writer.transport.get_write_buffer_size() > self.MAX_CLIENT_BUFFER:
+                self.logger.warning("disconnecting slow client %s", client.writer.get_extra_info("peername"))
+                self.clients.discard(client)
+                client.writer.transport.abort()
+
+    def _write_serial(self, data):
+        self.tx_buffer += data
+        if not self.tx_waiting:
+            self._flush_serial()
+
+    def _flush_serial(self):
+        # The port is opened non-blocking, but serial.Serial.write() retries
+        # internally until all data is written, so the file descriptor is
+        # written directly. The remainder is written once the port is writable
+        # again, so a stalled port (e.g. by hardware flow control) does not
+        # block the event loop.
+        fd = self.serial.fileno()
+        try:
+            written = os.write(fd, self.tx_buffer)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            self.logger.exception("failed to write to %s", self.path)
+            written = len(self.tx_buffer)
+        else:
+            self.tx_bytes += written
+        del self.tx_buffer[:written]
+        if self.tx_buffer and not self.tx_waiting:
+            self.loop.add_writer(fd, self._flush_serial)
+            self.tx_waiting = True
+        elif not self.tx_buffer:
+            if self.tx_waiting:
+                self.loop.remove_writer(fd)
+                self.tx_waiting = False
+            self.tx_drained.set()
+
+    async def _handle_client(self, reader, writer):
+        if self.serial is None:  # stopped in the meantime
+            writer.close()
+            return
+        peer = writer.get_extra_info("peername")
+        self.logger.info("client %s connected", peer)
+        client = _SerialClient(self, writer)
+        self.clients.add(client)
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                data = client.filter(data)
+                if data and client in self.clients:
+                    self._write_serial(data)
+                while len(self.tx_buffer) > self.MAX_SERIAL_BUFFER:
+                    self.tx_drained.clear()
+                    await self.tx_drained.wait()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            self.logger.info("client %s disconnected", peer)
+
+    async def _handle_history_client(self, reader, writer):  # pylint: disable=unused-argument
+        try:
+            writer.write(self.history.read())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -1,49 +1,74 @@
-from .base import SerialPort, NetworkInterface, EthernetPort, SysfsGPIO
-from .ethernetport import SNMPEthernetPort
-from .serialport import RawSerialPort, NetworkSerialPort
-from .modbus import ModbusTCPCoil
-from .modbusrtu import ModbusRTU
-from .networkservice import NetworkService
-from .onewireport import OneWirePIO
-from .power import NetworkPowerPort, PDUDaemonPort
-from .remote import RemotePlace
-from .udev import (
-    AlteraUSBBlaster,
-    AndroidUSBFastboot,
-    DFUDevice,
-    DeditecRelais8,
-    HIDRelay,
-    IMXUSBLoader,
-    LXAUSBMux,
-    MatchedSysfsGPIO,
-    MXSUSBLoader,
-    RKUSBLoader,
-    SiSPMPowerPort,
-    SigrokUSBDevice,
-    SigrokUSBSerialDevice,
-    USBAudioInput,
-    USBDebugger,
-    USBFlashableDevice,
-    USBMassStorage,
-    USBNetworkInterface,
-    USBPowerPort,
-    USBSDMuxDevice,
-    USBSDWireDevice,
-    USBSerialPort,
-    USBTMC,
-    USBVideo,
-)
-from .common import Resource, ResourceManager, ManagedResource
-from .ykushpowerport import YKUSHPowerPort, NetworkYKUSHPowerPort
-from .xenamanager import XenaManager
-from .flashrom import Flashrom, NetworkFlashrom
-from .docker import DockerManager, DockerDaemon, DockerConstants
-from .lxaiobus import LXAIOBusPIO
-from .pyvisa import PyVISADevice
-from .provider import TFTPProvider, NFSProvider, HTTPProvider
-from .mqtt import TasmotaPowerPort
-from .httpvideostream import HTTPVideoStream
-from .dediprogflasher import DediprogFlasher, NetworkDediprogFlasher
-from .httpdigitalout import HttpDigitalOutput
-from .sigrok import SigrokDevice
-from .fastboot import AndroidNetFastboot
+from ..registry import package_classes
+from ..util.lazy import lazy_attributes
+
+# Resources are only imported on first access, so that users of a single
+# resource don't pay for importing all of them (and their dependencies).
+_lazy_imports = {
+    **package_classes(__name__, [
+        "SerialPort",
+        "NetworkInterface",
+        "EthernetPort",
+        "SysfsGPIO",
+        "SNMPEthernetPort",
+        "RawSerialPort",
+        "NetworkSerialPort",
+        "ModbusTCPCoil",
+        "ModbusRTU",
+        "NetworkService",
+        "OneWirePIO",
+        "NetworkPowerPort",
+        "PDUDaemonPort",
+        "RemotePlace",
+        "AlteraUSBBlaster",
+        "AndroidUSBFastboot",
+        "DFUDevice",
+        "DeditecRelais8",
+        "HIDRelay",
+        "IMXUSBLoader",
+        "LXAUSBMux",
+        "MatchedSysfsGPIO",
+        "MXSUSBLoader",
+        "RKUSBLoader",
+        "SiSPMPowerPort",
+        "SigrokUSBDevice",
+        "SigrokUSBSerialDevice",
+        "USBAudioInput",
+        "USBDebugger",
+        "USBFlashableDevice",
+        "USBMassStorage",
+        "USBNetworkInterface",
+        "USBPowerPort",
+        "USBSDMuxDevice",
+        "USBSDWireDevice",
+        "USBSerialPort",
+        "USBTMC",
+        "USBVideo",
+        "Resource",
+        "ManagedResource",
+        "YKUSHPowerPort",
+        "NetworkYKUSHPowerPort",
+        "XenaManager",
+        "Flashrom",
+        "NetworkFlashrom",
+        "DockerDaemon",
+        "LXAIOBusPIO",
+        "PyVISADevice",
+        "TFTPProvider",
+        "NFSProvider",
+        "HTTPProvider",
+        "TasmotaPowerPort",
+        "HTTPVideoStream",
+        "DediprogFlasher",
+        "NetworkDediprogFlasher",
+        "HttpDigitalOutput",
+        "SigrokDevice",
+        "AndroidNetFastboot",
+    ]),
+    # not created by the target factory, so not in the registry
+    "ResourceManager": ".common",
+    "DockerManager": ".docker",
+    "DockerConstants": ".docker",
+}
+
+__all__ = list(_lazy_imports)
+__getattr__, __dir__ = lazy_attributes(__name__, _lazy_imports)
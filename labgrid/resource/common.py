@@ -1,5 +1,6 @@
 import logging
 import shlex
+import threading
 from typing import Dict, Type, List
 import attr
 
@@ -116,6 +117,10 @@ class NetworkResource(Resource):
 class ResourceManager:
     instances: 'Dict[Type[ResourceManager], ResourceManager]' = {}
 
+    # shared by all managers, so that waiters are woken up by any of them
+    _change_condition = threading.Condition()
+    _change_count = 0
+
     @classmethod
     def get(cls) -> 'ResourceManager':
         instance = ResourceManager.instances.get(cls)
@@ -135,9 +140,55 @@ class ResourceManager:
     def on_resource_added(self, resource: 'ManagedResource'):
         pass
 
+    def _remove_resource(self, resource: 'ManagedResource'):
+        self.resources.remove(resource)
+        self.on_resource_removed(resource)
+
+    def on_resource_removed(self, resource: 'ManagedResource'):
+        pass
+
     def poll(self):
         pass
 
+    def notify_change(self):
+        """
+        Signal that the availability of resources may have changed, waking up
+        threads blocked in wait_for_change().
+
+        Managers which receive events from a background thread should call
+        this, so that Target.await_resources() can return without polling.
+        May be called from any thread.
+        """
+        with ResourceManager._change_condition:
+            ResourceManager._change_count += 1
+            ResourceManager._change_condition.notify_all()
+
+    @staticmethod
+    def get_change_count():
+        """
+        Return the current change counter, to be passed to wait_for_change().
+        """
+        with ResourceManager._change_condition:
+            return ResourceManager._change_count
+
+    @staticmethod
+    def wait_for_change(count, timeout):
+        """
+        Block until notify_change() has been called since get_change_count()
+        returned count, or until the timeout expires.
+
+        Args:
+            count (int): value previously returned by get_change_count()
+            timeout (float): maximum time to wait in seconds
+
+        Returns:
+            bool: True if a change was signaled, False on timeout
+        """
+        with ResourceManager._change_condition:
+            return ResourceManager._change_condition.wait_for(
+                lambda: ResourceManager._change_count != count, timeout
+            )
+
 
 @attr.s(eq=False)
 class ManagedResource(Resource):
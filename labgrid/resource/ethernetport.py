@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import subprocess
 import sys
@@ -7,10 +8,40 @@ import attr
 from ..factory import target_factory
 from .common import ManagedResource, ResourceManager
 
+@attr.s
+class AdaptiveInterval:
+    """AdaptiveInterval returns polling intervals which back off while nothing
+    changes.
+
+    Args:
+        minimum (float): interval after a change
+        maximum (float): upper limit for the interval
+        factor (float): factor to increase the interval by without a change
+    """
+    minimum = attr.ib(default=1.0, validator=attr.validators.instance_of(float))
+    maximum = attr.ib(default=16.0, validator=attr.validators.instance_of(float))
+    factor = attr.ib(default=2.0, validator=attr.validators.instance_of(float))
+
+    def __attrs_post_init__(self):
+        self.current = self.minimum
+
+    def update(self, changed):
+        """Return the next interval, depending on whether the last poll
+        detected a change"""
+        if changed:
+            self.current = self.minimum
+        else:
+            self.current = min(self.current * self.factor, self.maximum)
+        return self.current
+
+
 @attr.s
 class SNMPSwitch:
     """SNMPSwitch describes a switch accessible over SNMP. This class
-    implements functions to query ports and the forwarding database."""
+    implements functions to query ports and the forwarding database.
+
+    All queries use the asyncio API of pysnmp, so that several switches can
+    be polled concurrently without blocking the event loop."""
     hostname = attr.ib(validator=attr.validators.instance_of(str))
 
     def __attrs_post_init__(self):
@@ -18,23 +49,72 @@ class SNMPSwitch:
         self.ports = {}
         self.fdb = {}
         self.macs_by_port = {}
-        self._autodetect()
+        self._engine = None
+        self._transport = None
+        self._get_fdb = None
+
+    async def _setup(self):
+        from pysnmp.hlapi import asyncio as hlapi
 
-    def _autodetect(self):
-        from pysnmp import hlapi
+        self._engine = hlapi.SnmpEngine()
+        # resolving the host name blocks
+        loop = asyncio.get_running_loop()
+        self._transport = await loop.run_in_executor(
+            None, hlapi.UdpTransportTarget, (self.hostname, 161)
+        )
 
-        for (errorIndication, errorStatus, _, varBindTable) in hlapi.getCmd(
-                hlapi.SnmpEngine(),
+    async def _walk(self, max_repetitions, *object_types):
+        """Walk the given table columns using GETBULK requests
+
+        Returns:
+            List[List[ObjectType]]: table rows with one entry per column
+        """
+        from pysnmp.hlapi import asyncio as hlapi
+        from pysnmp.hlapi.varbinds import CommandGeneratorVarBinds
+        from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+
+        roots = [x[0] for x in CommandGeneratorVarBinds().makeVarBinds(self._engine, object_types)]
+        rows = []
+        while True:
+            errorIndication, errorStatus, _, varBindTable = await hlapi.bulkCmd(
+                self._engine,
                 hlapi.CommunityData('public'),
-                hlapi.UdpTransportTarget((self.hostname, 161)),
+                self._transport,
                 hlapi.ContextData(),
-                hlapi.ObjectType(hlapi.ObjectIdentity('SNMPv2-MIB', 'sysDescr', 0))):
+                0, max_repetitions,
+                *object_types)
             if errorIndication:
                 raise Exception(f"snmp error {errorIndication}")
             elif errorStatus:
                 raise Exception(f"snmp error {errorStatus}")
-            else:
-                sysDescr = str(varBindTable[0][1])
+            if not varBindTable:
+                return rows
+            for varBinds in varBindTable:
+                if len(varBinds) != len(roots):
+                    return rows
+                for root, (key, val) in zip(roots, varBinds):
+                    if isinstance(val, (EndOfMibView, NoSuchInstance, NoSuchObject)):
+                        return rows
+                    if not root.isPrefixOf(key.getOid()):
+                        return rows
+                rows.append(varBinds)
+            object_types = [hlapi.ObjectType(hlapi.ObjectIdentity(key.getOid()))
+                            for key, _ in varBindTable[-1]]
+
+    async def _autodetect(self):
+        from pysnmp.hlapi import asyncio as hlapi
+
+        errorIndication, errorStatus, _, varBinds = await hlapi.getCmd(
+            self._engine,
+            hlapi.CommunityData('public'),
+            self._transport,
+            hlapi.ContextData(),
+            hlapi.ObjectType(hlapi.ObjectIdentity('SNMPv2-MIB', 'sysDescr', 0)))
+        if errorIndication:
+            raise Exception(f"snmp error {errorIndication}")
+        elif errorStatus:
+            raise Exception(f"snmp error {errorStatus}")
+        sysDescr = str(varBinds[0][1])
 
         if sysDescr.startswith("HPE OfficeConnect Switch 1820 24G J9980A,"):
             self._get_fdb = self._get_fdb_dot1q
@@ -45,13 +125,13 @@ class SNMPSwitch:
 
         self.logger.debug("autodetected switch%s: %s %s", sysDescr, self._get_ports, self._get_fdb)
 
-    def _get_ports(self):
+    async def _get_ports(self):
         """Fetch ports and their values via SNMP
 
         Returns:
             Dict[Dict[]]: ports and their values
         """
-        from pysnmp import hlapi
+        from pysnmp.hlapi import asyncio as hlapi
 
         variables = [
             (hlapi.ObjectType(hlapi.ObjectIdentity('IF-MIB', 'ifIndex')), 'index'),
@@ -64,92 +144,58 @@ class SNMPSwitch:
         ]
         ports = {}
 
-        for (errorIndication, errorStatus, _, varBindTable) in hlapi.bulkCmd(
-                hlapi.SnmpEngine(),
-                hlapi.CommunityData('public'),
-                hlapi.UdpTransportTarget((self.hostname, 161)),
-                hlapi.ContextData(),
-                0, 20,
-                *[x[0] for x in variables],
-                lexicographicMode=False):
-            if errorIndication:
-                raise Exception(f"snmp error {errorIndication}")
-            elif errorStatus:
-                raise Exception(f"snmp error {errorStatus}")
-            else:
-                port = {}
-                for (_, val), (_, label) in zip(varBindTable, variables):
-                    val = val.prettyPrint()
-                    if label == 'status':
-                        val = val.strip("'")
-                    port[label] = val
-                ports[port.pop('index')] = port
+        for varBindTable in await self._walk(20, *[x[0] for x in variables]):
+            port = {}
+            for (_, val), (_, label) in zip(varBindTable, variables):
+                val = val.prettyPrint()
+                if label == 'status':
+                    val = val.strip("'")
+                port[label] = val
+            ports[port.pop('index')] = port
 
         return ports
 
-    def _get_fdb_dot1d(self):
+    async def _get_fdb_dot1d(self):
         """Fetch the forwarding database via SNMP using the BRIDGE-MIB
 
         Returns:
             Dict[List[str]]: ports and their values
         """
-        from pysnmp import hlapi
+        from pysnmp.hlapi import asyncio as hlapi
 
         ports = {}
 
-        for (errorIndication, errorStatus, _, varBindTable) in hlapi.bulkCmd(
-                hlapi.SnmpEngine(),
-                hlapi.CommunityData('public'),
-                hlapi.UdpTransportTarget((self.hostname, 161)),
-                hlapi.ContextData(),
-                0, 50,
-                hlapi.ObjectType(hlapi.ObjectIdentity('BRIDGE-MIB', 'dot1dTpFdbPort')),
-                lexicographicMode=False):
-            if errorIndication:
-                raise Exception(f"snmp error {errorIndication}")
-            elif errorStatus:
-                raise Exception(f"snmp error {errorStatus}")
-            else:
-                for varBinds in varBindTable:
-                    key, val = varBinds
-                    if not val:
-                        continue
-                    mac = key.getMibSymbol()[-1][0].prettyPrint()
-                    interface = str(int(val))
-                    ports.setdefault(interface, []).append(mac)
+        for varBindTable in await self._walk(
+                50, hlapi.ObjectType(hlapi.ObjectIdentity('BRIDGE-MIB', 'dot1dTpFdbPort'))):
+            for varBinds in varBindTable:
+                key, val = varBinds
+                if not val:
+                    continue
+                mac = key.getMibSymbol()[-1][0].prettyPrint()
+                interface = str(int(val))
+                ports.setdefault(interface, []).append(mac)
 
         return ports
 
-    def _get_fdb_dot1q(self):
+    async def _get_fdb_dot1q(self):
         """Fetch the forwarding database via SNMP using the Q-BRIDGE-MIB
 
         Returns:
             Dict[List[str]]: ports and their values
         """
-        from pysnmp import hlapi
+        from pysnmp.hlapi import asyncio as hlapi
 
         ports = {}
 
-        for (errorIndication, errorStatus, _, varBindTable) in hlapi.bulkCmd(
-                hlapi.SnmpEngine(),
-                hlapi.CommunityData('public'),
-                hlapi.UdpTransportTarget((self.hostname, 161)),
-                hlapi.ContextData(),
-                0, 50,
-                hlapi.ObjectType(hlapi.ObjectIdentity('Q-BRIDGE-MIB', 'dot1qTpFdbPort')),
-                lexicographicMode=False):
-            if errorIndication:
-                raise Exception(f"snmp error {errorIndication}")
-            elif errorStatus:
-                raise Exception(f"snmp error {errorStatus}")
-            else:
-                for varBinds in varBindTable:
-                    key, val = varBinds
-                    if not val:
-                        continue
-                    mac = key.getMibSymbol()[-1][1].prettyPrint()
-                    interface = str(int(val))
-                    ports.setdefault(interface, []).append(mac)
+        for varBindTable in await self._walk(
+                50, hlapi.ObjectType(hlapi.ObjectIdentity('Q-BRIDGE-MIB', 'dot1qTpFdbPort'))):
+            for varBinds in varBindTable:
+                key, val = varBinds
+                if not val:
+                    continue
+                mac = key.getMibSymbol()[-1][1].prettyPrint()
+                interface = str(int(val))
+                ports.setdefault(interface, []).append(mac)
 
         return ports
 
@@ -164,35 +210,67 @@ class SNMPSwitch:
             for mac in macs:
                 seen.setdefault(mac, int(time()))
 
-    def update(self):
+    @staticmethod
+    def _port_state(ports):
+        # traffic counters change all the time, so they are not considered
+        # for the polling interval
+        return {
+            index: (port.get('descr'), port.get('speed'), port.get('status'))
+            for index, port in ports.items()
+        }
+
+    async def update(self):
         """Update port status and forwarding database status
 
         Returns:
-            None
+            bool: True if the forwarding database or the port status changed
         """
-        self.logger.debug("polling switch FDB")
-        self.fdb = self._get_fdb()
-        self.logger.debug("polling switch ports")
-        self.ports = self._get_ports()
+        if self._engine is None:
+            await self._setup()
+        if self._get_fdb is None:
+            await self._autodetect()
+        self.logger.debug("polling switch FDB and ports")
+        fdb, ports = await asyncio.gather(self._get_fdb(), self._get_ports())
+        changed = fdb != self.fdb or self._port_state(ports) != self._port_state(self.ports)
+        self.fdb = fdb
+        self.ports = ports
         self.logger.debug("updating macs by port")
         self._update_macs()
+        return changed
 
 
 @attr.s
 class EthernetPortManager(ResourceManager):
-    """The EthernetPortManager periodically polls the switch for new updates."""
+    """The EthernetPortManager periodically polls the switch for new updates.
+
+    Each switch is polled by its own task, so that slow switches don't delay
+    the others. The polling interval of a switch backs off while its
+    forwarding database and port status don't change. The neighbor table is
+    followed via netlink, falling back to polling "ip neigh show".
+    """
+    SWITCH_INTERVAL_MIN = 2.0
+    SWITCH_INTERVAL_MAX = 16.0
+    NEIGHBOR_INTERVAL_MIN = 1.0
+    NEIGHBOR_INTERVAL_MAX = 16.0
+    # maximum time poll() runs the event loop (if it is not running already)
+    # to let pending updates finish
+    UPDATE_TIMEOUT = 0.5
+
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
         self.loop = None
         self.poll_tasks = []
+        self.switch_tasks = {}
         self.switches = {}
         self.neighbors = {}
+        self._neighbor_table = None
+        self._updates = set()
 
     def on_resource_added(self, resource):
         """Handler to execute when the resource is added
 
-        Checks whether the resource can be managed by this Manager and starts
-        the event loop.
+        Checks whether the resource can be managed by this Manager, starts
+        the event loop and a polling task for a new switch.
 
         Args:
             resource(Resource): resource to check against
@@ -203,8 +281,33 @@ class EthernetPortManager(ResourceManager):
         if not isinstance(resource, SNMPEthernetPort):
             return
         self._start()
+        if resource.switch not in self.switches:
+            switch = SNMPSwitch(resource.switch)
+            self.switches[resource.switch] = switch
+            interval = AdaptiveInterval(self.SWITCH_INTERVAL_MIN, self.SWITCH_INTERVAL_MAX)
+            self.switch_tasks[resource.switch] = self.loop.create_task(self._poll(switch.update, interval))
         resource.avail = True
 
+    def on_resource_removed(self, resource):
+        """Handler to execute when the resource is removed
+
+        Stops polling the resource's switch if no other resource uses it.
+
+        Args:
+            resource(Resource): removed resource
+
+        Returns:
+            None
+        """
+        if not isinstance(resource, SNMPEthernetPort):
+            return
+        if any(other.switch == resource.switch for other in self.resources):
+            return
+        self.switches.pop(resource.switch, None)
+        task = self.switch_tasks.pop(resource.switch, None)
+        if task is not None:
+            task.cancel()
+
     def _start(self):
         """Internal function to register as task and attach/start the event
         loop
@@ -212,45 +315,68 @@ class EthernetPortManager(ResourceManager):
         Returns:
             None
         """
-        import asyncio
-
-        if self.poll_tasks:
+        if self.loop is not None:
             return
 
-        async def poll_neighbour(self):
-            self.logger.debug("polling neighbor table")
-            self.neighbors = EthernetPortManager._get_neigh()
-
-            await asyncio.sleep(1.0)
-
-        async def poll_switches(self):
-            current = set(resource.switch for resource in self.resources)
-            removed = set(self.switches) - current
-            new = current - set(self.switches)
-            for switch in removed:
-                del self.switches[switch]
-            for switch in new:
-                self.switches[switch] = SNMPSwitch(switch)
-            for switch in current:
-                self.switches[switch].update()
-                await asyncio.sleep(1.0)
+        self.loop = asyncio.get_event_loop()
 
-            await asyncio.sleep(2.0)
+        from ..util.netlink import NeighbourTable
 
-        async def poll(self, handler):
-            while True:
+        table = NeighbourTable()
+        try:
+            table.open()
+        except (AttributeError, OSError):  # no netlink support
+            self.logger.debug("netlink not available, polling neighbor table")
+            interval = AdaptiveInterval(self.NEIGHBOR_INTERVAL_MIN, self.NEIGHBOR_INTERVAL_MAX)
+            self.poll_tasks.append(self.loop.create_task(self._poll(self._poll_neighbors, interval)))
+        else:
+            self._neighbor_table = table
+            self.loop.add_reader(table.fileno(), self._read_neighbors)
+
+    async def _poll(self, handler, interval):
+        """Call handler repeatedly, waiting for the interval returned by the
+        AdaptiveInterval in between"""
+        while True:
+            try:
+                update = asyncio.ensure_future(handler())
+                self._updates.add(update)
                 try:
-                    await asyncio.sleep(1.0)
-                    await handler(self)
+                    changed = await update
+                finally:
+                    self._updates.discard(update)
+                await asyncio.sleep(interval.update(changed))
+            except asyncio.CancelledError:
+                break
+            except Exception:  # pylint: disable=broad-except
+                import traceback
+                traceback.print_exc(file=sys.stderr)
+                try:
+                    await asyncio.sleep(interval.update(False))
                 except asyncio.CancelledError:
                     break
-                except Exception:  # pylint: disable=broad-except
-                    import traceback
-                    traceback.print_exc(file=sys.stderr)
 
-        self.loop = asyncio.get_event_loop()
-        self.poll_tasks.append(self.loop.create_task(poll(self, poll_neighbour)))
-        self.poll_tasks.append(self.loop.create_task(poll(self, poll_switches)))
+    async def _wait_for_updates(self):
+        """Let due updates start and wait until they finished or
+        UPDATE_TIMEOUT expired"""
+        await asyncio.sleep(0.0)
+        if self._updates:
+            await asyncio.wait(set(self._updates), timeout=self.UPDATE_TIMEOUT)
+
+    async def _poll_neighbors(self):
+        self.logger.debug("polling neighbor table")
+        neighbors = EthernetPortManager._get_neigh()
+        changed = neighbors != self.neighbors
+        self.neighbors = neighbors
+        return changed
+
+    def _read_neighbors(self):
+        try:
+            changed = self._neighbor_table.read()
+        except OSError:
+            self.logger.exception("failed to read neighbor table")
+            return
+        if changed:
+            self.neighbors = self._neighbor_table.get_neighbors()
 
     @staticmethod
     def _get_neigh():
@@ -290,9 +416,8 @@ class EthernetPortManager(ResourceManager):
         Returns:
             None
         """
-        import asyncio
         if not self.loop.is_running():
-            self.loop.run_until_complete(asyncio.sleep(0.0))
+            self.loop.run_until_complete(self._wait_for_updates())
         for resource in self.resources:
             switch = self.switches.get(resource.switch)
             if not switch:
@@ -14,36 +14,93 @@ class MQTTManager(ResourceManager):
     _topics = attr.ib(default=attr.Factory(list), validator=attr.validators.instance_of(list))
     _topic_lock = attr.ib(default=threading.Lock())
     _last = attr.ib(default=0.0, validator=attr.validators.instance_of(float))
+    _changed = attr.ib(default=False, validator=attr.validators.instance_of(bool))
+    # message callbacks by (host, topic), used by drivers sharing the clients
+    _callbacks = attr.ib(default=attr.Factory(dict), validator=attr.validators.instance_of(dict))
 
     def _create_mqtt_connection(self, host):
         import paho.mqtt.client as mqtt
-        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, userdata=host)
         client.connect(host)
+        client.on_connect = self._on_connect
         client.on_message = self._on_message
         client.loop_start()
         return client
 
+    def get_client(self, host):
+        """
+        Return the MQTT client connected to the broker on host, which is shared
+        by all resources and drivers using this broker.
+        """
+        with self._topic_lock:
+            if host not in self._clients:
+                self._clients[host] = self._create_mqtt_connection(host)
+            return self._clients[host]
+
     def on_resource_added(self, resource):
-        host = resource.host
-        if host not in self._clients:
-            self._clients[host] = self._create_mqtt_connection(host)
-        self._clients[host].subscribe(resource.avail_topic)
+        client = self.get_client(resource.host)
+        with self._topic_lock:
+            self._topics.append((resource.host, resource.avail_topic))
+        client.subscribe(resource.avail_topic)
+
+    def subscribe(self, host, topic, callback):
+        """
+        Subscribe to topic on the broker on host and call
+        callback(topic, payload) from the client thread for each message.
+        """
+        client = self.get_client(host)
+        with self._topic_lock:
+            self._callbacks.setdefault((host, topic), []).append(callback)
+            self._topics.append((host, topic))
+        client.subscribe(topic)
+
+    def unsubscribe(self, host, topic, callback):
+        """
+        Remove a callback registered with subscribe().
+        """
+        with self._topic_lock:
+            callbacks = self._callbacks[(host, topic)]
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._callbacks[(host, topic)]
+            self._topics.remove((host, topic))
+            if (host, topic) in self._topics:
+                return  # still used by others
+        self.get_client(host).unsubscribe(topic)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        # subscriptions are lost when reconnecting with a clean session
+        with self._topic_lock:
+            topics = [topic for host, topic in self._topics if host == userdata]
+        for topic in set(topics):
+            client.subscribe(topic)
 
     def _on_message(self, client, userdata, msg):
-        payload = msg.payload.decode('utf-8')
         topic = msg.topic
+        with self._topic_lock:
+            callbacks = list(self._callbacks.get((userdata, topic), []))
+        for callback in callbacks:
+            callback(topic, msg.payload)
+
+        payload = msg.payload.decode('utf-8', errors='replace')
         if payload.lower() == "online":
             with self._avail_lock:
                 self._available.add(topic)
+                self._changed = True
         elif payload.lower() == "offline":
             with self._avail_lock:
                 self._available.discard(topic)
+                self._changed = True
+        else:
+            return
+        self.notify_change()
 
     def poll(self):
-        if monotonic()-self._last < 2:
+        if not self._changed and monotonic()-self._last < 2:
             return  # ratelimit requests
         self._last = monotonic()
         with self._avail_lock:
+            self._changed = False
             for resource in self.resources:
                 resource.avail = resource.avail_topic in self._available
 
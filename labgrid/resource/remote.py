@@ -1,13 +1,26 @@
+import asyncio
 import copy
 import os
+from functools import lru_cache
+from time import monotonic
+
 import attr
 
 from ..factory import target_factory
 from .common import NetworkResource, ManagedResource, ResourceManager
 
 
+@lru_cache(maxsize=None)
+def _get_converters(cls):
+    """Return a dict of attribute name -> converter for the given attrs class."""
+    return {field.name: field.converter for field in attr.fields(cls) if field.converter}
+
+
 @attr.s(eq=False)
 class RemotePlaceManager(ResourceManager):
+    # upper limit for processing already received WAMP messages in poll()
+    DRAIN_TIMEOUT = 0.1
+
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
         self.url = None
@@ -15,15 +28,17 @@ class RemotePlaceManager(ResourceManager):
         self.loop = None
         self.session = None
         self.ready = None
+        self.poll_delay = 0.1
         self.unmanaged_resources = []
 
-    def _start(self):
+    def _start(self, place):
         if self.session:
             return
 
         from ..remote.client import start_session
         try:
-            self.session = start_session(self.url, self.realm, {'env': self.env})
+            # only load the place and its resources instead of everything
+            self.session = start_session(self.url, self.realm, {'env': self.env, 'place': place})
         except ConnectionRefusedError as e:
             raise ConnectionRefusedError(f"Could not connect to coordinator {self.url}") \
                 from e
@@ -45,7 +60,10 @@ class RemotePlaceManager(ResourceManager):
                 config = self.env.config
                 self.url = config.get_option('crossbar_url', self.url)
                 self.realm = config.get_option('crossbar_realm', self.realm)
-            self._start()
+                self.poll_delay = float(config.get_option('remote_poll_delay', self.poll_delay))
+            self._start(remote_place.name)
+        elif not self.loop.is_running():
+            self.loop.run_until_complete(self.session.load_place(remote_place.name))  # pylint: disable=no-member
         place = self.session.get_place(remote_place.name)  # pylint: disable=no-member
         resource_entries = self.session.get_target_resources(place)  # pylint: disable=no-member
         expanded = []
@@ -56,6 +74,7 @@ class RemotePlaceManager(ResourceManager):
             new.avail = resource_entry.avail
             new.extra = resource_entry.extra
             new._remote_entry = resource_entry
+            new._remote_version = None
             if not isinstance(new, ManagedResource):
                 self.unmanaged_resources.append(new)
             expanded.append(new)
@@ -63,31 +82,56 @@ class RemotePlaceManager(ResourceManager):
         remote_place.avail = True
         remote_place.tags = copy.deepcopy(place.tags)
 
+    async def _drain(self):
+        """Process already received WAMP messages without waiting for new ones.
+
+        Event loop iterations (which also read the pending data from the
+        socket) are run until an iteration received no new message and no
+        event handler is running anymore, or until DRAIN_TIMEOUT expires.
+        """
+        deadline = monotonic() + self.DRAIN_TIMEOUT
+        received = None
+        while monotonic() < deadline:
+            await asyncio.sleep(0)
+            if self.session.messages_received == received and not self.session.events_running:
+                break
+            received = self.session.messages_received
+
+    def _update_resource(self, resource, entry):
+        attrs = entry.args.copy()
+        attrs['avail'] = entry.avail
+        # TODO allow the resource to do the update itself?
+        changes = []
+        converters = _get_converters(resource.__class__)
+        for k, v_new in attrs.items():
+            converter = converters.get(k)
+            if converter:
+                v_new = converter(v_new)
+            v_old = getattr(resource, k)
+            setattr(resource, k, v_new)
+            if v_old != v_new:
+                changes.append((k, v_old, v_new))
+        if changes:
+            self.logger.debug("changed attributes for %s:", resource)
+            for k, v_old, v_new in changes:
+                self.logger.debug("  %s: %s -> %s", k, v_old, v_new)
+
     def poll(self):
-        import asyncio
         if not self.loop.is_running():
-            self.loop.run_until_complete(asyncio.sleep(0.1))
+            if self.poll_delay > 0:
+                self.loop.run_until_complete(asyncio.sleep(self.poll_delay))
+            else:
+                self.loop.run_until_complete(self._drain())
         for resource in self.resources + self.unmanaged_resources:
             if isinstance(resource, RemotePlace):
                 continue
-            attrs = resource._remote_entry.args.copy()
-            attrs['avail'] = resource._remote_entry.avail
-            # TODO allow the resource to do the update itself?
-            changes = []
-            fields = attr.fields(resource.__class__)
-            for k, v_new in attrs.items():
-                # check for attr converters
-                attrib = getattr(fields, k)
-                if attrib.converter:
-                    v_new = attrib.converter(v_new)
-                v_old = getattr(resource, k)
-                setattr(resource, k, v_new)
-                if v_old != v_new:
-                    changes.append((k, v_old, v_new))
-            if changes:
-                self.logger.debug("changed attributes for %s:", resource)
-                for k, v_old, v_new in changes:
-                    self.logger.debug("  %s: %s -> %s", k, v_old, v_new)
+            entry = resource._remote_entry
+            # only apply entries which were changed by the session since the
+            # last poll, each resource keeps track of the version it has seen
+            if resource._remote_version == entry.version:
+                continue
+            resource._remote_version = entry.version
+            self._update_resource(resource, entry)
 
 
 @target_factory.reg_resource
@@ -34,6 +34,7 @@ class UdevManager(ResourceManager):
 
     def _insert_into_queue(self, device):
         self.queue.put(device)
+        self.notify_change()
 
     def poll(self):
         timeout = Timeout(0.1)
@@ -1,6 +1,8 @@
 import inspect
 import os
+import threading
 import warnings
+from contextlib import contextmanager
 from functools import wraps
 from time import monotonic
 
@@ -9,9 +11,34 @@ from time import monotonic
 # after some time
 class Steps:
     def __init__(self):
-        self._stack = []
+        self._local = threading.local()
         self._subscribers = []
 
+    @property
+    def _stack(self):
+        # each thread has its own stack of active steps
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def get_stack(self):
+        """Returns a copy of the current thread's stack of active steps"""
+        return list(self._stack)
+
+    @contextmanager
+    def inherit(self, stack):
+        """Use stack (from get_stack() in another thread) as the base of the
+        current thread's stack, so that steps started in this thread are
+        nested below the other thread's current step"""
+        assert not self._stack
+        self._local.stack = list(stack)
+        try:
+            yield
+        finally:
+            self._local.stack = []
+
     def get_current(self):
         return self._stack[-1] if self._stack else None
 
@@ -1,6 +1,24 @@
-from .common import Strategy, StrategyError
-from .bareboxstrategy import BareboxStrategy
-from .shellstrategy import ShellStrategy
-from .ubootstrategy import UBootStrategy
-from .graphstrategy import *
-from .dockerstrategy import DockerStrategy
+from ..registry import package_classes
+from ..util.lazy import lazy_attributes
+
+# Strategies are only imported on first access, as they pull in the drivers
+# they use.
+_lazy_imports = {
+    **package_classes(__name__, [
+        "Strategy",
+        "BareboxStrategy",
+        "ShellStrategy",
+        "UBootStrategy",
+        "DockerStrategy",
+    ]),
+    # not created by the target factory, so not in the registry
+    "StrategyError": ".common",
+    "StrategyStatusCache": ".common",
+    "InvalidGraphStrategyError": ".graphstrategy",
+    "GraphStrategyRuntimeError": ".graphstrategy",
+    "GraphStrategyError": ".graphstrategy",
+    "GraphStrategy": ".graphstrategy",
+}
+
+__all__ = list(_lazy_imports)
+__getattr__, __dir__ = lazy_attributes(__name__, _lazy_imports)
@@ -1,7 +1,13 @@
+import json
+import os
+import time
+import urllib.parse
+
 import attr
 
 from ..binding import BindingError
 from ..driver import Driver
+from ..util.atomic import atomic_replace
 
 
 @attr.s(eq=False)
@@ -55,3 +61,57 @@ class Strategy(Driver):  # reuse driver handling
         for name in self.bindings.keys():
             name_map[getattr(self, name)] = name
         return name_map
+
+
+@attr.s(eq=False)
+class StrategyStatusCache:
+    """Persists the status of a strategy across processes (such as consecutive
+    pytest sessions), per place when using a RemotePlace or per target
+    otherwise.
+
+    The board may have been changed in the meantime, so a cached status must
+    be validated before it is used.
+
+    The cache files are stored in the directory given by the
+    LG_STATE_CACHE_DIR environment variable, defaulting to labgrid/state in
+    the user's cache directory.
+
+    Args:
+        strategy (Strategy): strategy whose status is cached
+    """
+    strategy = attr.ib(validator=attr.validators.instance_of(Strategy))
+
+    def __attrs_post_init__(self):
+        target = self.strategy.target
+        places = [r for r in target.resources if type(r).__name__ == "RemotePlace"]
+        key = f"place-{places[0].name}" if places else f"target-{target.name}"
+        key = f"{key}-{self.strategy.name or type(self.strategy).__name__}"
+        self.path = os.path.join(self.get_directory(), f"{urllib.parse.quote(key, safe='')}.json")
+
+    @staticmethod
+    def get_directory():
+        directory = os.environ.get("LG_STATE_CACHE_DIR")
+        if directory:
+            return directory
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        return os.path.join(cache_home, "labgrid", "state")
+
+    def load(self):
+        """Returns the cached status name or None"""
+        try:
+            with open(self.path) as f:
+                return json.load(f)["status"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def store(self, status):
+        """Stores the status name"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"status": status, "time": time.time()}
+        atomic_replace(self.path, json.dumps(data).encode("utf-8"))
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
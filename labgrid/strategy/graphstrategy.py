@@ -1,8 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import TemporaryDirectory
 import os
+import time
 
 from .common import Strategy, StrategyError
-from ..step import step
+from ..step import step, steps
 
 __all__ = [
     'InvalidGraphStrategyError',
@@ -27,6 +29,15 @@ class GraphStrategyRuntimeError(GraphStrategyError):
     pass
 
 
+def _flatten(plan):
+    for item in plan:
+        if isinstance(item, list):
+            for branch in item:
+                yield from _flatten(branch)
+        else:
+            yield item
+
+
 class GraphStrategy(Strategy):
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
@@ -52,6 +63,7 @@ class GraphStrategy(Strategy):
             self.states[state_name] = {
                 'method': step()(method),
                 'dependencies': getattr(method, 'dependencies', []),
+                'parallel': getattr(method, 'parallel', False),
             }
 
         if not self.states:
@@ -85,6 +97,8 @@ class GraphStrategy(Strategy):
             )
 
         self.root_state = root_states[0]
+        self.timings = {}
+        self._plan = []
         self.invalidate()
 
         # setup grahviz cache
@@ -139,7 +153,8 @@ class GraphStrategy(Strategy):
                 )
 
             # find path
-            abs_path = self.find_abs_path(state, via=via)
+            plan = self.find_plan(state, via=via)
+            abs_path = list(_flatten(plan))
 
             if abs_path == self.path:
                 return []
@@ -147,18 +162,18 @@ class GraphStrategy(Strategy):
             path = self.find_rel_path(abs_path)
 
             # run state methods
-            for state_name in path:
-                if state_name == self.root_state:
-                    # deactivate drivers before root state method is called
-                    self.target.deactivate_all_drivers()
+            self._plan = plan
+            self.timings = {}
+            try:
+                self._execute(plan, set(path))
 
-                try:
-                    self.states[state_name]['method']()
+            except Exception:
+                self.invalidate()
 
-                except Exception:
-                    self.invalidate()
+                raise
 
-                    raise
+            finally:
+                self.logger.debug("transition timing:\n%s", self.timing_report())
 
             self.path = abs_path
 
@@ -168,14 +183,54 @@ class GraphStrategy(Strategy):
             # unlock transition
             self.__transition_running = False
 
-    def find_abs_path(self, state, via=None):
+    def _run_state(self, state_name):
+        if state_name == self.root_state:
+            # deactivate drivers before root state method is called
+            self.target.deactivate_all_drivers()
+
+        start = time.monotonic()
+        try:
+            self.states[state_name]['method']()
+        finally:
+            self.timings[state_name] = time.monotonic() - start
+
+    def _execute_branch(self, branch, to_run, stack):
+        with steps.inherit(stack):
+            self._execute(branch, to_run)
+
+    def _execute(self, plan, to_run):
+        for item in plan:
+            if not isinstance(item, list):
+                if item in to_run:
+                    self._run_state(item)
+                continue
+
+            branches = [b for b in item if to_run.intersection(_flatten(b))]
+            if len(branches) < 2:
+                for branch in branches:
+                    self._execute(branch, to_run)
+                continue
+
+            # all branches are completed before an exception is raised
+            with ThreadPoolExecutor(max_workers=len(branches)) as executor:
+                futures = [
+                    executor.submit(self._execute_branch, branch, to_run, steps.get_stack())
+                    for branch in branches
+                ]
+            for future in futures:
+                future.result()
+
+    def find_plan(self, state, via=None):
         """
-        Computes the absolute path from the root state, via "via" (if given), to the given state.
+        Computes the plan to reach the given state from the root state, via "via" (if given).
+
+        The plan is a list of state names to be executed in order. The
+        dependencies of states declared with ``@depends(..., parallel=True)``
+        are represented by a list of branches (which are plans themselves), to
+        be executed concurrently.
         """
         via = via or []
         via = via[::-1]
-        path = [state, ]
-        current_state = self.states[state]
 
         for via_state in via:
             if via_state not in self.states.keys():
@@ -183,16 +238,7 @@ class GraphStrategy(Strategy):
                     f"Unknown state '{via_state}' in via. State names are: {', '.join(self.states.keys())}"  # pylint: disable=line-too-long
                 )
 
-        while current_state['dependencies']:
-            next_state = current_state['dependencies'][0]
-
-            for i in via:
-                if i in current_state['dependencies']:
-                    via.remove(i)
-                    next_state = i
-
-            path.insert(0, next_state)
-            current_state = self.states[next_state]
+        plan = self._find_plan(state, via)
 
         # no via states should be left now
         if via:
@@ -202,8 +248,94 @@ class GraphStrategy(Strategy):
                 )
             )
 
+        return plan
 
-        return path
+    def _find_plan(self, state, via):
+        plan = []
+
+        while True:
+            plan.insert(0, state)
+            current_state = self.states[state]
+
+            if not current_state['dependencies']:
+                return plan
+
+            if current_state['parallel']:
+                branches = [self._find_plan(d, via) for d in current_state['dependencies']]
+
+                # the branches start at the root state, so split off the
+                # common part
+                common = []
+                for items in zip(*branches):
+                    if any(item != items[0] for item in items):
+                        break
+                    common.append(items[0])
+
+                branches = [branch[len(common):] for branch in branches]
+
+                return common + [branches] + plan
+
+            next_state = current_state['dependencies'][0]
+
+            for i in list(via):
+                if i in current_state['dependencies']:
+                    via.remove(i)
+                    next_state = i
+
+            state = next_state
+
+    def find_abs_path(self, state, via=None):
+        """
+        Computes the absolute path from the root state, via "via" (if given), to the given state.
+        """
+        return list(_flatten(self.find_plan(state, via=via)))
+
+    def critical_path(self):
+        """
+        Returns the duration and states of the longest chain of states executed by the last
+        transition. Only the states on this chain need to get faster to speed up the transition.
+        """
+        return self._critical_path(self._plan)
+
+    def _critical_path(self, plan):
+        duration = 0.0
+        path = []
+
+        for item in plan:
+            if isinstance(item, list):
+                branch_duration, branch_path = max(
+                    (self._critical_path(branch) for branch in item),
+                    key=lambda x: x[0],
+                )
+                duration += branch_duration
+                path += branch_path
+
+            elif item in self.timings:
+                duration += self.timings[item]
+                path.append(item)
+
+        return duration, path
+
+    def timing_report(self):
+        """
+        Returns a report of the durations of the states executed by the last transition. States
+        on the critical path are marked with an asterisk.
+        """
+        duration, path = self.critical_path()
+        lines = []
+
+        for state_name in _flatten(self._plan):
+            if state_name not in self.timings:
+                continue
+
+            marker = '*' if state_name in path else ' '
+            lines.append(f"{marker} {state_name}: {self.timings[state_name]:.3f}s")
+
+        total = sum(self.timings.values())
+        lines.append(f"critical path: {duration:.3f}s ({', '.join(path)})")
+        lines.append(f"sum of all states: {total:.3f}s")
+
+        return '\n'.join(lines)
 
     def find_rel_path(self, path):
         """
@@ -251,9 +383,10 @@ class GraphStrategy(Strategy):
 
             dg.node(node_name, **attrs)
 
-            if index < len(self.path) - 1:
-                edges.append((node_name, self.path[index + 1], ))
-                dg.edge(*edges[-1])
+            for dependency in self.states[node_name]['dependencies']:
+                if dependency in self.path[:index]:
+                    edges.append((dependency, node_name, ))
+                    dg.edge(*edges[-1])
 
         dg.attr('node', style='filled', color='lightgrey',
                 fillcolor='lightgrey')
@@ -275,10 +408,17 @@ class GraphStrategy(Strategy):
         return dg
 
     @classmethod
-    def depends(cls, *dependencies):
-        """``@depends`` decorator used to list states the decorated state directly depends on."""
+    def depends(cls, *dependencies, parallel=False):
+        """
+        ``@depends`` decorator used to list states the decorated state directly depends on.
+
+        By default, one of the dependencies has to be reached. With ``parallel=True``, all
+        dependencies have to be reached and the paths to them are executed concurrently, starting
+        from the last state they have in common.
+        """
         def decorator(function):
             function.dependencies = list(dependencies)
+            function.parallel = parallel
 
             return function
 
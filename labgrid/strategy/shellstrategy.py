@@ -1,10 +1,11 @@
 import enum
 
 import attr
+from pexpect import TIMEOUT
 
 from ..factory import target_factory
 from ..step import step
-from .common import Strategy, StrategyError
+from .common import Strategy, StrategyError, StrategyStatusCache
 
 
 class Status(enum.Enum):
@@ -16,7 +17,20 @@ class Status(enum.Enum):
 @target_factory.reg_driver
 @attr.s(eq=False)
 class ShellStrategy(Strategy):
-    """ShellStrategy - Strategy to switch to shell"""
+    """ShellStrategy - Strategy to switch to shell
+
+    Args:
+        snapshot (str): optional, name of a snapshot saved once the shell is
+            reached the first time and restored instead of booting afterwards,
+            requires a power driver supporting snapshots (such as the
+            QEMUDriver)
+        cache_status (bool): optional, persist the status across processes
+            (see StrategyStatusCache), so that a transition to shell can skip
+            booting if the board is still at a shell prompt
+    """
+    # timeout for checking the prompt when validating a cached shell status
+    CACHE_CHECK_TIMEOUT = 5.0
+
     bindings = {
         "power": "PowerProtocol",
         "console": "ConsoleProtocol",
@@ -24,34 +38,81 @@ class ShellStrategy(Strategy):
     }
 
     status = attr.ib(default=Status.unknown)
+    snapshot = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(str))
+    )
+    cache_status = attr.ib(default=False, validator=attr.validators.instance_of(bool))
 
     def __attrs_post_init__(self):
         super().__attrs_post_init__()
+        if self.snapshot and not hasattr(self.power, "restore_snapshot"):
+            raise StrategyError(f"{self.power} does not support snapshots")
+        self._status_cache = StrategyStatusCache(self) if self.cache_status else None
+        self._cache_checked = False
+
+    def _load_cached_status(self):
+        """Use the cached status if the board is still at a shell prompt"""
+        self._cache_checked = True
+        if self._status_cache.load() != Status.shell.name:
+            return
+        self.target.activate(self.console)
+        try:
+            self.shell._check_prompt(timeout=self.CACHE_CHECK_TIMEOUT)
+            # the shell at the prompt may not be the one the run() helper was
+            # injected into (such as after a new login), so inject it again
+            self.shell._inject_run()
+        except TIMEOUT:
+            self.logger.info("cached status %s is outdated", Status.shell.name)
+            self._status_cache.clear()
+            return
+        self.target.activate(self.power)
+        self.target.activate(self.shell)
+        self.status = Status.shell
+
+    def _set_status(self, status):
+        self.status = status
+        if self._status_cache:
+            self._status_cache.store(status.name)
 
     @step(args=['status'])
     def transition(self, status, *, step):  # pylint: disable=redefined-outer-name
         if not isinstance(status, Status):
             status = Status[status]
+        if self._status_cache and not self._cache_checked and self.status == Status.unknown \
+                and status == Status.shell:
+            self._load_cached_status()
         if status == Status.unknown:
             raise StrategyError(f"can not transition to {status}")
         elif status == self.status:
             step.skip("nothing to do")
             return  # nothing to do
-        elif status == Status.off:
+        if self._status_cache:
+            # an interrupted transition leaves the status unknown
+            self._status_cache.clear()
+        if status == Status.off:
             self.target.deactivate(self.console)
             self.target.activate(self.power)
             self.power.off()
         elif status == Status.shell:
             self.transition(Status.off)
             self.target.activate(self.console)
-            self.power.cycle()
-            self.target.activate(self.shell)
-            self.shell.run("systemctl is-system-running --wait")
+            if self.snapshot and self.power.has_snapshot(self.snapshot):
+                self.power.restore_snapshot(self.snapshot)
+                # let the shell print a prompt
+                self.console.sendline("")
+                self.target.activate(self.shell)
+            else:
+                self.power.cycle()
+                self.target.activate(self.shell)
+                self.shell.run("systemctl is-system-running --wait")
+                if self.snapshot:
+                    self.power.save_snapshot(self.snapshot)
         else:
             raise StrategyError(
                 f"no transition found from {self.status} to {status}"
             )
-        self.status = status
+        self._set_status(status)
 
     @step(args=['status'])
     def force(self, status, *, step):  # pylint: disable=redefined-outer-name
@@ -67,4 +128,4 @@ class ShellStrategy(Strategy):
             self.target.activate(self.shell)
         else:
             raise StrategyError(f"not setup found for {status}")
-        self.status = status
+        self._set_status(status)
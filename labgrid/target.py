@@ -2,14 +2,17 @@ import abc
 import atexit
 import logging
 import sys
-from time import monotonic, sleep
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
 
 import attr
 
 from .binding import BindingError, BindingState
 from .driver import Driver
 from .exceptions import NoSupplierFoundError, NoDriverFoundError, NoResourceFoundError, NoStrategyFoundError
-from .resource import Resource
+from .resource import ManagedResource, Resource, ResourceManager
+from .step import steps
 from .strategy import Strategy
 from .util import Timeout
 from .factory import target_factory
@@ -17,6 +20,12 @@ from .factory import target_factory
 
 @attr.s(eq=False)
 class Target:
+    # maximum number of suppliers activated concurrently with parallel_activation
+    MAX_ACTIVATION_WORKERS = 8
+    # maximum time between polls in await_resources(), for resource managers
+    # which don't signal changes via ResourceManager.notify_change()
+    AWAIT_POLL_INTERVAL = 0.5
+
     name = attr.ib(validator=attr.validators.instance_of(str))
     env = attr.ib(default=None)
 
@@ -25,6 +34,16 @@ class Target:
         self.resources = []
         self.drivers = []
         self.last_update = 0.0
+        # duration of the last on_activate() call by client display name
+        self.activation_times = {}
+        self.parallel_activation = False
+        if self.env:
+            try:
+                self.parallel_activation = bool(
+                    self.env.config.get_target_option(self.name, "parallel_activation", False)
+                )
+            except KeyError:
+                pass
         # This should really be an argument for Drivers, but currently attrs
         # doesn't support keyword only agruments, so we can't add an optional
         # argument at the BindingMixin level.
@@ -33,6 +52,9 @@ class Target:
         self._lookup_table = {
             Strategy.__name__: Strategy,
         }
+        # bound resources and drivers by requested class, see _get_index()
+        self._resource_index = {}
+        self._driver_index = {}
         atexit.register(self._atexit_cleanup)
 
     def interact(self, msg):
@@ -89,12 +111,14 @@ class Target:
             timeout = Timeout(timeout)
 
         while waiting and not timeout.expired:
+            count = ResourceManager.get_change_count()
             waiting = set(r for r in waiting if r.avail != avail)
             for r in waiting:
                 r.poll()
-            if not any(r for r in waiting if r.avail == avail):
-                # sleep if no progress
-                sleep(0.5)
+            if waiting and not any(r for r in waiting if r.avail == avail):
+                # wait for a change notification from a resource manager if no
+                # progress, but poll managers without notifications regularly
+                ResourceManager.wait_for_change(count, min(self.AWAIT_POLL_INTERVAL, timeout.remaining))
 
         if waiting:
             raise NoResourceFoundError(
@@ -104,6 +128,35 @@ class Target:
 
         self.update_resources()
 
+    @staticmethod
+    def _add_to_entry(entry, bindable):
+        instances, by_name = entry
+        instances.append(bindable)
+        by_name.setdefault(bindable.name, []).append(bindable)
+
+    def _get_index(self, index, bindables, cls):
+        """
+        Return a tuple of the bindables which are instances of cls (in binding
+        order) and a dict of these instances by name.
+
+        The entry is created on the first lookup of cls and kept up to date by
+        _update_index() when binding, so repeated lookups don't need to check
+        all resources or drivers of the target.
+        """
+        entry = index.get(cls)
+        if entry is None:
+            entry = ([], {})
+            for bindable in bindables:
+                if isinstance(bindable, cls):
+                    self._add_to_entry(entry, bindable)
+            index[cls] = entry
+        return entry
+
+    def _update_index(self, index, bindable):
+        for cls, entry in index.items():
+            if isinstance(bindable, cls):
+                self._add_to_entry(entry, bindable)
+
     def get_resource(self, cls, *, name=None, wait_avail=True):
         """
         Helper function to get a resource of the target.
@@ -115,21 +168,15 @@ class Target:
         name -- optional name to use as a filter
         wait_avail -- wait for the resource to become available (default True)
         """
-        found = []
-        other_names = []
-        default = None
         if isinstance(cls, str):
             cls = target_factory.class_from_string(cls)
 
-        for res in self.resources:
-            if not isinstance(res, cls):
-                continue
-            if res.name == "default":
-                default = res
-            if name and res.name != name:
-                other_names.append(res.name)
-                continue
-            found.append(res)
+        instances, by_name = self._get_index(self._resource_index, self.resources, cls)
+        if name:
+            found = list(by_name.get(name, []))
+        else:
+            found = list(instances)
+        default = by_name["default"][-1] if "default" in by_name else None
 
         # if no explicit resource name is requested and a "default" resource was saved and
         # multiple resources were found, use the default resource
@@ -138,6 +185,7 @@ class Target:
 
         if not found:
             name_msg = f" named '{name}'" if name else ""
+            other_names = [res.name for res in instances if res.name != name]
             if other_names:
                 raise NoResourceFoundError(
                     f"no {cls.__name__} resource{name_msg} found in {self}, matching resources with other names: {other_names}"  # pylint: disable=line-too-long
@@ -162,9 +210,13 @@ class Target:
         if isinstance(cls, str):
             cls = target_factory.class_from_string(cls)
 
-        for drv in self.drivers:
-            if not isinstance(drv, cls):
-                continue
+        instances, by_name = self._get_index(self._driver_index, self.drivers, cls)
+        if name and not resource:
+            # drivers with other names are only needed for the error message
+            candidates = by_name.get(name) or instances
+        else:
+            candidates = instances
+        for drv in candidates:
             if resource and resource not in drv.get_bound_resources():
                 continue
             if name and drv.name != name:
@@ -240,11 +292,7 @@ class Target:
         Returns the Strategy, if exactly one exists and raises a
         NoStrategyFoundError otherwise.
         """
-        found = []
-        for drv in self.drivers:
-            if not isinstance(drv, Strategy):
-                continue
-            found.append(drv)
+        found, _ = self._get_index(self._driver_index, self.drivers, Strategy)
         if not found:
             raise NoStrategyFoundError(f"no Strategy found in {self}")
         elif len(found) > 1:
@@ -304,6 +352,7 @@ class Target:
 
         # update state
         self.resources.append(resource)
+        self._update_index(self._resource_index, resource)
         # update lookup table
         self._lookup_table[resource.__class__.__name__] = resource.__class__
         resource.target = self
@@ -408,6 +457,7 @@ class Target:
 
         # update relationship in both directions
         self.drivers.append(client)
+        self._update_index(self._driver_index, client)
         # update lookup table
         cls = client.__class__
         self._lookup_table[cls.__name__] = cls
@@ -457,6 +507,10 @@ class Target:
         # consistency check
         assert client in self.resources or client in self.drivers
 
+        if self.parallel_activation:
+            self._activate_parallel(client)
+            return
+
         # wait until resources are available
         resources = [resource for resource in client.suppliers if isinstance(resource, Resource)]
         self.await_resources(resources)
@@ -468,9 +522,78 @@ class Target:
             supplier.resolve_conflicts(client)
 
         # update state
-        client.on_activate()
+        self._on_activate(client)
         client.state = BindingState.active
 
+    def _on_activate(self, client, stack=()):
+        with steps.inherit(stack) if stack else nullcontext():
+            start = monotonic()
+            client.on_activate()
+            duration = self.activation_times[client.display_name] = monotonic() - start
+        self.log.debug("activated %s in %.3f s", client.display_name, duration)
+
+    def _activate_parallel(self, client):
+        """
+        Activate the client and its inactive suppliers, activating independent
+        suppliers concurrently on a thread pool. Each client is activated once
+        all of its suppliers are active.
+        """
+        # the client and all inactive suppliers it depends on, and the ids of
+        # their inactive suppliers (bindables are not necessarily hashable)
+        clients = {}
+        pending = {}
+        todo = [client]
+        while todo:
+            current = todo.pop()
+            if id(current) in pending:
+                continue
+            if current.state is not BindingState.bound:
+                raise BindingError(
+                    f"{current} is not in state {BindingState.bound}"
+                )
+            suppliers = [s for s in current.suppliers if s.state is not BindingState.active]
+            clients[id(current)] = current
+            pending[id(current)] = set(id(s) for s in suppliers)
+            todo.extend(suppliers)
+
+        # wait until resources are available
+        resources = {}
+        for current in clients.values():
+            resources.update((id(s), s) for s in current.suppliers if isinstance(s, Resource))
+        self.await_resources(list(resources.values()))
+
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.MAX_ACTIVATION_WORKERS) as executor:
+            while pending or running:
+                ready = [k for k, suppliers in pending.items() if not suppliers] if error is None else []
+                for key in ready:
+                    del pending[key]
+                    current = clients[key]
+                    # conflicts are resolved in this thread, as this may
+                    # deactivate other clients
+                    for supplier in current.suppliers:
+                        supplier.resolve_conflicts(current)
+                    future = executor.submit(self._on_activate, current, steps.get_stack())
+                    running[future] = current
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current = running.pop(future)
+                    if future.exception() is not None:
+                        # let the running activations complete before raising
+                        error = error or future.exception()
+                        continue
+                    current.state = BindingState.active
+                    for suppliers in pending.values():
+                        suppliers.discard(id(current))
+
+        if error is not None:
+            raise error
+
     def deactivate(self, client, name=None):
         """
         Recursively deactivate the client's clients and itself.
@@ -562,3 +685,5 @@ class Target:
         self.deactivate_all_drivers()
         for res in reversed(self.resources):
             self.deactivate(res)
+            if isinstance(res, ManagedResource) and res in res.manager.resources:
+                res.manager._remove_resource(res)
@@ -0,0 +1,26 @@
+import importlib
+import sys
+
+
+def lazy_attributes(package, attributes):
+    """Return module-level __getattr__() and __dir__() functions (see PEP 562)
+    which import the module providing an attribute only on first access.
+
+    Args:
+        package (str): name of the package, usually __name__
+        attributes (dict): attribute name -> (relative or absolute) module name
+    """
+    def __getattr__(name):
+        try:
+            module = attributes[name]
+        except KeyError:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}") from None
+
+        value = getattr(importlib.import_module(module, package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(attributes))
+
+    return __getattr__, __dir__
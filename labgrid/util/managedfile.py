@@ -1,7 +1,11 @@
+import atexit
 import hashlib
 import logging
 import os
+import queue
 import subprocess
+import threading
+from concurrent.futures import Executor, Future
 from importlib import import_module
 
 import attr
@@ -16,6 +20,64 @@ class ManagedFileError(Exception):
     pass
 
 
+class _DaemonExecutor(Executor):
+    """Minimal thread pool executor using daemon worker threads
+
+    Unlike the worker threads of a ThreadPoolExecutor, which are joined when
+    the interpreter shuts down (after running all queued work items), these
+    threads don't delay the exit of the process.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix):
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+        self._idle = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future = Future()
+            self._queue.put((future, fn, args, kwargs))
+            if not self._idle.acquire(blocking=False) and len(self._threads) < self._max_workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f"{self._thread_name_prefix}_{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            del item
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:  # pylint: disable=broad-except
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            del future
+            self._idle.release()
+
+    def shutdown(self, wait=True):  # pylint: disable=arguments-differ
+        with self._lock:
+            self._shutdown = True
+            for _ in self._threads:
+                self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
 @attr.s
 class ManagedFile:
     """ The ManagedFile allows the synchronisation of a file to a remote host.
@@ -28,7 +90,22 @@ class ManagedFile:
         ManagedFile("/tmp/examplefile", <your-resource>)
 
     Synchronisation is done with the sync_to_resource method.
+
+    The copy can be started in the background with the prefetch method.
+    Copies of the same (unmodified) file to the same host are shared by all
+    ManagedFiles in the process, so sync_to_resource waits for an in-flight
+    prefetch or reuses a completed one, if the copy still exists on the host.
+    Copies which have not started yet are cancelled when the process exits.
     """
+    # number of files copied concurrently in the background
+    MAX_PARALLEL_TRANSFERS = 4
+
+    # futures of the copies started in this process, by host, local path,
+    # size, modification time and NFS detection
+    _transfers = {}
+    _transfers_lock = threading.Lock()
+    _executor = None
+
     local_path = attr.ib(
         validator=attr.validators.instance_of(str),
         converter=lambda x: os.path.realpath(str(x))
@@ -56,17 +133,7 @@ class ManagedFile:
             host = self.resource.host
             conn = sshmanager.open(host)
 
-            if self._on_nfs(conn):
-                self.logger.info("File %s is accessible on %s, skipping copy", self.local_path, host)
-                self.rpath = os.path.dirname(self.local_path) + "/"
-            else:
-                self.rpath = f"{self.get_user_cache_path()}/{self.get_hash()}/"
-                self.logger.info("Synchronizing %s to %s", self.local_path, host)
-                conn.run_check(f"mkdir -p {self.rpath}")
-                conn.put_file(
-                    self.local_path,
-                    f"{self.rpath}{os.path.basename(self.local_path)}"
-                )
+            self.rpath = self.prefetch().result()
 
             if symlink is not None:
                 self.logger.info("Linking")
@@ -79,6 +146,77 @@ class ManagedFile:
                 conn.run_check(f"ln -sfn {self.rpath}{os.path.basename(self.local_path)} {symlink}")
 
 
+    def prefetch(self):
+        """start synchronising the file to the host specified in a resource in
+        the background, unless an unmodified copy was started before
+
+        Returns:
+            concurrent.futures.Future: resolving to the remote directory, None
+            for local resources
+        """
+        if not isinstance(self.resource, NetworkResource):
+            return None
+
+        stat = os.stat(self.local_path)
+        key = (self.resource.host, self.local_path, stat.st_size, stat.st_mtime_ns, self.detect_nfs)
+        cls = type(self)
+        with cls._transfers_lock:
+            future = cls._transfers.get(key)
+            # retry failed copies
+            if future is None or (future.done() and future.exception() is not None):
+                future = cls._transfers[key] = cls._get_executor().submit(self._copy)
+            elif future.done():
+                future = cls._transfers[key] = cls._get_executor().submit(self._check_copy, future.result())
+        return future
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            cls._executor = _DaemonExecutor(
+                max_workers=cls.MAX_PARALLEL_TRANSFERS, thread_name_prefix="ManagedFile"
+            )
+            atexit.register(cls._shutdown_executor)
+        return cls._executor
+
+    @classmethod
+    def _shutdown_executor(cls):
+        """Cancel the copies which have not started yet, so that they don't
+        delay the exit of the process"""
+        with cls._transfers_lock:
+            # running copies don't delay the exit, as they run in daemon threads
+            for future in cls._transfers.values():
+                future.cancel()
+            executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _check_copy(self, rpath):
+        """Return rpath if the completed copy is still on the host, copy again
+        otherwise (for example after the cache was cleaned up)"""
+        conn = sshmanager.open(self.resource.host)
+        remote_file = f"{rpath}{os.path.basename(self.local_path)}"
+        if conn.run(f"test -f {remote_file}")[2] == 0:
+            return rpath
+        self.logger.info("%s no longer exists on %s", remote_file, self.resource.host)
+        return self._copy()
+
+    def _copy(self):
+        host = self.resource.host
+        conn = sshmanager.open(host)
+
+        if self._on_nfs(conn):
+            self.logger.info("File %s is accessible on %s, skipping copy", self.local_path, host)
+            return os.path.dirname(self.local_path) + "/"
+
+        rpath = f"{self.get_user_cache_path()}/{self.get_hash()}/"
+        self.logger.info("Synchronizing %s to %s", self.local_path, host)
+        conn.run_check(f"mkdir -p {rpath}")
+        conn.put_file(
+            self.local_path,
+            f"{rpath}{os.path.basename(self.local_path)}"
+        )
+        return rpath
+
     def _on_nfs(self, conn):
         if self._on_nfs_cached is not None:
             return self._on_nfs_cached
@@ -153,3 +291,33 @@ class ManagedFile:
 
     def get_user_cache_path(self):
         return f"/var/cache/labgrid/{get_user()}"
+
+
+def prefetch_images(target):
+    """Start synchronising all images of the target's environment
+    configuration to the hosts of the target's network resources in the
+    background
+
+    Drivers using ManagedFiles for these images wait for the copies to
+    complete instead of starting new ones.
+
+    Returns:
+        dict: futures (see ManagedFile.prefetch) by (image key, host)
+    """
+    futures = {}
+    if target.env is None:
+        return futures
+
+    resources = {}
+    for resource in target.resources:
+        if isinstance(resource, NetworkResource):
+            resources.setdefault(resource.host, resource)
+
+    for name, path in target.env.config.get_images().items():
+        if not os.path.isfile(path):
+            logging.getLogger("ManagedFile").warning("image %s (%s) not found, skipping", name, path)
+            continue
+        for host, resource in resources.items():
+            futures[(name, host)] = ManagedFile(path, resource).prefetch()
+
+    return futures
@@ -0,0 +1,164 @@
+"""The util.netlink module follows the kernel's neighbour table (ARP and NDP
+entries) via rtnetlink, as an alternative to repeatedly calling ``ip neigh
+show``."""
+
+import errno
+import socket
+import struct
+
+__all__ = [
+    "NeighbourTable",
+]
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+RTM_GETNEIGH = 30
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+RTMGRP_NEIGH = 0x4
+NDA_DST = 1
+NDA_LLADDR = 2
+NUD_NOARP = 0x40
+
+_NLMSGHDR = struct.Struct("=LHHLL")  # len, type, flags, seq, pid
+_NDMSG = struct.Struct("=BBHiHBB")  # family, pad1, pad2, ifindex, state, flags, type
+_RTATTR = struct.Struct("=HH")  # len, type
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _parse_attrs(data):
+    attrs = {}
+    offset = 0
+    while offset + _RTATTR.size <= len(data):
+        length, attr_type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attrs[attr_type] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def parse_messages(data):
+    """Yield (type, family, ifindex, state, attrs) for each neighbour message
+    in the netlink data"""
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, _, _, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        if msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH):
+            payload = data[offset + _NLMSGHDR.size:offset + length]
+            family, _, _, ifindex, state, _, _ = _NDMSG.unpack_from(payload)
+            attrs = _parse_attrs(payload[_NDMSG.size:])
+            yield msg_type, family, ifindex, state, attrs
+        offset += _align(length)
+
+
+class NeighbourTable:
+    """Keeps a copy of the kernel's neighbour table
+
+    After open(), the table is dumped once and then kept up to date from the
+    change notifications sent by the kernel. Call read() when the socket
+    returned by fileno() is readable.
+    """
+
+    def __init__(self):
+        self.sock = None
+        self.entries = {}
+        self._seq = 0
+
+    def open(self):
+        """Subscribe to neighbour changes and request the current table"""
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK,
+                             socket.NETLINK_ROUTE)
+        try:
+            sock.bind((0, RTMGRP_NEIGH))
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self._request_dump()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def _request_dump(self):
+        self._seq += 1
+        ndmsg = _NDMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0, 0, 0)
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(ndmsg), RTM_GETNEIGH,
+                                NLM_F_REQUEST | NLM_F_DUMP, self._seq, 0)
+        self.sock.send(header + ndmsg)
+
+    def read(self):
+        """Process all pending messages
+
+        Returns:
+            bool: True if the table changed
+        """
+        changed = False
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # notifications were dropped, so start over
+                self.entries.clear()
+                changed = True
+                try:
+                    self._request_dump()
+                except OSError:
+                    pass  # a dump is still in progress
+                continue
+            changed |= self.process(data)
+        return changed
+
+    def process(self, data):
+        """Apply the neighbour messages in data to the table
+
+        Returns:
+            bool: True if the table changed
+        """
+        changed = False
+        for msg_type, family, ifindex, state, attrs in parse_messages(data):
+            if NDA_DST not in attrs:
+                continue
+            key = (family, ifindex, attrs[NDA_DST])
+            # like "ip neigh show", hide NOARP and NONE entries
+            if msg_type == RTM_DELNEIGH or not state & 0xff & ~NUD_NOARP:
+                changed |= self.entries.pop(key, False) is not False
+                continue
+            lladdr = attrs.get(NDA_LLADDR)
+            if lladdr is not None:
+                lladdr = ":".join(f"{b:02x}" for b in lladdr)
+            if self.entries.get(key, False) != lladdr:
+                self.entries[key] = lladdr
+                changed = True
+        return changed
+
+    def get_neighbors(self):
+        """Return the neighbours in the format of EthernetPortManager
+
+        Returns:
+            Dict[List[str]]: dictionary with link layer addresses as keys
+            (None for incomplete entries) and sorted lists of IP addresses as
+            values
+        """
+        neighbors = {}
+        for (family, _, dst), lladdr in self.entries.items():
+            neighbors.setdefault(lladdr, []).append(socket.inet_ntop(family, dst))
+        for value in neighbors.values():
+            value.sort()
+        return neighbors
@@ -4,8 +4,6 @@ from urllib.parse import urlsplit, urlunsplit, urlparse
 
 from .ssh import sshmanager
 
-from ..resource.common import Resource
-
 __all__ = ['proxymanager']
 
 
@@ -41,6 +39,9 @@ class ProxyManager:
         Raises:
             ExecutionError: if the SSH connection/forwarding fails
         """
+        # avoid importing all resources when loading this module
+        from ..resource.common import Resource
+
         assert isinstance(res, Resource)
 
         prefix = '' if '//' in res.host else '//'
@@ -98,6 +99,8 @@ class ProxyManager:
     @classmethod
     def get_command(cls, res, host, port, ifname=None):
         """get argument list to start a proxy process connected to the target"""
+        from ..resource.common import Resource
+
         assert isinstance(res, Resource)
 
         proxy = cls._force_proxy
@@ -1,5 +1,9 @@
+import asyncio
+import collections
 import json
 import logging
+import threading
+
 import attr
 
 
@@ -50,3 +54,235 @@ class QMPMonitor:
 @attr.s(eq=False)
 class QMPError(Exception):
     msg = attr.ib(validator=attr.validators.instance_of(str))
+
+
+@attr.s(eq=False)
+class AsyncQMPClient:
+    """asyncio based QMP client for a QEMU monitor unix socket
+
+    In contrast to QMPMonitor, commands are tagged with an id, so several
+    commands can be in flight at the same time and asynchronous events are
+    not lost while waiting for a reply. Received events are queued until
+    consumed by wait_event() and passed to the callbacks registered with
+    add_event_callback().
+
+    All methods must be called from the event loop the client was connected
+    in.
+
+    Args:
+        max_events (int): number of unconsumed events to keep
+    """
+    max_events = attr.ib(default=1000, validator=attr.validators.instance_of(int))
+
+    def __attrs_post_init__(self):
+        self.logger = logging.getLogger(f"{self}")
+        self.events = collections.deque(maxlen=self.max_events)
+        self._callbacks = []
+        self._pending = {}
+        self._next_id = 0
+        self._reader = None
+        self._writer = None
+        self._receive_task = None
+        self._changed = None
+        self._closed = False
+
+    async def connect(self, path, timeout=10.0):
+        """Connect to the QMP unix socket at path and negotiate capabilities"""
+        self._changed = asyncio.Condition()
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(path, limit=1024 * 1024), timeout
+        )
+        try:
+            line = await asyncio.wait_for(self._reader.readline(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout waiting for QMP greeting on {path}") from None
+        if not line or not json.loads(line).get("QMP"):
+            raise QMPError("QMP greeting message invalid")
+        self._receive_task = asyncio.get_running_loop().create_task(self._receive())
+        await self.execute("qmp_capabilities", timeout=timeout)
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                self.logger.debug("Received line: %s", line.decode("utf-8").rstrip("\r\n"))
+                message = json.loads(line)
+                if "event" in message:
+                    self._handle_event(message)
+                    async with self._changed:
+                        self._changed.notify_all()
+                    continue
+                future = self._pending.pop(message.get("id"), None)
+                if future is None:
+                    self.logger.warning("Ignoring unexpected message: %s", message)
+                elif not future.done():
+                    future.set_result(message)
+        finally:
+            self._closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(QMPError("QMP connection closed"))
+            self._pending.clear()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def _handle_event(self, event):
+        self.events.append(event)
+        for callback in list(self._callbacks):
+            try:
+                callback(event)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("QMP event callback %s failed", callback)
+
+    def add_event_callback(self, callback):
+        """Call callback(event) for each received event"""
+        self._callbacks.append(callback)
+
+    def remove_event_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def clear_events(self):
+        """Discard all queued events"""
+        self.events.clear()
+
+    def _pop_event(self, name):
+        for index, event in enumerate(self.events):
+            if name is None or event["event"] == name:
+                # consume all earlier events as well
+                for _ in range(index + 1):
+                    self.events.popleft()
+                return event
+        return None
+
+    async def wait_event(self, name=None, timeout=None):
+        """Wait for an event and remove it from the queue, together with all
+        events received before it
+
+        Args:
+            name (str): event name (such as "RESET"), None for any event
+            timeout (float): timeout in seconds, None to wait forever
+
+        Returns:
+            dict: the event as received from QEMU
+        """
+        async def wait():
+            async with self._changed:
+                while True:
+                    event = self._pop_event(name)
+                    if event is not None:
+                        return event
+                    if self._closed:
+                        raise QMPError("QMP connection closed")
+                    await self._changed.wait()
+
+        try:
+            return await asyncio.wait_for(wait(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout waiting for QMP event {name or ''}".rstrip()) from None
+
+    async def execute(self, command, arguments=None, timeout=None):
+        """Execute a QMP command and return its result
+
+        Args:
+            command (str): QMP command
+            arguments (dict): optional, command arguments
+            timeout (float): timeout in seconds, None to wait forever
+        """
+        if self._closed:
+            raise QMPError("QMP connection closed")
+        self._next_id += 1
+        message = {"execute": command, "id": self._next_id}
+        if arguments:
+            message["arguments"] = arguments
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self._writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        try:
+            await self._writer.drain()
+            answer = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout waiting for reply to QMP command {command}") from None
+        finally:
+            self._pending.pop(message["id"], None)
+        if "error" in answer:
+            raise QMPError(f"{command} failed: {answer['error'].get('desc', answer['error'])}")
+        return answer["return"]
+
+    async def close(self):
+        if self._receive_task:
+            self._receive_task.cancel()
+            try:
+                await self._receive_task
+            except asyncio.CancelledError:
+                pass
+            self._receive_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._closed = True
+
+
+@attr.s(eq=False)
+class QMPClient:
+    """Runs an AsyncQMPClient in an event loop in a background thread, for use
+    from synchronous code such as drivers and strategies
+
+    Event callbacks are called from the background thread.
+
+    Args:
+        path (str): path of the QMP unix socket
+        timeout (float): timeout for connecting
+    """
+    path = attr.ib(validator=attr.validators.instance_of(str))
+    timeout = attr.ib(default=10.0, validator=attr.validators.instance_of((int, float)))
+
+    def __attrs_post_init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="QMPClient", daemon=True)
+        self._thread.start()
+        self.client = AsyncQMPClient()
+        try:
+            self._call(self.client.connect(self.path, self.timeout))
+        except Exception:
+            self.close()
+            raise
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _call_in_loop(self, func, *args):
+        # wait until func was called, so that its effect is ordered with
+        # respect to the caller's following actions
+        async def call():
+            return func(*args)
+        return self._call(call())
+
+    def execute(self, command, arguments=None, timeout=None):
+        """Execute a QMP command and return its result, see
+        AsyncQMPClient.execute()"""
+        return self._call(self.client.execute(command, arguments, timeout))
+
+    def wait_event(self, name=None, timeout=None):
+        """Wait for an event, see AsyncQMPClient.wait_event()"""
+        return self._call(self.client.wait_event(name, timeout))
+
+    def clear_events(self):
+        """Discard all queued events"""
+        self._call_in_loop(self.client.clear_events)
+
+    def add_event_callback(self, callback):
+        self._call_in_loop(self.client.add_event_callback, callback)
+
+    def remove_event_callback(self, callback):
+        self._call_in_loop(self.client.remove_event_callback, callback)
+
+    def close(self):
+        """Close the connection and stop the background thread"""
+        if self.loop.is_closed():
+            return
+        self._call(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
@@ -4,6 +4,7 @@ import logging
 import shutil
 import subprocess
 import os
+import threading
 from select import select
 from functools import wraps
 from typing import Dict
@@ -33,6 +34,7 @@ class SSHConnectionManager:
 
     def __attrs_post_init__(self):
         self.logger = logging.getLogger(f"{self}")
+        self._lock = threading.Lock()
         atexit.register(self.close_all)
 
     def get(self, host: str):
@@ -43,12 +45,14 @@ class SSHConnectionManager:
 
         Returns:
             :obj:`SSHConnection`: the SSHConnection for the host"""
-        instance = self._connections.get(host)
-        if instance is None:
-            self.logger.debug("Creating SSHConnection for %s", host)
-            instance = SSHConnection(host)
-            instance.connect()
-            self._connections[host] = instance
+        # connections may be opened from background threads (see ManagedFile)
+        with self._lock:
+            instance = self._connections.get(host)
+            if instance is None:
+                self.logger.debug("Creating SSHConnection for %s", host)
+                instance = SSHConnection(host)
+                instance.connect()
+                self._connections[host] = instance
         return instance
 
     def add_connection(self, connection):
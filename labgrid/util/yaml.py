@@ -9,24 +9,32 @@ from string import Template
 
 import yaml
 
+# use the libyaml based implementation if available, as it is considerably
+# faster for large files such as the coordinator's places
+try:
+    from yaml import CSafeLoader as _SafeLoader, CSafeDumper as _SafeDumper
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader, SafeDumper as _SafeDumper
 
-class Loader(yaml.SafeLoader):
+
+class Loader(_SafeLoader):
     pass
 
 
-class Dumper(yaml.SafeDumper):
+class Dumper(_SafeDumper):
     pass
 
 
 def _check_duplicate_dict_keys(loader, node):
-    seen_keys = []
+    seen_keys = set()
     for key_node, _ in node.value:
         key = loader.construct_scalar(key_node)
         if key in seen_keys:
             warnings.warn(
-                f"{loader.name}: previous entry with duplicate YAML dictionary key '{key}' overwritten", UserWarning
+                f"{node.start_mark.name}: previous entry with duplicate YAML dictionary key '{key}' overwritten",
+                UserWarning,
             )
-        seen_keys.append(key)
+        seen_keys.add(key)
 
 
 def _dict_constructor(loader, node):
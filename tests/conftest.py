@@ -203,6 +203,8 @@ def pytest_addoption(parser):
                      help="SSH username to use for SSHDriver testing")
     parser.addoption("--crossbar-venv", default=None,
                      help="Path to separate virtualenv with crossbar installed")
+    parser.addoption("--benchmark", action="store_true",
+                     help="Run performance benchmarks")
 
 def pytest_configure(config):
     # register an additional marker
@@ -214,6 +216,8 @@ def pytest_configure(config):
                             "sshusername: test SSHDriver against Localhost")
     config.addinivalue_line("markers",
                             "crossbar: test against local crossbar")
+    config.addinivalue_line("markers",
+                            "benchmark: performance benchmark")
 
 def pytest_runtest_setup(item):
     envmarker = item.get_closest_marker("sigrokusb")
@@ -232,3 +236,7 @@ def pytest_runtest_setup(item):
     if envmarker is not None:
         if item.config.getoption("--crossbar-venv") is None:
             pytest.skip("No path to crossbar virtualenv given (set with --crossbar-venv <path>)")
+    envmarker = item.get_closest_marker("benchmark")
+    if envmarker is not None:
+        if item.config.getoption("--benchmark") is False:
+            pytest.skip("benchmarks not enabled (enable with --benchmark)")
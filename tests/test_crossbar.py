@@ -104,6 +104,41 @@ def test_place_alias(place):
         spawn.close()
         assert spawn.exitstatus == 0, spawn.before.strip()
 
+@pytest.mark.xfail(sys.version_info >= (3, 12), reason="latest crossbar release incompatible with python3.12+")
+def test_place_show_matching_resources(place, exporter):
+    with pexpect.spawn('python -m labgrid.remote.client -p test add-match "*/Testport/*"') as spawn:
+        spawn.expect(pexpect.EOF)
+        spawn.close()
+        assert spawn.exitstatus == 0, spawn.before.strip()
+
+    # only the place and its matching resources are loaded from the coordinator
+    with pexpect.spawn('python -m labgrid.remote.client -p test show') as spawn:
+        spawn.expect("Matching resource 'NetworkSerialPort' \\(testhost/Testport/NetworkSerialPort/NetworkSerialPort\\)")
+        spawn.expect(pexpect.EOF)
+        spawn.close()
+        assert spawn.exitstatus == 0, spawn.before.strip()
+
+@pytest.mark.xfail(sys.version_info >= (3, 12), reason="latest crossbar release incompatible with python3.12+")
+def test_place_show_by_pattern(place, exporter):
+    with pexpect.spawn('python -m labgrid.remote.client -p test add-match "*/Testport/*"') as spawn:
+        spawn.expect(pexpect.EOF)
+        spawn.close()
+        assert spawn.exitstatus == 0, spawn.before.strip()
+
+    with pexpect.spawn('python -m labgrid.remote.client -p test add-alias foo') as spawn:
+        spawn.expect(pexpect.EOF)
+        spawn.close()
+        assert spawn.exitstatus == 0, spawn.before.strip()
+
+    # alias and substring patterns are resolved when loading a single place
+    for pattern in ["foo", "es"]:
+        with pexpect.spawn(f'python -m labgrid.remote.client -p {pattern} show') as spawn:
+            spawn.expect("Place 'test':")
+            spawn.expect("Matching resource 'NetworkSerialPort'")
+            spawn.expect(pexpect.EOF)
+            spawn.close()
+            assert spawn.exitstatus == 0, spawn.before.strip()
+
 @pytest.mark.xfail(sys.version_info >= (3, 12), reason="latest crossbar release incompatible with python3.12+")
 def test_place_comment(place):
     with pexpect.spawn('python -m labgrid.remote.client -p test set-comment my comment') as spawn:
@@ -1,6 +1,214 @@
-from labgrid.resource import SNMPEthernetPort
+import asyncio
+import shutil
+import socket
+import struct
+import sys
+import time
+
+import pytest
+
+from labgrid.resource import ResourceManager, SNMPEthernetPort
+from labgrid.resource.ethernetport import AdaptiveInterval, EthernetPortManager, SNMPSwitch
+from labgrid.util.helper import get_free_port
+from labgrid.util.netlink import NeighbourTable, NUD_NOARP, RTM_DELNEIGH, RTM_NEWNEIGH
 
 
 def test_instance(target):
     s = SNMPEthernetPort(target, 'port-1', switch='dummy-switch', interface='1')
     assert (isinstance(s, SNMPEthernetPort))
+
+
+class FakeSwitch:
+    delay = 0.1
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.macs_by_port = {}
+        self.ports = {}
+
+    async def update(self):
+        await asyncio.sleep(self.delay)
+        changed = not self.ports
+        self.ports = {"1": {"operstatus": "up"}}
+        return changed
+
+
+@pytest.fixture
+def fake_switch_manager(monkeypatch):
+    monkeypatch.setattr("labgrid.resource.ethernetport.SNMPSwitch", FakeSwitch)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    previous = ResourceManager.instances.pop(EthernetPortManager, None)
+    yield
+    manager = ResourceManager.instances.pop(EthernetPortManager, None)
+    if previous is not None:
+        ResourceManager.instances[EthernetPortManager] = previous
+    if manager is not None and manager._neighbor_table is not None:
+        loop.remove_reader(manager._neighbor_table.fileno())
+        manager._neighbor_table.close()
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+def test_manager_poll_waits_for_update(target, fake_switch_manager):
+    port = SNMPEthernetPort(target, "port", switch="switch", interface="1")
+    port.poll()
+    assert port.extra == {"operstatus": "up"}
+
+
+def test_manager_poll_timeout(target, fake_switch_manager, monkeypatch):
+    monkeypatch.setattr(FakeSwitch, "delay", 5.0)
+    port = SNMPEthernetPort(target, "port", switch="switch", interface="1")
+    start = time.monotonic()
+    port.poll()
+    assert time.monotonic() - start < EthernetPortManager.UPDATE_TIMEOUT + 0.5
+    assert port.extra == {}
+
+
+def test_manager_remove_switch(target, fake_switch_manager):
+    a = SNMPEthernetPort(target, "a", switch="sw1", interface="1")
+    b = SNMPEthernetPort(target, "b", switch="sw1", interface="2")
+    c = SNMPEthernetPort(target, "c", switch="sw2", interface="1")
+    manager = a.manager
+    tasks = dict(manager.switch_tasks)
+    assert set(tasks) == {"sw1", "sw2"}
+
+    manager._remove_resource(c)
+    assert set(manager.switches) == {"sw1"}
+    assert set(manager.switch_tasks) == {"sw1"}
+    manager.poll()
+    assert tasks["sw2"].cancelled()
+
+    manager._remove_resource(a)
+    assert set(manager.switches) == {"sw1"}
+    manager._add_resource(c)
+    assert set(manager.switches) == {"sw1", "sw2"}
+
+    # all resources of a target are removed by its cleanup
+    target.cleanup()
+    assert manager.resources == []
+    assert manager.switches == {}
+    assert manager.switch_tasks == {}
+
+
+def test_adaptive_interval():
+    interval = AdaptiveInterval(1.0, 5.0)
+    assert interval.update(False) == 2.0
+    assert interval.update(False) == 4.0
+    assert interval.update(False) == 5.0
+    assert interval.update(False) == 5.0
+    assert interval.update(True) == 1.0
+
+
+def neigh_msg(msg_type, family, addr, lladdr=None, state=0x02):
+    attrs = b""
+    dst = socket.inet_pton(family, addr)
+    for attr_type, value in [(1, dst), (2, lladdr)]:
+        if value is None:
+            continue
+        attr = struct.pack("=HH", 4 + len(value), attr_type) + value
+        attrs += attr + b"\0" * (-len(attr) % 4)
+    payload = struct.pack("=BBHiHBB", family, 0, 0, 2, state, 0, 0) + attrs
+    return struct.pack("=LHHLL", 16 + len(payload), msg_type, 0, 0, 0) + payload
+
+
+def test_neighbour_table_process():
+    table = NeighbourTable()
+    mac = bytes.fromhex("0200000000aa")
+    data = (
+        neigh_msg(RTM_NEWNEIGH, socket.AF_INET, "192.0.2.2", mac)
+        + neigh_msg(RTM_NEWNEIGH, socket.AF_INET6, "2001:db8::2", mac)
+        + neigh_msg(RTM_NEWNEIGH, socket.AF_INET, "192.0.2.3")
+        + neigh_msg(RTM_NEWNEIGH, socket.AF_INET, "192.0.2.4", mac, state=NUD_NOARP)
+    )
+    assert table.process(data)
+    assert table.get_neighbors() == {
+        "02:00:00:00:00:aa": ["192.0.2.2", "2001:db8::2"],
+        None: ["192.0.2.3"],
+    }
+
+    # unchanged entries are not reported as changes
+    assert not table.process(neigh_msg(RTM_NEWNEIGH, socket.AF_INET, "192.0.2.2", mac))
+
+    assert table.process(neigh_msg(RTM_DELNEIGH, socket.AF_INET6, "2001:db8::2", mac))
+    assert table.get_neighbors() == {
+        "02:00:00:00:00:aa": ["192.0.2.2"],
+        None: ["192.0.2.3"],
+    }
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux") or not shutil.which("ip"),
+                    reason="requires Linux and ip")
+def test_neighbour_table_dump():
+    table = NeighbourTable()
+    try:
+        table.open()
+    except OSError:
+        pytest.skip("netlink not available")
+    try:
+        # wait until the dump has been received
+        for _ in range(50):
+            if table.read() or table.entries:
+                break
+            time.sleep(0.01)
+        assert table.get_neighbors() == EthernetPortManager._get_neigh()
+    finally:
+        table.close()
+
+
+@pytest.fixture
+def snmp_agent():
+    pytest.importorskip("pysnmp")
+    from pysnmp.carrier.asyncio.dgram import udp
+    from pysnmp.entity import config, engine
+    from pysnmp.entity.rfc3413 import cmdrsp, context
+
+    async def start(port):
+        snmp_engine = engine.SnmpEngine()
+        config.addTransport(snmp_engine, udp.domainName,
+                            udp.UdpTransport().openServerMode(("127.0.0.1", port)))
+        config.addV1System(snmp_engine, "first", "public")
+        config.addV1System(snmp_engine, "second", "private")
+        config.addVacmUser(snmp_engine, 2, "first", "noAuthNoPriv", (1, 3, 6), (1, 3, 6))
+        snmp_context = context.SnmpContext(snmp_engine)
+        cmdrsp.GetCommandResponder(snmp_engine, snmp_context)
+        cmdrsp.BulkCommandResponder(snmp_engine, snmp_context)
+        return snmp_engine
+
+    return start
+
+
+def test_snmp_walk(snmp_agent):
+    from pysnmp.hlapi import asyncio as hlapi
+
+    async def run():
+        port = get_free_port()
+        await snmp_agent(port)
+        switch = SNMPSwitch("127.0.0.1")
+        switch._engine = hlapi.SnmpEngine()
+        switch._transport = hlapi.UdpTransportTarget(("127.0.0.1", port), timeout=1, retries=0)
+
+        # two rows per GETBULK request, so the walk needs several requests
+        rows = await switch._walk(
+            2,
+            hlapi.ObjectType(hlapi.ObjectIdentity("SNMP-COMMUNITY-MIB", "snmpCommunityName")),
+            hlapi.ObjectType(hlapi.ObjectIdentity("SNMP-COMMUNITY-MIB", "snmpCommunitySecurityName")),
+        )
+        assert [[str(val) for _, val in row] for row in rows] == [
+            ["public", "first"],
+            ["private", "second"],
+        ]
+
+        # walks of several switches can run concurrently
+        results = await asyncio.gather(*[
+            switch._walk(3, hlapi.ObjectType(hlapi.ObjectIdentity("SNMPv2-MIB", "system")))
+            for _ in range(10)
+        ])
+        assert all(len(rows) == len(results[0]) > 1 for rows in results)
+        assert str(results[0][0][0][1]).startswith("PySNMP engine")
+
+    asyncio.run(run())
@@ -0,0 +1,301 @@
+import asyncio
+import socket
+import sys
+import time
+import warnings
+
+import pytest
+
+from labgrid.remote.exporter import (
+    ExporterError, RestartBackoff, SerialPortExport, SharedSer2NetSerialPortExport, Ser2NetServer, get_ser2net_version,
+    is_tcp_port_listening,
+)
+
+
+@pytest.fixture
+def ser2net(tmpdir):
+    calls = tmpdir.join("calls")
+    script = tmpdir.join("ser2net")
+    script.write(f"""#!{sys.executable}
+import os, re, signal, socket, sys, time
+
+def log(line):
+    with open("{calls}", "a") as f:
+        f.write(line + "\\n")
+
+args = sys.argv[1:]
+log(" ".join(args))
+if args[0] == "-v":
+    print("ser2net version 4.3.0")
+    sys.exit(0)
+if os.path.exists("{tmpdir}/fail"):
+    sys.exit(1)
+log("started")
+
+sockets = {{}}
+
+def listen():
+    if os.path.exists("{tmpdir}/nolisten"):
+        return
+    if "-c" in args:
+        with open(args[args.index("-c") + 1]) as f:
+            config = f.read()
+    else:
+        config = " ".join(args)
+    ports = set(map(int, re.findall(r"tcp,(\\d+)", config)))
+    for port in ports - set(sockets):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("", port))
+        sock.listen()
+        sockets[port] = sock
+    for port in set(sockets) - ports:
+        sockets.pop(port).close()
+
+def reload(signum, frame):
+    log("reload")
+    listen()
+
+signal.signal(signal.SIGHUP, reload)
+listen()
+while True:
+    time.sleep(0.05)
+""")
+    script.chmod(0o755)
+    get_ser2net_version.cache_clear()
+    yield script
+    get_ser2net_version.cache_clear()
+    Ser2NetServer.instances.clear()
+
+
+def make_export(ser2net, port="/dev/ttyFAKE0", export_cls=SerialPortExport):
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "ser2net binary not found")
+        export = export_cls({
+            "cls": "RawSerialPort",
+            "params": {"port": port, "speed": 115200},
+        }, host="testhost")
+    export.ser2net_bin = str(ser2net)
+    return export
+
+
+def test_ser2net_version_cached(ser2net):
+    assert get_ser2net_version(str(ser2net)) == (4, 3, 0)
+    assert get_ser2net_version(str(ser2net)) == (4, 3, 0)
+    calls = ser2net.dirpath("calls").read().splitlines()
+    assert calls.count("-v") == 1
+
+
+def test_serial_export_start_stop_nonblocking(ser2net):
+    async def run():
+        exports = [make_export(ser2net, f"/dev/ttyFAKE{i}") for i in range(4)]
+
+        start = time.monotonic()
+        for export in exports:
+            export.acquire("place")
+        assert time.monotonic() - start < 0.5
+
+        for export in exports:
+            assert export.child.poll() is None
+            assert export.params["port"] is not None
+            # only available once ser2net is listening
+            assert not export.avail
+
+        await asyncio.wait_for(asyncio.gather(*[export.ready_task for export in exports]), 10.0)
+        for export in exports:
+            assert export.listening
+            export.poll()
+            assert export.avail
+
+        children = [export.child for export in exports]
+        start = time.monotonic()
+        for export in exports:
+            export.release()
+        assert time.monotonic() - start < 1.0
+
+        await asyncio.gather(*[export.stopping for export in exports])
+        for child in children:
+            assert child.poll() is not None
+        for export in exports:
+            assert export.child is None
+            assert not export.broken
+
+    asyncio.run(run())
+
+    calls = ser2net.dirpath("calls").read().splitlines()
+    assert calls.count("-v") == 1
+
+
+def test_serial_export_restart_backoff(ser2net):
+    ser2net.dirpath("fail").write("")
+    export = make_export(ser2net)
+    export.backoff = RestartBackoff(initial=0.05, maximum=1.0, max_failures=3)
+    export.acquire("place")
+    for failures in range(1, 4):
+        child = export.child
+        child.wait(1.0)
+        export.poll()
+        assert export.backoff.failures == failures
+        assert export.child is None
+        assert not export.avail
+        if failures < 3:
+            # restarted only after the backoff
+            assert not export.broken
+            time.sleep(export.backoff.delay)
+            export.poll()
+            assert export.child is not child
+
+    assert export.broken == "ser2net for /dev/ttyFAKE0 exited 3 times"
+    calls = ser2net.dirpath("calls").read().splitlines()
+    assert len([call for call in calls if call.startswith("-d")]) == 3
+
+
+def test_serial_export_not_listening(ser2net):
+    ser2net.dirpath("nolisten").write("")
+
+    async def run():
+        export = make_export(ser2net)
+        export.READY_TIMEOUT = 0.2
+        export.acquire("place")
+        child = export.child
+        await asyncio.wait_for(export.ready_task, 5.0)
+        assert child.wait(1.0) is not None
+        export.poll()
+        assert export.backoff.failures == 1
+        assert not export.avail
+        assert not export.broken
+
+    asyncio.run(run())
+
+
+def test_serial_export_listening_without_loop(ser2net):
+    export = make_export(ser2net)
+    export.acquire("place")
+    assert export.ready_task is None
+    for _ in range(100):
+        export.poll()
+        if export.avail:
+            break
+        time.sleep(0.05)
+    assert export.listening
+    export.release()
+    assert not export.listening
+
+
+def test_tcp_port_listening():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        assert not is_tcp_port_listening(port)
+        sock.listen()
+        assert is_tcp_port_listening(port)
+    assert not is_tcp_port_listening(port)
+
+
+def wait_for_calls(ser2net, line, count):
+    calls = ser2net.dirpath("calls")
+    for _ in range(100):
+        if calls.read().splitlines().count(line) >= count:
+            return
+        time.sleep(0.05)
+    pytest.fail(f"ser2net did not log {line} {count} times")
+
+
+def test_serial_export_shared(ser2net):
+    exports = [
+        make_export(ser2net, f"/dev/ttyFAKE{i}", SharedSer2NetSerialPortExport) for i in range(3)
+    ]
+    server = Ser2NetServer.get(str(ser2net))
+
+    for export in exports:
+        export.acquire("place")
+        assert export.params["port"] is not None
+    child = server.child
+    assert child.poll() is None
+    wait_for_calls(ser2net, "started", 1)
+
+    # reloading is delayed until ser2net has started
+    assert server.reload_pending
+    time.sleep(Ser2NetServer.STARTUP_TIMEOUT)
+    exports[0].poll()
+    assert not server.reload_pending
+    wait_for_calls(ser2net, "reload", 1)
+
+    config = server.config_file.read_text()
+    for export in exports:
+        assert f"accepter: telnet(rfc2217,mode=server),tcp,{export.params['port']}" in config
+        assert f"connector: serialdev(nouucplock=true),{export.local.port},115200n81,local" in config
+
+    exports[0].release()
+    assert exports[0].params["port"] is None
+    config = server.config_file.read_text()
+    assert exports[0].local.port not in config
+    assert exports[1].local.port in config
+    assert server.child is child
+    wait_for_calls(ser2net, "reload", 2)
+
+    for export in exports[1:]:
+        export.release()
+    assert server.child is None
+    assert child.poll() is not None
+
+    calls = ser2net.dirpath("calls").read().splitlines()
+    assert calls.count("started") == 1
+    assert calls.count("-v") == 1
+
+
+def test_serial_export_shared_restart(ser2net):
+    export = make_export(ser2net, export_cls=SharedSer2NetSerialPortExport)
+    server = Ser2NetServer.get(str(ser2net))
+    server.backoff = RestartBackoff(initial=0.05, maximum=1.0, max_failures=3)
+
+    export.acquire("place")
+    wait_for_calls(ser2net, "started", 1)
+    child = server.child
+    child.kill()
+    child.wait()
+    export.poll()
+    assert server.child is None
+    assert not export.avail
+    time.sleep(server.backoff.delay)
+    export.poll()
+    assert server.child.poll() is None
+    assert not export.broken
+    wait_for_calls(ser2net, "started", 2)
+
+    export.release()
+    assert server.child is None
+
+
+def test_serial_export_shared_broken(ser2net):
+    export = make_export(ser2net, export_cls=SharedSer2NetSerialPortExport)
+    server = Ser2NetServer.get(str(ser2net))
+    server.backoff = RestartBackoff(initial=0.05, maximum=1.0, max_failures=2)
+
+    export.acquire("place")
+    for started in range(1, 3):
+        wait_for_calls(ser2net, "started", started)
+        server.child.kill()
+        server.child.wait()
+        export.poll()
+        time.sleep(server.backoff.delay)
+        export.poll()
+
+    assert server.broken == "ser2net exited 2 times"
+    assert export.broken == "shared ser2net is broken: ser2net exited 2 times"
+    assert not export.avail
+
+    other = make_export(ser2net, "/dev/ttyFAKE1", SharedSer2NetSerialPortExport)
+    with pytest.raises(ExporterError, match="broken"):
+        other.acquire("place")
+    assert other.broken == "start failed"
+
+
+def test_ser2net_server_stop(ser2net):
+    export = make_export(ser2net, export_cls=SharedSer2NetSerialPortExport)
+    server = Ser2NetServer.get(str(ser2net))
+    export.acquire("place")
+    child = server.child
+    server.stop()
+    assert server.child is None
+    assert child.poll() is not None
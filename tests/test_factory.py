@@ -230,3 +230,44 @@ def test_register_same_resource():
         target_factory.reg_driver(SameResource)
         target_factory.reg_driver(SameResource)
     assert "driver with name" in excinfo.value.msg
+
+def test_builtin_registry():
+    import labgrid.driver
+    import labgrid.resource
+    import labgrid.strategy
+    from labgrid.registry import BUILTIN_CLASSES
+
+    for package in [labgrid.driver, labgrid.resource, labgrid.strategy]:
+        for name in package.__all__:
+            getattr(package, name)
+    # internal base classes and mixins are not exported
+    assert "CommandMixin" not in labgrid.driver.__all__
+    assert "NetworkResource" not in labgrid.resource.__all__
+
+    for name, cls in target_factory.all_classes.items():
+        if not cls.__module__.startswith(('labgrid.driver.', 'labgrid.protocol.', 'labgrid.resource.', 'labgrid.strategy.')):
+            continue
+        if cls.__module__ == 'labgrid.driver.fake':
+            continue
+        assert BUILTIN_CLASSES.get(name) == cls.__module__, f"{name} missing in labgrid/registry.py"
+
+
+def test_make_target_imports(tmpdir):
+    import subprocess
+    import sys
+
+    script = tmpdir.join("script.py")
+    script.write("""
+import sys
+from labgrid import target_factory
+
+target = target_factory.make_target('test', {
+    'resources': {'RawSerialPort': {'port': '/dev/null'}},
+    'drivers': {'SerialDriver': {}},
+})
+assert target.get_resource('SerialPort')
+assert 'labgrid.driver.serialdriver' in sys.modules
+assert 'labgrid.driver.qemudriver' not in sys.modules
+assert 'labgrid.resource.udev' not in sys.modules
+""")
+    subprocess.run([sys.executable, str(script)], check=True)
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 
 
@@ -260,3 +262,87 @@ def test_transition_error(target):
         strategy.transition('B', via='B')
 
     assert strategy.path == []
+
+
+@pytest.fixture
+def parallel_strategy(target):
+    from labgrid.strategy import GraphStrategy
+
+    class TestStrategy(GraphStrategy):
+        def __attrs_post_init__(self):
+            super().__attrs_post_init__()
+            self.running = set()
+            self.max_running = 0
+            self.fail = None
+
+        def run(self, name, duration):
+            self.running.add(name)
+            self.max_running = max(self.max_running, len(self.running))
+            time.sleep(duration)
+            self.running.remove(name)
+            if name == self.fail:
+                raise Exception(name)
+
+        def state_Root(self):
+            pass
+
+        @GraphStrategy.depends('Root')
+        def state_Flash(self):
+            self.run('Flash', 0.2)
+
+        @GraphStrategy.depends('Root')
+        def state_TFTP(self):
+            self.run('TFTP', 0.2)
+
+        @GraphStrategy.depends('Root')
+        def state_NetA(self):
+            self.run('NetA', 0.1)
+
+        @GraphStrategy.depends('NetA')
+        def state_NetB(self):
+            self.run('NetB', 0.15)
+
+        @GraphStrategy.depends('Flash', 'TFTP', 'NetB', parallel=True)
+        def state_Boot(self):
+            pass
+
+        @GraphStrategy.depends('Boot')
+        def state_Shell(self):
+            pass
+
+    return TestStrategy(target, 'strategy')
+
+
+@pytest.mark.dependency(depends=['api-works', 'test_transition'])
+def test_parallel_transition(parallel_strategy):
+    assert parallel_strategy.find_plan('Shell') == [
+        'Root', [['Flash'], ['TFTP'], ['NetA', 'NetB']], 'Boot', 'Shell'
+    ]
+
+    start = time.monotonic()
+    assert parallel_strategy.transition('Boot') == ['Root', 'Flash', 'TFTP', 'NetA', 'NetB', 'Boot']
+    assert time.monotonic() - start < 0.45
+    assert parallel_strategy.max_running == 3
+
+    duration, path = parallel_strategy.critical_path()
+    assert path == ['Root', 'NetA', 'NetB', 'Boot']
+    assert duration >= 0.25
+    report = parallel_strategy.timing_report()
+    assert "* NetB: " in report
+    assert "  Flash: " in report
+    assert "critical path: " in report
+
+    assert parallel_strategy.transition('Shell') == ['Shell']
+    assert parallel_strategy.critical_path()[1] == ['Shell']
+
+
+@pytest.mark.dependency(depends=['api-works', 'test_transition'])
+def test_parallel_transition_error(parallel_strategy):
+    parallel_strategy.fail = 'Flash'
+
+    with pytest.raises(Exception, match='Flash'):
+        parallel_strategy.transition('Boot')
+
+    # the other branches were completed
+    assert 'NetB' in parallel_strategy.timings
+    assert parallel_strategy.path == []
@@ -3,3 +3,14 @@ def import_mmio():
 
 def import_filesystem():
     from labgrid.protocol import FileSystemProtocol
+
+def test_command_protocol_run_many():
+    from labgrid.protocol import CommandProtocol
+
+    class Shell(CommandProtocol):
+        def run(self, command):
+            return ([command], [], 0)
+
+        run_check = get_status = wait_for = poll_until_success = None
+
+    assert Shell().run_many(["a", "b"]) == [(["a"], [], 0), (["b"], [], 0)]
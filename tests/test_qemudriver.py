@@ -1,6 +1,16 @@
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+
 import pytest
+from pexpect import TIMEOUT
 
-from labgrid.driver import QEMUDriver
+from labgrid.driver import QEMUDriver, ExecutionError
+from labgrid.driver.qemudriver import QEMUPool
+from labgrid.util.qmp import AsyncQMPClient, QMPError
 from labgrid import Environment
 
 @pytest.fixture
@@ -14,6 +24,7 @@ def qemu_env(tmpdir):
         images:
           kernel: "test.zImage"
           dtb: test.dtb"
+          disk: "test.qcow2"
         tools:
           qemu: "qemu-system-arm"
         paths:
@@ -90,3 +101,362 @@ def test_qemu_read_write(qemu_target, qemu_driver, qemu_mock, qemu_version_mock)
     qemu_driver.write(b'abc')
 
     qemu_target.deactivate(qemu_driver)
+
+@pytest.fixture
+def qmp_mock(mocker):
+    qmp = mocker.patch('labgrid.driver.qemudriver.QMPMonitor').return_value
+
+    def execute(command, arguments={}):
+        if command == "query-migrate":
+            return {"status": "completed"}
+        if command == "human-monitor-command":
+            return ""
+        return {}
+
+    qmp.execute.side_effect = execute
+    return qmp
+
+def test_qemu_snapshot_migration(qemu_target, qemu_driver, qemu_mock, qemu_version_mock, qmp_mock):
+    qemu_target.activate(qemu_driver)
+    qemu_driver.on()
+
+    assert not qemu_driver.has_snapshot("shell")
+    with pytest.raises(ExecutionError):
+        qemu_driver.restore_snapshot("shell")
+
+    qemu_driver.save_snapshot("shell")
+    assert qemu_driver.has_snapshot("shell")
+    commands = [c.args[0] for c in qmp_mock.execute.call_args_list]
+    assert commands[-3:] == ["migrate", "query-migrate", "cont"]
+    uri = qmp_mock.execute.call_args_list[-3].args[1]["uri"]
+    assert uri.startswith("exec:cat > ") and uri.endswith("shell.vmstate")
+
+    qmp_mock.execute.reset_mock()
+    qemu_driver.restore_snapshot("shell")
+    commands = [c.args[0] for c in qmp_mock.execute.call_args_list]
+    assert commands == ["quit", "migrate-incoming", "query-migrate", "cont"]
+    assert qmp_mock.execute.call_args_list[1].args[1]["uri"] == uri.replace("cat > ", "cat ")
+
+    qemu_target.deactivate(qemu_driver)
+
+def test_qemu_snapshot_savevm(qemu_target, qemu_mock, qemu_version_mock, qmp_mock):
+    q = QEMUDriver(
+        qemu_target,
+        "qemu",
+        qemu_bin="qemu",
+        machine='virt',
+        cpu='',
+        memory='',
+        extra_args='',
+        kernel='kernel',
+        disk='disk')
+    qemu_target.activate(q)
+    q.on()
+
+    q.save_snapshot("shell")
+    qmp_mock.execute.assert_called_with("human-monitor-command", {"command-line": "savevm shell"})
+    q.off()
+
+    qmp_mock.execute.reset_mock()
+    q.restore_snapshot("shell")
+    commands = [c.args for c in qmp_mock.execute.call_args_list]
+    assert commands == [
+        ("human-monitor-command", {"command-line": "loadvm shell"}),
+        ("cont", {}),
+    ]
+
+    qmp_mock.execute.side_effect = lambda command, arguments={}: "Error: no snapshot"
+    with pytest.raises(ExecutionError):
+        q.save_snapshot("other")
+
+    qemu_target.deactivate(q)
+
+@pytest.fixture
+def fake_qemu_env(tmpdir):
+    """Environment using a fake QEMU which takes 0.2s to start and prints
+    "booted" on its serial console after being continued. system_reset emits
+    a RESET event on the additional QMP monitor."""
+    qemu = tmpdir.join("qemu")
+    qemu.write(f"""#!{sys.executable}
+import json, socket, sys, threading, time
+args = sys.argv[1:]
+if "-version" in args:
+    print("QEMU emulator version 8.2.0")
+    sys.exit(0)
+time.sleep(0.2)
+chardevs = [
+    dict(o.split("=", 1) for o in a.split(",") if "=" in o)
+    for i, a in enumerate(args) if i and args[i - 1] == "-chardev"
+]
+console = socket.socket(socket.AF_UNIX)
+console.connect(chardevs[0]["path"])
+monitors = []
+
+def send(out, message):
+    out.write(json.dumps(message) + "\\n")
+    out.flush()
+
+def handle(out, line):
+    message = json.loads(line)
+    reply = {{"return": {{}}}}
+    if "id" in message:
+        reply["id"] = message["id"]
+    send(out, reply)
+    if message["execute"] == "cont":
+        console.sendall(b"booted")
+    elif message["execute"] == "system_reset":
+        for monitor in monitors:
+            send(monitor, {{"event": "RESET", "data": {{"guest": False}}}})
+    return message["execute"]
+
+def serve(server):
+    while True:
+        conn, _ = server.accept()
+        reader, writer = conn.makefile("r"), conn.makefile("w")
+        send(writer, {{"QMP": {{"version": {{}}}}}})
+        monitors.append(writer)
+        for line in reader:
+            handle(writer, line)
+        monitors.remove(writer)
+
+server = socket.socket(socket.AF_UNIX)
+server.bind(chardevs[1]["path"])
+server.listen(1)
+threading.Thread(target=serve, args=(server,), daemon=True).start()
+send(sys.stdout, {{"QMP": {{"version": {{}}}}}})
+for line in sys.stdin:
+    if handle(sys.stdout, line) == "quit":
+        break
+""")
+    qemu.chmod(0o755)
+    p = tmpdir.join("config.yaml")
+    p.write(
+        f"""
+        targets:
+          main:
+            role: foo
+        images:
+          kernel: "test.zImage"
+        tools:
+          qemu: "{qemu}"
+        """
+    )
+    yield Environment(str(p))
+    for pool in list(QEMUPool.pools.values()):
+        pool.close()
+
+def test_qemu_pool(fake_qemu_env):
+    target = fake_qemu_env.get_target()
+    q = QEMUDriver(
+        target,
+        "qemu",
+        qemu_bin="qemu",
+        machine='',
+        cpu='',
+        memory='',
+        extra_args='',
+        kernel='kernel',
+        pool_size=2)
+
+    durations = []
+    for _ in range(4):
+        target.activate(q)
+        # leave time to start the instances in the background
+        time.sleep(0.5)
+        start = time.monotonic()
+        q.on()
+        durations.append(time.monotonic() - start)
+        q.expect("booted", timeout=2)
+        q.off()
+        target.deactivate(q)
+
+    pool = q.pool
+    assert pool is QEMUPool.pools[pool.base_cmd]
+    assert pool.hits == 4
+    assert pool.hit_rate == 1.0
+    assert pool.saved_time > 0.6
+    assert max(durations) < 0.2
+
+    pool.close()
+    assert not QEMUPool.pools
+
+def test_qemu_pool_miss(fake_qemu_env):
+    target = fake_qemu_env.get_target()
+    q = QEMUDriver(
+        target,
+        "qemu",
+        qemu_bin="qemu",
+        machine='',
+        cpu='',
+        memory='',
+        extra_args='',
+        kernel='kernel',
+        pool_size=1)
+    target.activate(q)
+    q.on()
+    q.expect("booted", timeout=2)
+    q.cycle()
+    q.expect("booted", timeout=2)
+    target.deactivate(q)
+    assert q.pool.misses == 2
+    assert q.pool.hit_rate == 0.0
+
+def test_qemu_pool_writable_disk(fake_qemu_env):
+    target = fake_qemu_env.get_target()
+    q = QEMUDriver(
+        target,
+        "qemu",
+        qemu_bin="qemu",
+        machine='virt',
+        cpu='',
+        memory='',
+        extra_args='',
+        kernel='kernel',
+        disk='kernel',
+        pool_size=1)
+    with pytest.raises(ExecutionError, match="can't share writable drives"):
+        target.activate(q)
+    assert not QEMUPool.pools
+
+    q.disk_opts = "snapshot=on"
+    target.activate(q)
+    q.on()
+    q.expect("booted", timeout=2)
+    target.deactivate(q)
+
+def test_qemu_pool_writable_drives():
+    assert QEMUPool.writable_drives(["qemu", "-drive", "file=a", "-drive", "file=b,readonly=on"]) == ["file=a"]
+    assert QEMUPool.writable_drives(["qemu", "-drive", "if=pflash,file=a,snapshot=on"]) == []
+    assert QEMUPool.writable_drives(["qemu", "-snapshot", "-drive", "file=a"]) == []
+
+def test_qemu_qmp_events(fake_qemu_env):
+    target = fake_qemu_env.get_target()
+    q = QEMUDriver(
+        target,
+        "qemu",
+        qemu_bin="qemu",
+        machine='',
+        cpu='',
+        memory='',
+        extra_args='',
+        kernel='kernel')
+    target.activate(q)
+    q.on()
+    client = q.qmp_client
+    assert q.qmp_client is client
+    events = []
+    client.add_event_callback(events.append)
+
+    q.monitor_command("system_reset")
+    assert q.wait_for_event("RESET", timeout=2) == {"event": "RESET", "data": {"guest": False}}
+    assert client.execute("system_reset", timeout=2) == {}
+    assert q.wait_for_event("RESET", timeout=2)
+    assert len(events) == 2
+    with pytest.raises(TimeoutError):
+        q.wait_for_event("RESET", timeout=0.1)
+
+    q.off()
+    assert client.loop.is_closed()
+    with pytest.raises(ExecutionError):
+        q.qmp_client
+    target.deactivate(q)
+
+def test_async_qmp_client(tmpdir):
+    path = str(tmpdir.join("qmp"))
+
+    async def handle(reader, writer):
+        writer.write(b'{"QMP": {"version": {}}}\n')
+        commands = []
+        while line := await reader.readline():
+            command = json.loads(line)
+            commands.append(command)
+            if command["execute"] == "qmp_capabilities":
+                writer.write(json.dumps({"return": {}, "id": command["id"]}).encode() + b"\n")
+            elif len(commands) == 3:
+                # reply out of order, with an event in between
+                for command in reversed(commands[1:]):
+                    writer.write(json.dumps({"event": "STOP"}).encode() + b"\n")
+                    if command["execute"] == "fail":
+                        reply = {"error": {"class": "GenericError", "desc": "failed"}}
+                    else:
+                        reply = {"return": command["execute"]}
+                    reply["id"] = command["id"]
+                    writer.write(json.dumps(reply).encode() + b"\n")
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_unix_server(handle, path)
+        client = AsyncQMPClient()
+        await client.connect(path)
+        stop, fail = await asyncio.gather(
+            client.execute("stop"), client.execute("fail"), return_exceptions=True
+        )
+        assert stop == "stop"
+        assert isinstance(fail, QMPError)
+        assert fail.msg == "fail failed: failed"
+        assert len(client.events) == 2
+        assert await client.wait_event("STOP", timeout=1) == {"event": "STOP"}
+        assert len(client.events) == 1
+        client.clear_events()
+        with pytest.raises(TimeoutError):
+            await client.wait_event(timeout=0.1)
+        with pytest.raises(TimeoutError):
+            await client.execute("hang", timeout=0.1)
+        await client.close()
+        server.close()
+
+    asyncio.run(run())
+
+@pytest.fixture
+def qemu_socketpair(qemu_target, qemu_driver, qemu_version_mock):
+    # stand-in for the QEMU serial console socket, echoing everything back
+    console, peer = socket.socketpair()
+    console.setblocking(0)
+
+    def echo():
+        while data := peer.recv(4096):
+            peer.sendall(data)
+
+    thread = threading.Thread(target=echo, daemon=True)
+    thread.start()
+    qemu_target.activate(qemu_driver)
+    qemu_driver._clientsocket = console
+    yield qemu_driver
+    qemu_driver._clientsocket = None
+    qemu_target.deactivate(qemu_driver)
+    console.close()
+    thread.join()
+    peer.close()
+
+def test_qemu_read_socketpair(qemu_socketpair):
+    q = qemu_socketpair
+    q.write(b"hello")
+    data = b""
+    while len(data) < 5:
+        data += q.read(timeout=1)
+    assert data == b"hello"
+    q.write(b"abc")
+    assert q.read(max_size=2, timeout=1) == b"ab"
+    assert q.read(timeout=1) == b"c"
+    with pytest.raises(TIMEOUT):
+        q.read(timeout=0.01)
+
+def test_qemu_read_latency(qemu_socketpair):
+    q = qemu_socketpair
+    start = time.monotonic()
+    for i in range(50):
+        q.write(f"echo {i}\n".encode())
+        q.expect(f"echo {i}\n", timeout=1)
+    # reading used to wait 10ms for more data after each select()
+    assert time.monotonic() - start < 50 * 0.01
+
+@pytest.mark.benchmark
+def test_benchmark_read_latency(qemu_socketpair):
+    q = qemu_socketpair
+    count = 1000
+    start = time.monotonic()
+    for i in range(count):
+        q.write(f"echo {i}\n".encode())
+        q.expect(f"echo {i}\n", timeout=1)
+    elapsed = time.monotonic() - start
+    print(f"console round trip: {elapsed / count * 1000:.3f} ms")
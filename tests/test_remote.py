@@ -1,3 +1,8 @@
+import os
+import subprocess
+import sys
+import time
+
 import pytest
 import pexpect
 
@@ -11,6 +16,43 @@ def test_client_help():
         assert spawn.exitstatus == 0
         assert spawn.signalstatus is None
 
+def get_imported_modules(*args, env=None):
+    """Run python with -X importtime and return a dict of module -> cumulative import time in µs"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules[name.strip()] = int(cumulative)
+    assert 'labgrid.remote' in modules, result.stderr
+    return modules
+
+def get_unexpected_modules(modules):
+    """drivers, resources and strategies must only be imported when needed"""
+    return {
+        name for name in modules
+        if name.startswith(('labgrid.driver.', 'labgrid.resource.', 'labgrid.strategy.'))
+        and name != 'labgrid.driver.exception'
+    }
+
+def test_client_help_imports():
+    modules = get_imported_modules('-m', 'labgrid.remote.client', '--help')
+    unexpected = get_unexpected_modules(modules)
+    assert not unexpected, f"unexpected modules imported: {sorted(unexpected)}"
+
+def test_client_complete_imports():
+    # shell completion runs 'labgrid-client complete' on every tab press, the
+    # imports happen before connecting, so no coordinator is needed
+    env = os.environ.copy()
+    env['LG_CROSSBAR'] = 'ws://127.0.0.1:1/ws'
+    modules = get_imported_modules('-m', 'labgrid.remote.client', 'complete', 'places', env=env)
+    unexpected = get_unexpected_modules(modules)
+    assert not unexpected, f"unexpected modules imported: {sorted(unexpected)}"
+
 def test_exporter_help():
     with pexpect.spawn('python -m labgrid.remote.exporter --help') as spawn:
         spawn.expect('usage')
@@ -18,3 +60,160 @@ def test_exporter_help():
         spawn.close()
         assert spawn.exitstatus == 0
         assert spawn.signalstatus is None
+
+def test_remoteplacemanager_poll_changed(target):
+    import asyncio
+    from types import SimpleNamespace
+    from labgrid.factory import target_factory
+    from labgrid.remote.common import ResourceEntry
+    from labgrid.resource.remote import RemotePlaceManager
+
+    manager = RemotePlaceManager()
+    manager.loop = asyncio.new_event_loop()
+    manager.session = SimpleNamespace(messages_received=0, events_running=0)
+    manager.poll_delay = 0
+    entry = ResourceEntry({
+        'cls': 'NetworkSerialPort',
+        'params': {'host': 'exporter', 'port': 1234},
+        'avail': True,
+    })
+    resource = target_factory.make_resource(target, entry.cls, 'serial', entry.args)
+    resource._remote_entry = entry
+    resource._remote_version = None
+    manager.unmanaged_resources.append(resource)
+
+    # a second consumer of the same entry
+    other = target_factory.make_resource(target, entry.cls, 'other', entry.args)
+    other._remote_entry = entry
+    other._remote_version = None
+    manager.unmanaged_resources.append(other)
+
+    manager.poll()
+    assert resource._remote_version == entry.version
+    assert resource.avail
+
+    # unchanged entries are skipped
+    resource.port = 4321
+    manager.poll()
+    assert resource.port == 4321
+
+    entry.update({
+        'cls': 'NetworkSerialPort',
+        'params': {'host': 'exporter', 'port': 5678},
+    })
+    manager.poll()
+    assert resource.port == 5678
+    assert not resource.avail
+
+    # the update is not lost for the other consumer of the entry
+    assert other.port == 5678
+
+    manager.loop.close()
+
+
+def test_remoteplacemanager_drain():
+    import asyncio
+    from types import SimpleNamespace
+    from labgrid.resource.remote import RemotePlaceManager
+
+    manager = RemotePlaceManager()
+    manager.loop = asyncio.new_event_loop()
+    manager.session = session = SimpleNamespace(messages_received=0, events_running=0)
+    done = []
+
+    async def handler(depth):
+        # simulates an event handler waiting for further work
+        session.events_running += 1
+        for _ in range(depth):
+            await asyncio.sleep(0)
+        session.events_running -= 1
+        done.append(depth)
+
+    def receive(depth):
+        # simulates the transport receiving a message, which starts a handler
+        session.messages_received += 1
+        manager.loop.create_task(handler(depth))
+        if depth:
+            manager.loop.call_soon(receive, depth - 1)
+
+    manager.loop.call_soon(receive, 10)
+    manager.loop.run_until_complete(manager._drain())
+    assert sorted(done) == list(range(11))
+
+    # returns immediately when nothing is pending
+    start = time.monotonic()
+    manager.loop.run_until_complete(manager._drain())
+    assert time.monotonic() - start < manager.DRAIN_TIMEOUT
+
+    manager.loop.close()
+
+
+@pytest.fixture
+def single_place_session():
+    import asyncio
+
+    places = {
+        "test": {
+            "aliases": ["foo"], "comment": "", "tags": {}, "acquired": None,
+            "acquired_resources": [], "allowed": [], "reservation": "tok",
+            "matches": [{"exporter": "*", "group": "Testport", "cls": "*", "name": None}],
+        },
+        "other": {
+            "aliases": [], "comment": "", "tags": {}, "acquired": None,
+            "acquired_resources": [], "allowed": [], "reservation": None,
+            "matches": [],
+        },
+    }
+    resources = {
+        "testhost": {
+            "Testport": {"NetworkSerialPort": {"cls": "NetworkSerialPort", "params": {"host": "testhost"}}},
+        },
+    }
+
+    async def call(procedure, *args):
+        # simulates the coordinator
+        if procedure == "org.labgrid.coordinator.get_place":
+            return places.get(args[0])
+        if procedure == "org.labgrid.coordinator.get_places":
+            return places
+        if procedure == "org.labgrid.coordinator.get_place_resources":
+            return resources if args[0] == "test" else {}
+        raise ValueError(procedure)
+
+    def make_session():
+        from autobahn.wamp.types import ComponentConfig
+        from labgrid.remote.client import ClientSession
+
+        session = ClientSession(ComponentConfig(realm="realm1", extra={}))
+        session.call = call
+        session.resources = {}
+        session.places = {}
+        session.loaded_places = set()
+        session.monitor = False
+        return session
+
+    async def load(pattern):
+        # labgrid.remote.client and autobahn use the current event loop
+        session = make_session()
+        assert await session.load_place(pattern)
+        return session
+
+    return lambda pattern: asyncio.run(load(pattern))
+
+
+@pytest.mark.parametrize("pattern", ["test", "foo", "es", "+tok"])
+def test_client_load_single_place(single_place_session, pattern):
+    session = single_place_session(pattern)
+    place = session.get_place(pattern)
+    assert place.name == "test"
+    assert session.loaded_places == {"test"}
+    assert "NetworkSerialPort" in session.resources["testhost"]["Testport"]
+
+
+def test_client_load_single_place_ambiguous(single_place_session):
+    from labgrid.remote.client import UserError
+
+    session = single_place_session("t")
+    assert session.loaded_places == set()
+    with pytest.raises(UserError, match="matches multiple places"):
+        session.get_place("t")
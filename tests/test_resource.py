@@ -1,4 +1,31 @@
-from labgrid.resource import ManagedResource, Resource
+import threading
+import time
+
+import attr
+
+from labgrid.resource import ManagedResource, Resource, ResourceManager
+
+
+@attr.s(eq=False)
+class NotifyingManager(ResourceManager):
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self.available = set()
+        self.polls = 0
+
+    def set_avail(self, resource):
+        self.available.add(resource)
+        self.notify_change()
+
+    def poll(self):
+        self.polls += 1
+        for resource in self.resources:
+            resource.avail = resource in self.available
+
+
+@attr.s(eq=False)
+class NotifyingResource(ManagedResource):
+    manager_cls = NotifyingManager
 
 
 def test_create_resource(target):
@@ -19,3 +46,28 @@ def test_hash_set(target):
     k = set()
     k.add(resource1)
     assert resource1 in k
+
+def test_wait_for_change():
+    count = ResourceManager.get_change_count()
+    assert not ResourceManager.wait_for_change(count, 0.01)
+
+    ResourceManager.get().notify_change()
+    assert ResourceManager.wait_for_change(count, 0.0)
+    assert ResourceManager.get_change_count() == count + 1
+
+def test_await_resources_notified(target):
+    resource = NotifyingResource(target, "notifying")
+    manager = resource.manager
+    manager.polls = 0
+
+    timer = threading.Timer(0.1, manager.set_avail, args=(resource,))
+    start = time.monotonic()
+    timer.start()
+    target.await_resources([resource], timeout=5.0)
+    elapsed = time.monotonic() - start
+    timer.join()
+
+    assert resource.avail
+    # woken up by the notification instead of the periodic poll
+    assert elapsed < target.AWAIT_POLL_INTERVAL
+    assert manager.polls <= 4
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from labgrid.driver import SerialDriver
+from labgrid.remote.exporter import BuiltinRawSerialPortExport
+from labgrid.remote.serialserver import RingBuffer, SerialServer
+from labgrid.resource import NetworkSerialPort
+
+
+@pytest.fixture
+def pty():
+    main, sub = os.openpty()
+    yield main, os.ttyname(sub)
+    os.close(main)
+    os.close(sub)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def read_exactly(fd, size, timeout=2.0):
+    data = b""
+    end = time.monotonic() + timeout
+    while len(data) < size and time.monotonic() < end:
+        data += os.read(fd, size - len(data))
+    return data
+
+
+def test_ringbuffer():
+    buf = RingBuffer(8)
+    assert buf.read() == b""
+    buf.write(b"0123")
+    assert buf.read() == b"0123"
+    buf.write(b"456789")
+    assert buf.read() == b"23456789"
+    assert buf.read(3) == b"789"
+    assert buf.read(100) == b"23456789"
+    assert buf.total == 10
+
+
+def test_serialserver_raw(pty):
+    main, path = pty
+
+    async def run():
+        server = SerialServer(path, protocol="raw", host="127.0.0.1", history_size=16)
+        server.start()
+        assert server.port != 0
+
+        r1, w1 = await asyncio.open_connection("127.0.0.1", server.port)
+        r2, w2 = await asyncio.open_connection("127.0.0.1", server.port)
+        while len(server.clients) < 2:
+            await asyncio.sleep(0.01)
+
+        os.write(main, b"Hello World!\xff\n")
+        assert await r1.readexactly(14) == b"Hello World!\xff\n"
+        assert await r2.readexactly(14) == b"Hello World!\xff\n"
+
+        w1.write(b"foo")
+        w2.write(b"bar")
+        await asyncio.gather(w1.drain(), w2.drain())
+        data = b""
+        while len(data) < 6:
+            await asyncio.sleep(0.01)
+            data += os.read(main, 6)
+        assert sorted([data[:3], data[3:]]) == [b"bar", b"foo"]
+
+        assert server.rx_bytes == 14
+        assert server.tx_bytes == 6
+        assert server.history.read() == b"Hello World!\xff\n"
+
+        server.stop()
+        assert await r1.read() == b""
+        assert await r2.read() == b""
+
+    asyncio.run(run())
+
+
+def test_serialserver_write_stalled(pty):
+    main, path = pty
+    payload = bytes(range(256)) * 1024
+
+    async def run():
+        server = SerialServer(path, protocol="raw", host="127.0.0.1", history_size=0)
+        server.start()
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(payload)
+        # nothing reads from the pty yet, so the serial port stalls
+        end = time.monotonic() + 2.0
+        while not server.tx_waiting and time.monotonic() < end:
+            await asyncio.sleep(0.01)
+        assert server.tx_waiting
+        assert len(server.tx_buffer) <= server.MAX_SERIAL_BUFFER + 4096
+
+        # the event loop still forwards data from the serial port
+        os.write(main, b"ping")
+        assert await asyncio.wait_for(reader.readexactly(4), 2.0) == b"ping"
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, read_exactly, main, len(payload), 10.0)
+        assert data == payload
+        assert server.tx_bytes == len(payload)
+        assert not server.tx_buffer
+
+        server.stop()
+        writer.close()
+
+    asyncio.run(run())
+
+
+def test_serialserver_rfc2217(target, pty, loop):
+    main, path = pty
+    server = SerialServer(path)
+
+    async def start():
+        server.start()
+
+    asyncio.run_coroutine_threadsafe(start(), loop).result()
+
+    NetworkSerialPort(target, None, host="127.0.0.1", port=server.port)
+    driver = SerialDriver(target, None)
+    target.activate(driver)
+
+    # 0xff is the telnet IAC and must be escaped
+    os.write(main, b"login: \xff\n")
+    assert driver.read(9, timeout=2.0) == b"login: \xff\n"
+
+    driver.write(b"root\xff\n")
+    assert read_exactly(main, 6) == b"root\xff\n"
+
+    target.deactivate(driver)
+
+    async def stop():
+        server.stop()
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    assert server.rx_bytes == 9
+    assert server.tx_bytes == 6
+
+
+def test_serial_export_builtin(pty):
+    main, path = pty
+
+    async def run():
+        export = BuiltinRawSerialPortExport({
+            "cls": "RawSerialPort",
+            "params": {"port": path, "speed": 115200},
+        }, host="testhost")
+        assert export.ser2net_bin is None
+
+        export.acquire("place")
+        params = export.params
+        assert params["protocol"] == "raw"
+        assert params["port"] == export.server.port
+        assert params["extra"]["history_port"] == export.server.history_port
+
+        reader, _ = await asyncio.open_connection("127.0.0.1", params["port"])
+        while not export.server.clients:
+            await asyncio.sleep(0.01)
+        os.write(main, b"console\n")
+        assert await reader.readexactly(8) == b"console\n"
+
+        export.release()
+        assert export.server is None
+        assert export.params["port"] is None
+        assert export.params["extra"]["history_port"] is None
+        assert await reader.read() == b""
+
+    asyncio.run(run())
+
+
+def test_serialserver_history(target, pty, loop):
+    main, path = pty
+    server = SerialServer(path, history_size=16)
+
+    async def start():
+        server.start()
+
+    asyncio.run_coroutine_threadsafe(start(), loop).result()
+
+    os.write(main, b"U-Boot 2024.01\nboot log\nlogin: ")
+    while server.rx_bytes < 31:
+        time.sleep(0.01)
+
+    with socket.create_connection(("127.0.0.1", server.history_port)) as sock:
+        history = b""
+        while True:
+            data = sock.recv(1024)
+            if not data:
+                break
+            history += data
+    assert history == b"boot log\nlogin: "
+
+    port = NetworkSerialPort(target, None, host="127.0.0.1", port=server.port)
+    port.extra = {"history_port": server.history_port}
+    driver = SerialDriver(target, None, history=True)
+    target.activate(driver)
+    driver.expect("login: ", timeout=0.1)
+
+    target.deactivate(driver)
+
+    async def stop():
+        server.stop()
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
@@ -1,11 +1,34 @@
+import os
+import shutil
+import sys
+import time
+
 import pytest
+from pexpect import TIMEOUT
 
-from labgrid.driver import ShellDriver, ExecutionError
+from labgrid.driver import ExternalConsoleDriver, ShellDriver, ExecutionError
 from labgrid.exceptions import NoDriverFoundError
 
 from ipaddress import IPv4Interface
 
 
+@pytest.fixture
+def local_shell(target, monkeypatch):
+    """ShellDriver connected to a local interactive sh running on a pty"""
+    monkeypatch.setenv("PS1", "lg-test$ ")
+    console = ExternalConsoleDriver(
+        target, "console",
+        cmd=f"{sys.executable} -c 'import pty; pty.spawn([\"sh\", \"-i\"])'",
+    )
+    shell = ShellDriver(
+        target, "shell", prompt=r"lg-test\$ ", login_prompt="login: ", username="root",
+        await_login_timeout=1, login_timeout=10,
+    )
+    target.activate(shell)
+    yield shell
+    target.deactivate(console)
+
+
 class TestShellDriver:
     def test_instance(self, target, serial_driver):
         s = ShellDriver(target, "shell", "", "", "")
@@ -62,3 +85,115 @@ class TestShellDriver:
 
         res = d.get_ip_addresses("br-lan.42")
         assert res[0] == IPv4Interface("192.168.42.1/24")
+
+    def test_run_many(self, local_shell):
+        cmds = [f"echo out{i}; exit {i % 3}" for i in range(5)]
+        assert local_shell.run_many(cmds) == [([f"out{i}"], [], i % 3) for i in range(5)]
+        assert local_shell.run_many([]) == []
+        assert local_shell.run("echo 'still working'") == (["still working"], [], 0)
+
+    def test_run_many_batches(self, local_shell, mocker):
+        cmds = [f"echo {i:04d}{'x' * 200}" for i in range(20)]
+        sendline = mocker.spy(local_shell.console, "sendline")
+        results = local_shell.run_many(cmds)
+        assert results == [([f"{i:04d}{'x' * 200}"], [], 0) for i in range(20)]
+        assert 1 < sendline.call_count < 20
+        for call in sendline.call_args_list:
+            assert len(call.args[0]) <= ShellDriver.MAX_BATCH_LENGTH
+
+    def test_prompt_tracking(self, local_shell, mocker):
+        check_prompt = mocker.spy(local_shell, "_check_prompt")
+        local_shell.run_check("true")
+        check_prompt.reset_mock()
+
+        # the prompt matched after the previous command is trusted
+        assert local_shell.run("echo 1") == (["1"], [], 0)
+        assert local_shell.run_many(["echo 2", "echo 3"]) == [(["2"], [], 0), (["3"], [], 0)]
+        assert check_prompt.call_count == 0
+
+        # writes by someone else
+        local_shell.console.sendline("echo external")
+        assert local_shell.run("echo 4") == (["4"], [], 0)
+        assert check_prompt.call_count == 1
+
+        # output received after the prompt
+        local_shell.run("(sleep 0.2; echo async) &")
+        check_prompt.reset_mock()
+        time.sleep(0.5)
+        assert local_shell.run("echo 5") == (["5"], [], 0)
+        assert check_prompt.call_count == 1
+
+        # timeouts
+        with pytest.raises(TIMEOUT):
+            local_shell.run("sleep 0.5", timeout=0.1)
+        check_prompt.reset_mock()
+        assert local_shell.run("echo 6") == (["6"], [], 0)
+        assert check_prompt.call_count == 1
+
+    def test_prompt_check_interval(self, local_shell, mocker):
+        local_shell.prompt_check_interval = 0
+        check_prompt = mocker.spy(local_shell, "_check_prompt")
+        for _ in range(3):
+            local_shell.run_check("true")
+        assert check_prompt.call_count == 3
+
+    def test_transfer_base64(self, local_shell, tmpdir):
+        remotefile = str(tmpdir.join("remote file"))
+        for data in [os.urandom(100000), bytes(range(256)) * 4, b""]:
+            local_shell.put_bytes(data, remotefile)
+            with open(remotefile, "rb") as fh:
+                assert fh.read() == data
+            assert local_shell.get_bytes(remotefile) == data
+        assert local_shell._cached_transfer_mode == "base64"
+        assert local_shell.run("echo 'still working'") == (["still working"], [], 0)
+
+    def test_transfer_base64_errors(self, local_shell, tmpdir):
+        with pytest.raises(ExecutionError):
+            local_shell.get_bytes(str(tmpdir.join("missing")))
+        with pytest.raises(ExecutionError):
+            local_shell.put_bytes(b"data", str(tmpdir.join("missing", "file")))
+        assert local_shell.run("echo 'still working'") == (["still working"], [], 0)
+
+    @pytest.mark.skipif(not shutil.which("lrz") or not shutil.which("lsz"), reason="lrzsz not installed")
+    def test_transfer_xmodem(self, local_shell, tmpdir):
+        local_shell.transfer_mode = "xmodem"
+        remotefile = str(tmpdir.join("remote"))
+        data = os.urandom(5000)
+        local_shell.put_bytes(data, remotefile)
+        with open(remotefile, "rb") as fh:
+            assert fh.read() == data
+        assert local_shell.get_bytes(remotefile) == data
+
+    @pytest.mark.benchmark
+    def test_benchmark_transfer(self, local_shell, tmpdir):
+        remotefile = str(tmpdir.join("remote"))
+        data = os.urandom(1024 * 1024)
+        modes = ["base64"]
+        if shutil.which("lrz") and shutil.which("lsz"):
+            modes.append("xmodem")
+
+        for mode in modes:
+            local_shell.transfer_mode = mode
+            start = time.monotonic()
+            local_shell.put_bytes(data, remotefile)
+            put_rate = len(data) / (time.monotonic() - start) / 1024
+            start = time.monotonic()
+            assert local_shell.get_bytes(remotefile) == data
+            get_rate = len(data) / (time.monotonic() - start) / 1024
+            print(f"{mode}: put {put_rate:.0f} KiB/s, get {get_rate:.0f} KiB/s")
+
+    @pytest.mark.benchmark
+    def test_benchmark_run_many(self, local_shell):
+        cmds = ["true"] * 100
+
+        start = time.monotonic()
+        for cmd in cmds:
+            local_shell.run(cmd)
+        run_rate = len(cmds) / (time.monotonic() - start)
+
+        start = time.monotonic()
+        local_shell.run_many(cmds)
+        run_many_rate = len(cmds) / (time.monotonic() - start)
+
+        print(f"run: {run_rate:.0f} commands/s, run_many: {run_many_rate:.0f} commands/s")
+        assert run_many_rate > run_rate
@@ -1,7 +1,12 @@
+import logging
+import os
 import pytest
 import socket
+import subprocess
+import time
 
 from labgrid.driver import SSHDriver, ExecutionError
+from labgrid.driver.sshdriver import _PersistentShell
 from labgrid.exceptions import NoResourceFoundError
 from labgrid.resource import NetworkService
 from labgrid.util.helper import get_free_port
@@ -58,6 +63,97 @@ def test_run_check_raise(target, ssh_driver_mocked_and_activated, mocker):
     assert res == (['error'], [], 1)
     target.deactivate(s)
 
+def test_run_persistent_shell(target, ssh_driver_mocked_and_activated, mocker):
+    s = ssh_driver_mocked_and_activated
+    s.persistent_shell = True
+    s._check_keepalive = mocker.MagicMock(return_value=True)
+    shell = mocker.patch('labgrid.driver.sshdriver._PersistentShell', autospec=True)
+    shell.return_value.alive.return_value = True
+    shell.return_value.run_many.return_value = [(b"success\n", b"", 0)]
+    assert s.run("test") == (['success'], [], 0)
+    assert s.run("test") == (['success'], [], 0)
+    assert shell.call_count == 1
+    assert shell.call_args.args[0][-1] == "exec sh"
+    shell.return_value.run_many.assert_called_with(["test"], stderr_merge=False, timeout=None)
+
+    shell.return_value.run_many.return_value = [(b"a\n", b"", 0), (b"", b"b\n", 1)]
+    assert s.run_many(["a", "b"]) == [(['a'], [], 0), ([], ['b'], 1)]
+    shell.return_value.run_many.assert_called_with(["a", "b"], stderr_merge=False, timeout=30.0)
+
+    shell.return_value.run_many.side_effect = subprocess.TimeoutExpired("test", 1.0)
+    with pytest.raises(subprocess.TimeoutExpired):
+        s.run("test", timeout=1.0)
+    shell.return_value.close.assert_called_once()
+    assert s._shell is None
+    target.deactivate(s)
+
+def test_run_many_shared_timeout(target, ssh_driver_mocked_and_activated, mocker):
+    s = ssh_driver_mocked_and_activated
+    s._check_keepalive = mocker.MagicMock(return_value=True)
+    timeouts = []
+
+    def run(cmd, codec, decodeerrors, timeout):
+        timeouts.append(timeout)
+        time.sleep(0.1)
+        return ([cmd], [], 0)
+
+    s._run = run
+    cmds = [str(i) for i in range(16)]
+    assert s.run_many(cmds, timeout=5.0) == [([cmd], [], 0) for cmd in cmds]
+    assert len(timeouts) == 16
+    assert max(timeouts) <= 5.0
+    # the commands waiting for a free session only get the remaining time
+    assert min(timeouts) <= 4.9
+    target.deactivate(s)
+
+def test_persistent_shell():
+    shell = _PersistentShell(["sh"], logging.getLogger())
+    try:
+        assert shell.run("echo Hello; echo World >&2; exit 3") == (b"Hello\n", b"World\n", 3)
+        assert shell.run("printf 'no newline'") == (b"no newline", b"", 0)
+        assert shell.run("echo out; echo err >&2", stderr_merge=True) == (b"out\nerr\n", None, 0)
+        # commands run in a subshell and don't read from the shell's stdin
+        assert shell.run("cd /; X=1; cat") == (b"", b"", 0)
+        assert shell.run("pwd; echo \"$X\"") == (f"{os.getcwd()}\n\n".encode(), b"", 0)
+        stdout, stderr, returncode = shell.run("echo 'unbalanced")
+        assert stdout == b""
+        assert stderr
+        assert returncode != 0
+        assert shell.run("echo still alive") == (b"still alive\n", b"", 0)
+        with pytest.raises(subprocess.TimeoutExpired):
+            shell.run("sleep 5", timeout=0.1)
+    finally:
+        shell.close()
+
+def test_persistent_shell_run_many():
+    shell = _PersistentShell(["sh"], logging.getLogger())
+    try:
+        cmds = [f"echo {i}; echo err{i} >&2; exit {i % 3}" for i in range(40)]
+        results = shell.run_many(cmds)
+        assert results == [(f"{i}\n".encode(), f"err{i}\n".encode(), i % 3) for i in range(40)]
+        assert shell.run("echo done") == (b"done\n", b"", 0)
+    finally:
+        shell.close()
+
+@pytest.mark.benchmark
+def test_benchmark_persistent_shell():
+    count = 500
+
+    start = time.monotonic()
+    for _ in range(count):
+        subprocess.run(["sh", "-c", "true"], stdin=subprocess.DEVNULL, capture_output=True)
+    process_rate = count / (time.monotonic() - start)
+
+    shell = _PersistentShell(["sh"], logging.getLogger())
+    start = time.monotonic()
+    for _ in range(count):
+        shell.run("true")
+    shell_rate = count / (time.monotonic() - start)
+    shell.close()
+
+    print(f"new process: {process_rate:.0f} commands/s, persistent shell: {shell_rate:.0f} commands/s")
+    assert shell_rate > process_rate
+
 @pytest.fixture(scope='function')
 def ssh_localhost(target, pytestconfig):
     name = pytestconfig.getoption("--ssh-username")
@@ -196,3 +292,33 @@ def test_unix_socket_forward(ssh_localhost, tmpdir):
                 send_socket.send(test_string.encode("utf-8"))
 
                 assert client_socket.recv(16).decode("utf-8") == test_string
+
+
+@pytest.mark.sshusername
+def test_local_run_many(ssh_localhost):
+    cmds = [f"echo {i}; exit {i % 2}" for i in range(12)]
+    assert ssh_localhost.run_many(cmds) == [([str(i)], [], i % 2) for i in range(12)]
+
+    ssh_localhost.persistent_shell = True
+    assert ssh_localhost.run_many(cmds) == [([str(i)], [], i % 2) for i in range(12)]
+
+@pytest.mark.sshusername
+def test_local_run_persistent_shell(ssh_localhost):
+    ssh_localhost.persistent_shell = True
+    assert ssh_localhost.run("echo Hello") == (["Hello"], [], 0)
+    assert ssh_localhost.run("echo Error >&2; false") == ([], ["Error"], 1)
+
+@pytest.mark.sshusername
+@pytest.mark.benchmark
+def test_benchmark_local_run_persistent_shell(ssh_localhost):
+    count = 100
+    rates = {}
+    for persistent_shell in [False, True]:
+        ssh_localhost.persistent_shell = persistent_shell
+        start = time.monotonic()
+        for _ in range(count):
+            ssh_localhost.run("true")
+        rates[persistent_shell] = count / (time.monotonic() - start)
+
+    print(f"ssh per command: {rates[False]:.0f} commands/s, persistent shell: {rates[True]:.0f} commands/s")
+    assert rates[True] > rates[False]
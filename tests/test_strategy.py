@@ -1,7 +1,10 @@
+import pytest
+
+from labgrid import Target
 from labgrid.binding import BindingState
 from labgrid.driver import BareboxDriver, UBootDriver, ShellDriver
 from labgrid.driver.fake import FakeConsoleDriver, FakePowerDriver
-from labgrid.strategy import Strategy, BareboxStrategy, UBootStrategy
+from labgrid.strategy import Strategy, BareboxStrategy, ShellStrategy, StrategyError, UBootStrategy
 
 
 def test_create_barebox(target):
@@ -29,3 +32,98 @@ def test_create_uboot(target):
     assert target.get_driver(Strategy) is s
 
     assert s.state is BindingState.bound
+
+def test_shell_snapshot(target, mocker):
+    console = FakeConsoleDriver(target, "console")
+    power = FakePowerDriver(target, "power")
+    shell = ShellDriver(target, "shell", prompt='root@dummy', login_prompt='login:', username='root')
+    shell.on_activate = mocker.MagicMock()
+    shell.run = mocker.MagicMock()
+    cycle = mocker.spy(power, "cycle")
+    power.has_snapshot = mocker.MagicMock(return_value=False)
+    power.save_snapshot = mocker.MagicMock()
+    power.restore_snapshot = mocker.MagicMock()
+    s = ShellStrategy(target, "strategy", snapshot="booted")
+
+    s.transition("shell")
+    cycle.assert_called_once()
+    shell.run.assert_called_once()
+    power.save_snapshot.assert_called_once_with("booted")
+
+    s.transition("off")
+    power.has_snapshot.return_value = True
+    s.transition("shell")
+    cycle.assert_called_once()
+    shell.run.assert_called_once()
+    power.restore_snapshot.assert_called_once_with("booted")
+    assert shell.state is BindingState.active
+
+def test_shell_snapshot_unsupported():
+    target = Target("snapshot")
+    FakeConsoleDriver(target, "console")
+    FakePowerDriver(target, "power")
+    ShellDriver(target, "shell", prompt='root@dummy', login_prompt='login:', username='root')
+    with pytest.raises(StrategyError):
+        ShellStrategy(target, "strategy", snapshot="booted")
+
+def make_cached_shell_strategy(mocker, check_prompt_error=None, inject_run_error=None):
+    target = Target("cached")
+    FakeConsoleDriver(target, "console")
+    power = FakePowerDriver(target, "power")
+    shell = ShellDriver(target, "shell", prompt='root@dummy', login_prompt='login:', username='root')
+    shell.on_activate = mocker.MagicMock()
+    shell.run = mocker.MagicMock()
+    shell._check_prompt = mocker.MagicMock(side_effect=check_prompt_error)
+    shell._inject_run = mocker.MagicMock(side_effect=inject_run_error)
+    mocker.spy(power, "cycle")
+    return ShellStrategy(target, "strategy", cache_status=True)
+
+def test_shell_status_cache(mocker, tmpdir, monkeypatch):
+    from pexpect import TIMEOUT
+
+    monkeypatch.setenv("LG_STATE_CACHE_DIR", str(tmpdir))
+
+    s = make_cached_shell_strategy(mocker)
+    s.transition("shell")
+    s.power.cycle.assert_called_once()
+    s.shell._check_prompt.assert_not_called()
+    assert s._status_cache.load() == "shell"
+
+    # the next session only checks the prompt
+    s = make_cached_shell_strategy(mocker)
+    s.transition("shell")
+    s.power.cycle.assert_not_called()
+    s.shell._check_prompt.assert_called_once_with(timeout=ShellStrategy.CACHE_CHECK_TIMEOUT)
+    s.shell._inject_run.assert_called_once()
+    assert s.shell.state is BindingState.active
+    assert s.status.name == "shell"
+
+    # the run() helper can't be injected
+    s = make_cached_shell_strategy(mocker, inject_run_error=TIMEOUT("no prompt"))
+    s.transition("shell")
+    s.power.cycle.assert_called_once()
+    assert s._status_cache.load() == "shell"
+
+    # the board is no longer at a shell prompt
+    s = make_cached_shell_strategy(mocker, check_prompt_error=TIMEOUT("no prompt"))
+    s.transition("shell")
+    s.power.cycle.assert_called_once()
+    assert s._status_cache.load() == "shell"
+
+    s.transition("off")
+    assert s._status_cache.load() == "off"
+    s = make_cached_shell_strategy(mocker)
+    s.transition("shell")
+    s.shell._check_prompt.assert_not_called()
+    s.power.cycle.assert_called_once()
+
+def test_shell_status_cache_disabled(target, mocker, tmpdir, monkeypatch):
+    monkeypatch.setenv("LG_STATE_CACHE_DIR", str(tmpdir))
+    FakeConsoleDriver(target, "console")
+    FakePowerDriver(target, "power")
+    shell = ShellDriver(target, "shell", prompt='root@dummy', login_prompt='login:', username='root')
+    shell.on_activate = mocker.MagicMock()
+    shell.run = mocker.MagicMock()
+    s = ShellStrategy(target, "strategy")
+    s.transition("shell")
+    assert not tmpdir.listdir()
@@ -1,11 +1,13 @@
 import abc
 import re
+import threading
+import time
 
 import attr
 import pytest
 
 from labgrid import Target, target_factory
-from labgrid.binding import BindingError
+from labgrid.binding import BindingError, BindingState
 from labgrid.resource import Resource
 from labgrid.driver import Driver
 from labgrid.strategy import Strategy
@@ -608,3 +610,160 @@ def test_get_bound_multiple_resources(target):
     assert target.get_active_driver(ADriver, resource=aresource) 
     assert target.get_active_driver(BDriver, resource=bresource) 
     assert target.get_active_driver(CDriver, resource=aresource) 
+
+
+@attr.s(eq=False)
+class SlowDriver(Driver):
+    bindings = {"res": {ResourceA, ResourceB}}
+
+    def __attrs_post_init__(self):
+        super().__attrs_post_init__()
+        self.fail = False
+        self.barrier = None
+        self.activations = 0
+
+    def on_activate(self):
+        self.activations += 1
+        # only passes if the other SlowDriver is activated at the same time
+        self.barrier.wait()
+        time.sleep(0.05)
+        if self.fail:
+            raise ValueError(self.name)
+
+
+def make_parallel_target():
+    barrier = threading.Barrier(2, timeout=5.0)
+    target = Target("parallel")
+    target.parallel_activation = True
+    ResourceA(target, "a")
+    ResourceB(target, "b")
+    target.set_binding_map({"res": "a"})
+    slow_a = SlowDriver(target, "slow_a")
+    target.set_binding_map({"res": "b"})
+    slow_b = SlowDriver(target, "slow_b")
+
+    class TopDriver(Driver):
+        bindings = {
+            "a": Driver.NamedBinding(SlowDriver),
+            "b": Driver.NamedBinding(SlowDriver),
+        }
+
+        def on_activate(self):
+            assert self.a.state is BindingState.active
+            assert self.b.state is BindingState.active
+
+    target.set_binding_map({"a": "slow_a", "b": "slow_b"})
+    top = TopDriver(target, "top")
+    slow_a.barrier = slow_b.barrier = barrier
+    return target, slow_a, slow_b, top
+
+
+def test_parallel_activation():
+    target, slow_a, slow_b, top = make_parallel_target()
+
+    target.activate(top)
+    for driver in (slow_a, slow_b, top):
+        assert driver.state is BindingState.active
+    assert target.activation_times[slow_a.display_name] >= 0.05
+    assert top.display_name in target.activation_times
+
+    # already active suppliers are not activated again
+    target.deactivate(top)
+    target.activate(top)
+    assert top.state is BindingState.active
+    assert slow_a.activations == slow_b.activations == 1
+
+
+def test_parallel_activation_error():
+    target, slow_a, slow_b, top = make_parallel_target()
+    slow_a.fail = True
+
+    with pytest.raises(ValueError, match="slow_a"):
+        target.activate(top)
+    assert slow_a.state is BindingState.bound
+    assert slow_b.state is BindingState.active
+    assert top.state is BindingState.bound
+
+
+def test_parallel_activation_option(tmpdir):
+    from labgrid import Environment
+
+    p = tmpdir.join("config.yaml")
+    p.write(
+        """
+        targets:
+          main:
+            options:
+              parallel_activation: true
+          other:
+            resources: {}
+        """
+    )
+    env = Environment(str(p))
+    assert env.get_target("main").parallel_activation
+    assert not env.get_target("other").parallel_activation
+
+
+def test_lookup_index_updated_on_bind(target):
+    class A(Resource):
+        pass
+
+    class SubA(A):
+        pass
+
+    class D(Driver):
+        pass
+
+    class SubD(D):
+        pass
+
+    a = A(target, "a")
+    assert target.get_resource(A) is a
+    with pytest.raises(NoResourceFoundError):
+        target.get_resource(SubA)
+
+    # bound after the lookups above were cached
+    suba = SubA(target, "default")
+    assert target.get_resource(A) is suba
+    assert target.get_resource(A, name="a") is a
+    assert target.get_resource(SubA) is suba
+    with pytest.raises(NoResourceFoundError, match=r"other names: \['a', 'default'\]"):
+        target.get_resource(A, name="b")
+
+    d = D(target, "d")
+    assert target.get_driver(D, activate=False) is d
+    subd = SubD(target, "subd")
+    with pytest.raises(NoDriverFoundError, match="multiple drivers"):
+        target.get_driver(D, activate=False)
+    assert target.get_driver(D, name="subd", activate=False) is subd
+    with pytest.raises(NoDriverFoundError, match=r"other names: \['d', 'subd'\]"):
+        target.get_driver(D, name="other", activate=False)
+
+
+@pytest.mark.benchmark
+def test_benchmark_large_target_lookup():
+    class PortA(Resource):
+        pass
+
+    class PortB(Resource):
+        pass
+
+    class PortDriver(Driver):
+        bindings = {"port": PortA}
+
+    t = Target("rack")
+    for i in range(200):
+        PortA(t, f"a{i}")
+        PortB(t, f"b{i}")
+    for i in range(200):
+        t.set_binding_map({"port": f"a{i}"})
+        PortDriver(t, f"d{i}")
+
+    count = 10000
+    start = time.monotonic()
+    for i in range(count):
+        t.get_resource(PortB, name=f"b{i % 200}", wait_avail=False)
+        t.get_driver(PortDriver, name=f"d{i % 200}", activate=False)
+    elapsed = time.monotonic() - start
+    print(f"lookup with {len(t.resources)} resources and {len(t.drivers)} drivers: "
+          f"{elapsed / count / 2 * 1e6:.1f} us")
@@ -1,9 +1,58 @@
+import threading
+
 from labgrid.resource.mqtt import TasmotaPowerPort
-from labgrid.driver.mqtt import TasmotaPowerDriver
+from labgrid.driver.mqtt import MQTTError, TasmotaPowerDriver
 
 import pytest
 
-pytest.importorskip("paho.mqtt.client")
+mqtt = pytest.importorskip("paho.mqtt.client")
+
+
+def deliver(client, topic, payload):
+    msg = mqtt.MQTTMessage(topic=topic.encode())
+    msg.payload = payload
+    client.on_message(client, client.user_data_get(), msg)
+
+
+@pytest.fixture
+def broker(mocker):
+    """Simulates Tasmota outlets answering power commands"""
+    mocker.patch('paho.mqtt.client.Client.connect', return_value=None)
+    mocker.patch('paho.mqtt.client.Client.loop_start', return_value=None)
+    mocker.patch('paho.mqtt.client.Client.subscribe', return_value=None)
+    mocker.patch('paho.mqtt.client.Client.unsubscribe', return_value=None)
+    outlets = {}
+    published = []
+    held = []
+    # replies are held back until "batch" commands were published
+    broker = {"outlets": outlets, "published": published, "reply": True, "batch": 1}
+
+    def publish(client, topic, payload=None):
+        published.append((topic, payload))
+        info = mocker.MagicMock()
+        info.is_published.return_value = True
+        if broker["reply"]:
+            if payload is not None:
+                outlets[topic] = payload
+            status_topic = topic.replace("cmnd/", "stat/")
+            held.append((status_topic, outlets.get(topic, "OFF").encode()))
+            if len(held) >= broker["batch"]:
+                for status_topic, reply in held:
+                    threading.Timer(0.01, deliver, args=(client, status_topic, reply)).start()
+                held.clear()
+        return info
+
+    mocker.patch.object(mqtt.Client, 'publish', autospec=True, side_effect=publish)
+    return broker
+
+
+def make_port(target, name=None, index=0):
+    res = TasmotaPowerPort(target, name=name, host="localhost",
+                           avail_topic=f"tele/tasmota_{index}/LWT",
+                           power_topic=f"cmnd/tasmota_{index}/POWER",
+                           status_topic=f"stat/tasmota_{index}/POWER")
+    deliver(res.manager.get_client("localhost"), res.avail_topic, b"Online")
+    return res
 
 
 def test_tasmota_resource(target, mocker):
@@ -21,3 +70,62 @@ def test_tasmota_driver(target, mocker):
     res.manager._available.add("test")
     driver = TasmotaPowerDriver(target, name=None)
     target.activate(driver)
+
+
+def test_tasmota_driver_on_off(target, broker):
+    make_port(target)
+    driver = TasmotaPowerDriver(target, name=None)
+    target.activate(driver)
+
+    driver.on()
+    assert driver.get() is True
+    driver.off()
+    assert driver.get() is False
+    # each command is published once and confirmed by the status reply
+    assert broker["published"] == [
+        ("cmnd/tasmota_0/POWER", "ON"),
+        ("cmnd/tasmota_0/POWER", None),
+        ("cmnd/tasmota_0/POWER", "OFF"),
+        ("cmnd/tasmota_0/POWER", None),
+    ]
+
+    target.deactivate(driver)
+
+
+def test_tasmota_driver_timeout(target, broker, mocker):
+    mocker.patch.object(TasmotaPowerDriver, 'TIMEOUT', 0.1)
+    broker["reply"] = False
+    make_port(target)
+    driver = TasmotaPowerDriver(target, name=None)
+    target.activate(driver)
+
+    with pytest.raises(MQTTError, match="did not change status"):
+        driver.on()
+    with pytest.raises(MQTTError, match="Could not get initial status"):
+        driver.get()
+
+
+def test_tasmota_switch_many(target, broker, mocker):
+    mocker.patch.object(TasmotaPowerDriver, 'TIMEOUT', 1.0)
+    drivers = []
+    for i in range(10):
+        make_port(target, name=f"port{i}", index=i)
+        target.set_binding_map({"power": f"port{i}"})
+        drivers.append(TasmotaPowerDriver(target, name=f"power{i}"))
+    for driver in drivers:
+        target.activate(driver)
+
+    # all drivers share the client of the resource manager
+    client = drivers[0].power.manager.get_client("localhost")
+    assert all(driver._client is client for driver in drivers)
+
+    # only succeeds if all commands are published before waiting for the
+    # first confirmation
+    broker["batch"] = len(drivers)
+    TasmotaPowerDriver.switch_many(drivers, True)
+    assert len(broker["published"]) == len(drivers)
+    assert all(broker["outlets"][f"cmnd/tasmota_{i}/POWER"] == "ON" for i in range(10))
+    assert all(driver._status is True for driver in drivers)
+
+    TasmotaPowerDriver.switch_many(drivers, False)
+    assert all(broker["outlets"][f"cmnd/tasmota_{i}/POWER"] == "OFF" for i in range(10))
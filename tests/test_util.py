@@ -360,3 +360,153 @@ def test_find_dict():
     assert find_dict(dict_a, "a.a") == {"a.a.a": "a.a.a_val"}
     assert find_dict(dict_a, "a.a.a") == "a.a.a_val"
     assert find_dict(dict_a, "x") == None
+
+@pytest.fixture
+def managedfile_conn(mocker):
+    ManagedFile._transfers.clear()
+    conn = mocker.MagicMock()
+    conn.run.return_value = ([], [], 0)
+    mocker.patch("labgrid.util.managedfile.sshmanager").open.return_value = conn
+    yield conn
+    ManagedFile._transfers.clear()
+
+def test_remote_managedfile_prefetch(target, tmpdir, managedfile_conn):
+    res = NetworkResource(target, "test", "remotehost")
+    t = tmpdir.join("test")
+    t.write("Test")
+
+    future = ManagedFile(t, res, detect_nfs=False).prefetch()
+    rpath = future.result()
+    assert rpath.endswith(f"/{ManagedFile(t, res).get_hash()}/")
+
+    # a later sync reuses the completed copy
+    mf = ManagedFile(t, res, detect_nfs=False)
+    mf.sync_to_resource()
+    assert mf.get_remote_path() == f"{rpath}test"
+    managedfile_conn.put_file.assert_called_once_with(str(t), f"{rpath}test")
+    managedfile_conn.run.assert_called_with(f"test -f {rpath}test")
+
+    # removed copies are copied again
+    managedfile_conn.run.return_value = ([], [], 1)
+    mf = ManagedFile(t, res, detect_nfs=False)
+    mf.sync_to_resource()
+    assert mf.get_remote_path() == f"{rpath}test"
+    assert managedfile_conn.put_file.call_count == 2
+    managedfile_conn.run.return_value = ([], [], 0)
+
+    # modified files are copied again
+    t.write("Modified")
+    os.utime(t, ns=(0, 0))
+    mf = ManagedFile(t, res, detect_nfs=False)
+    mf.sync_to_resource()
+    assert managedfile_conn.put_file.call_count == 3
+
+def test_remote_managedfile_prefetch_retry(target, tmpdir, managedfile_conn):
+    res = NetworkResource(target, "test", "remotehost")
+    t = tmpdir.join("test")
+    t.write("Test")
+    managedfile_conn.put_file.side_effect = ExecutionError("failed")
+
+    future = ManagedFile(t, res, detect_nfs=False).prefetch()
+    with pytest.raises(ExecutionError):
+        future.result()
+
+    managedfile_conn.put_file.side_effect = None
+    mf = ManagedFile(t, res, detect_nfs=False)
+    mf.sync_to_resource()
+    assert managedfile_conn.put_file.call_count == 2
+
+def test_remote_managedfile_prefetch_exit(target, tmpdir, managedfile_conn):
+    import threading
+
+    res = NetworkResource(target, "test", "remotehost")
+    started = threading.Event()
+    release = threading.Event()
+
+    def put_file(*args):
+        started.set()
+        release.wait(5.0)
+
+    managedfile_conn.put_file.side_effect = put_file
+    files = []
+    for i in range(ManagedFile.MAX_PARALLEL_TRANSFERS + 2):
+        t = tmpdir.join(f"test{i}")
+        t.write(f"Test{i}")
+        files.append(t)
+    futures = [ManagedFile(t, res, detect_nfs=False).prefetch() for t in files]
+    assert started.wait(5.0)
+
+    ManagedFile._shutdown_executor()
+    release.set()
+    # the copies which did not start yet are cancelled
+    assert sum(future.cancelled() for future in futures) >= 2
+    assert ManagedFile._executor is None
+
+def test_remote_managedfile_prefetch_exit_process(tmpdir):
+    import sys
+    import textwrap
+
+    files = []
+    for i in range(ManagedFile.MAX_PARALLEL_TRANSFERS + 2):
+        t = tmpdir.join(f"test{i}")
+        t.write(f"Test{i}")
+        files.append(str(t))
+    script = tmpdir.join("prefetch.py")
+    script.write(textwrap.dedent(f"""
+        import threading
+        import time
+        from unittest import mock
+
+        from labgrid import Target
+        from labgrid.resource.common import NetworkResource
+        from labgrid.util.managedfile import ManagedFile
+
+        started = threading.Semaphore(0)
+
+        def put_file(*args):
+            print("started", flush=True)
+            started.release()
+            time.sleep(60)
+
+        conn = mock.MagicMock()
+        conn.run.return_value = ([], [], 0)
+        conn.put_file.side_effect = put_file
+        with mock.patch("labgrid.util.managedfile.sshmanager") as sshmanager:
+            sshmanager.open.return_value = conn
+            res = NetworkResource(Target("test"), "test", "remotehost")
+            for path in {files!r}:
+                ManagedFile(path, res, detect_nfs=False).prefetch()
+            for _ in range(ManagedFile.MAX_PARALLEL_TRANSFERS):
+                started.acquire()
+    """))
+
+    # neither the running nor the queued copies delay the exit
+    result = subprocess.run(
+        [sys.executable, str(script)], stdout=subprocess.PIPE, check=True, timeout=30
+    )
+    assert result.stdout.count(b"started") == ManagedFile.MAX_PARALLEL_TRANSFERS
+
+def test_prefetch_images(tmpdir, managedfile_conn):
+    from labgrid import Environment
+    from labgrid.util.managedfile import prefetch_images
+
+    tmpdir.join("image.img").write("image")
+    p = tmpdir.join("config.yaml")
+    p.write(
+        """
+        targets:
+          main:
+            resources:
+              NetworkSerialPort:
+                host: exporter
+                port: 1234
+        images:
+          image: image.img
+          missing: missing.img
+        """
+    )
+    target = Environment(str(p)).get_target()
+    futures = prefetch_images(target)
+    assert list(futures) == [("image", "exporter")]
+    futures[("image", "exporter")].result()
+    managedfile_conn.put_file.assert_called_once()
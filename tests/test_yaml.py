@@ -1,3 +1,4 @@
+import time
 from collections import OrderedDict, UserString
 
 import pytest
@@ -54,3 +55,68 @@ def test_labgrid_dumper():
     data = OrderedDict([])
     doc = dump(data)
     assert "{}\n" == doc
+
+
+def test_labgrid_loader_libyaml():
+    assert issubclass(Loader, yaml.CSafeLoader) == yaml.__with_libyaml__
+    assert issubclass(Dumper, yaml.CSafeDumper) == yaml.__with_libyaml__
+
+
+def test_labgrid_loader_tuple_and_template():
+    doc = """
+    foo: !!python/tuple [1, 2]
+    bar: !template '$BASE/bar'
+    """
+    data = load(doc)
+    assert data["foo"] == (1, 2)
+    assert data["bar"].substitute(BASE="/base") == "/base/bar"
+
+
+def test_labgrid_loader_duplicate_keys():
+    doc = """
+    foo: 1
+    foo: 2
+    """
+    with pytest.warns(UserWarning, match="duplicate YAML dictionary key 'foo'"):
+        data = load(doc)
+    assert data["foo"] == 2
+
+
+def _places_doc(count):
+    return "".join(
+        f"""
+place-{i}:
+  aliases: [alias-{i}]
+  comment: ''
+  tags: {{board: board-{i % 10}}}
+  matches:
+  - {{cls: '*', exporter: '*', group: group-{i}, name: null, rename: null}}
+  acquired: null
+"""
+        for i in range(count)
+    )
+
+
+def test_labgrid_loader_many_places(recwarn):
+    """Load a coordinator places file with 5000 places"""
+    data = load(_places_doc(5000))
+    assert len(data) == 5000
+    assert data["place-4999"]["matches"][0]["group"] == "group-4999"
+    assert not recwarn
+
+
+@pytest.mark.benchmark
+def test_benchmark_places(recwarn):
+    doc = _places_doc(5000)
+
+    start = time.monotonic()
+    data = load(doc)
+    elapsed_load = time.monotonic() - start
+
+    start = time.monotonic()
+    dump(data)
+    elapsed_dump = time.monotonic() - start
+
+    assert len(data) == 5000
+    assert not recwarn
+    print(f"5000 places: load {elapsed_load * 1e3:.0f} ms, dump {elapsed_dump * 1e3:.0f} ms")